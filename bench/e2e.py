@@ -0,0 +1,292 @@
+"""
+Offline end-to-end benchmark.
+
+Starts the bot (core.agent.main) in-process against local fakes of OpenAI, the VPS API and
+open-wa, replays scripted conversation mixes through the real /webhook and reports turn
+latency percentiles, LLM calls per turn and throughput as JSON.
+
+    python -m bench.e2e --conversations 50 --concurrency 10 --mix "browse=0.5,booking=0.3,chitchat=0.2"
+    python -m bench.e2e --openai-latency "gpt-4.1=lognormal:0.9:0.4,*=lognormal:0.5:0.3" --out e2e.json
+
+Turn latency is measured from posting the webhook to the moment the fake open-wa receives
+the turn's reply (early acknowledgements and session warnings are not counted as replies).
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import logging
+import argparse
+import shutil
+import tempfile
+import itertools
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+import uvicorn
+
+from bench.latency import parse_latency_map, percentile
+from bench.scenarios import SCENARIOS, DEFAULT_MIX, parse_mix, pick_scenarios, phone_for, webhook_payload
+from bench.fakes import openai_server, vps_server, open_wa_server
+
+OPEN_WA_API_KEY = "bench"
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def start_server(app, port: int) -> uvicorn.Server:
+    """Run `app` with uvicorn on this event loop; returns once it accepts connections."""
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on")
+    server = uvicorn.Server(config)
+    server.install_signal_handlers = lambda: None
+    server._bench_task = asyncio.create_task(server.serve())
+    while not server.started:
+        if server._bench_task.done():
+            server._bench_task.result()
+            raise RuntimeError(f"Server on port {port} exited during startup")
+        await asyncio.sleep(0.01)
+    return server
+
+
+async def stop_server(server: uvicorn.Server):
+    server.should_exit = True
+    await server._bench_task
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(samples),
+        "p50": round(percentile(samples, 50), 4),
+        "p95": round(percentile(samples, 95), 4),
+        "p99": round(percentile(samples, 99), 4),
+        "max": round(max(samples), 4) if samples else 0.0,
+        "mean": round(sum(samples) / len(samples), 4) if samples else 0.0,
+    }
+
+
+class Conversation:
+    def __init__(self, index: int, scenario: str):
+        self.index = index
+        self.scenario = scenario
+        self.jid = phone_for(index)
+        self.turn_latencies: List[float] = []
+        self.unanswered = 0  # turns with no reply (timeout or nothing sent)
+
+
+async def run_conversation(
+    conversation: Conversation,
+    http: httpx.AsyncClient,
+    bot_url: str,
+    sink: open_wa_server.OpenWASink,
+    turn_timeout: float,
+    message_ids,
+):
+    for body in SCENARIOS[conversation.scenario]:
+        started = time.perf_counter()
+        payload = webhook_payload(conversation.jid, body, f"bench_{next(message_ids)}")
+        # open-wa does not wait for the bot's answer, so neither do we: the reply is
+        # observed at the sink even if the webhook handler processes the turn inline
+        post = asyncio.create_task(http.post(f"{bot_url}/webhook", json=payload))
+        reply = await sink.wait_for_reply(conversation.jid, since=started, timeout=turn_timeout)
+        await post
+        if reply is None:
+            conversation.unanswered += 1
+            continue
+        conversation.turn_latencies.append(reply[0] - started)
+
+
+class BenchStack:
+    """
+    The bot plus its three fakes, each served by uvicorn on a free local port of the
+    current event loop. The bot reads its endpoints from the environment at import time,
+    so start() sets them before importing core.agent.main.
+    """
+
+    def __init__(
+        self,
+        openai_latency: Dict,
+        vps_latency: Dict,
+        open_wa_latency: Dict,
+        canned: Optional[Dict] = None,
+        catalog_size: int = 200,
+        vps_empty_rate: float = 0.0,
+        vps_error_rate: float = 0.0,
+        log_level: str = "warning",
+    ):
+        self.openai_latency = openai_latency
+        self.vps_latency = vps_latency
+        self.open_wa_latency = open_wa_latency
+        self.canned = canned
+        self.catalog_size = catalog_size
+        self.vps_empty_rate = vps_empty_rate
+        self.vps_error_rate = vps_error_rate
+        self.log_level = log_level
+        self.bot_url = ""
+        self.sink: Optional[open_wa_server.OpenWASink] = None
+        self.fake_openai: Optional[openai_server.FakeOpenAIState] = None
+        self.fake_vps: Optional[vps_server.FakeVPSState] = None
+        self._servers: List[uvicorn.Server] = []
+        self._db_dir = ""
+
+    async def start(self):
+        openai_port, vps_port, wa_port, bot_port = (free_port() for _ in range(4))
+        self.bot_url = f"http://127.0.0.1:{bot_port}"
+        os.environ.update({
+            "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY") or "bench",
+            "OPENAI_BASE_URL": f"http://127.0.0.1:{openai_port}/v1",
+            "VPS_URL": f"http://127.0.0.1:{vps_port}",
+            "OPEN_WA_HOST": "127.0.0.1",
+            "OPEN_WA_PORT": str(wa_port),
+            "OPEN_WA_API_KEY": OPEN_WA_API_KEY,
+            "BOT_PORT": str(bot_port),
+            "BOT_WEBHOOK_URL": f"{self.bot_url}/webhook",
+        })
+        from core.agent import session
+        from core.agent import main as bot
+
+        self._db_dir = tempfile.mkdtemp(prefix="wa_bot_bench_")
+        session.DB_PATH = Path(self._db_dir) / "chat_sessions.db"
+        for name in list(logging.root.manager.loggerDict):
+            if name.startswith("core"):
+                logging.getLogger(name).setLevel(self.log_level.upper())
+
+        openai_app = openai_server.create_app(self.openai_latency, self.canned)
+        vps_app = vps_server.create_app(self.vps_latency, self.catalog_size, self.vps_empty_rate, self.vps_error_rate)
+        wa_app = open_wa_server.create_app(self.open_wa_latency, non_reply_texts())
+        self.sink = wa_app.state.sink
+        self.fake_openai = openai_app.state.fake
+        self.fake_vps = vps_app.state.fake
+
+        self._servers.append(await start_server(openai_app, openai_port))
+        self._servers.append(await start_server(vps_app, vps_port))
+        self._servers.append(await start_server(wa_app, wa_port))
+        self._servers.append(await start_server(bot.app, bot_port))
+        return self
+
+    async def stop(self):
+        for server in reversed(self._servers):
+            await stop_server(server)
+        self._servers.clear()
+        if self._db_dir:
+            shutil.rmtree(self._db_dir, ignore_errors=True)
+
+
+def non_reply_texts() -> set:
+    """Bot messages that are not the answer to a turn (acknowledgements, session warnings)."""
+    from core.agent import config
+
+    return {
+        config.AGENT_EARLY_ACK_MESSAGE,
+        config.AGENT_VENUE_SEARCH_ACK_MESSAGE,
+        config.AGENT_SESSION_WARNING_MESSAGE,
+        config.AGENT_SESSION_LIMIT_MESSAGE,
+    }
+
+
+async def run_benchmark(args) -> Dict:
+    openai_latency = parse_latency_map(args.openai_latency)
+    vps_latency = parse_latency_map(args.vps_latency)
+    wa_latency = parse_latency_map(args.open_wa_latency)
+    canned = None
+    if args.canned:
+        with open(args.canned) as f:
+            canned = json.load(f)
+
+    stack = BenchStack(
+        openai_latency, vps_latency, wa_latency, canned,
+        args.catalog_size, args.vps_empty_rate, args.vps_error_rate, args.log_level,
+    )
+    await stack.start()
+
+    mix = parse_mix(args.mix)
+    conversations = [
+        Conversation(i, scenario)
+        for i, scenario in enumerate(pick_scenarios(mix, args.conversations, seed=args.seed))
+    ]
+    semaphore = asyncio.Semaphore(args.concurrency)
+    message_ids = itertools.count(1)
+
+    async def _bounded(conversation: Conversation):
+        async with semaphore:
+            await run_conversation(conversation, http, stack.bot_url, stack.sink, args.turn_timeout, message_ids)
+
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(timeout=args.turn_timeout + 5, limits=limits) as http:
+            started = time.perf_counter()
+            await asyncio.gather(*(_bounded(c) for c in conversations))
+            wall_seconds = time.perf_counter() - started
+    finally:
+        await stack.stop()
+
+    latencies = [lat for c in conversations for lat in c.turn_latencies]
+    by_scenario: Dict[str, List[float]] = defaultdict(list)
+    for conversation in conversations:
+        by_scenario[conversation.scenario].extend(conversation.turn_latencies)
+    unanswered = sum(c.unanswered for c in conversations)
+    turns = len(latencies) + unanswered
+    return {
+        "config": {
+            "conversations": args.conversations,
+            "concurrency": args.concurrency,
+            "mix": dict(mix),
+            "openai_latency": {k: repr(v) for k, v in openai_latency.items()},
+            "vps_latency": {k: repr(v) for k, v in vps_latency.items()},
+            "open_wa_latency": {k: repr(v) for k, v in wa_latency.items()},
+            "seed": args.seed,
+        },
+        "turns": turns,
+        "unanswered_turns": unanswered,
+        "wall_seconds": round(wall_seconds, 3),
+        "messages_per_second": round(turns / wall_seconds, 3) if wall_seconds else 0.0,
+        "turn_latency_seconds": summarize(latencies),
+        "turn_latency_by_scenario": {name: summarize(samples) for name, samples in sorted(by_scenario.items())},
+        "llm_calls": stack.fake_openai.total_calls,
+        "llm_calls_per_turn": round(stack.fake_openai.total_calls / turns, 3) if turns else 0.0,
+        "llm_calls_by_schema": dict(stack.fake_openai.calls),
+        "llm_calls_by_model": dict(stack.fake_openai.calls_by_model),
+        "vps_calls": dict(stack.fake_vps.calls),
+        "open_wa_calls": dict(stack.sink.calls),
+    }
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark for the WhatsApp bot")
+    parser.add_argument("--conversations", type=int, default=30)
+    parser.add_argument("--concurrency", type=int, default=10, help="conversations running at the same time")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"scenario weights, one of {sorted(SCENARIOS)}")
+    parser.add_argument("--openai-latency", default="gpt-4.1=lognormal:0.8:0.35,*=lognormal:0.45:0.3")
+    parser.add_argument("--vps-latency", default="inquiry=lognormal:0.9:0.3,*=lognormal:0.3:0.2")
+    parser.add_argument("--open-wa-latency", default="*=fixed:0.02")
+    parser.add_argument("--canned", help="JSON file with fixed OpenAI outputs by schema name")
+    parser.add_argument("--catalog-size", type=int, default=200)
+    parser.add_argument("--vps-empty-rate", type=float, default=0.0)
+    parser.add_argument("--vps-error-rate", type=float, default=0.0)
+    parser.add_argument("--turn-timeout", type=float, default=20.0, help="seconds to wait for a reply")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--log-level", default="warning", help="log level of the bot's loggers")
+    parser.add_argument("--out", help="also write the JSON report to this file")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None):
+    args = build_parser().parse_args(argv)
+    report = asyncio.run(run_benchmark(args))
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.out:
+        Path(args.out).write_text(output + "\n")
+    return 0 if report["turns"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""
+Local stand-in for the open-wa REST API: a sink for the bot's outbound calls.
+
+Records every /sendText with its arrival time so the benchmark can measure when the reply
+to a webhook actually reached "WhatsApp". Point the bot at it with OPEN_WA_HOST / OPEN_WA_PORT.
+
+    python -m bench.fakes.open_wa_server --port 9103 --latency "sendText=fixed:0.05"
+"""
+
+import time
+import asyncio
+import argparse
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+from fastapi import FastAPI, Request
+
+from bench.latency import LatencyModel, parse_latency_map, pick_latency
+
+
+class OpenWASink:
+    def __init__(self, latency: Dict[str, LatencyModel], ignore_texts: Optional[Set[str]] = None):
+        self.latency = latency
+        # texts that are not the turn's reply (early acknowledgements, session warnings)
+        self.ignore_texts = set(ignore_texts or ())
+        self.sent: Dict[str, List[Tuple[float, str]]] = defaultdict(list)
+        self.calls: Counter = Counter()
+        self.webhook_registrations: List[Dict] = []
+        self._waiters: Dict[str, List[Tuple[float, asyncio.Future]]] = defaultdict(list)
+
+    def record(self, to: str, content: str):
+        now = time.perf_counter()
+        self.sent[to].append((now, content))
+        if content in self.ignore_texts:
+            return
+        waiters = self._waiters.get(to, [])
+        for since, future in list(waiters):
+            if now >= since and not future.done():
+                future.set_result((now, content))
+                waiters.remove((since, future))
+
+    async def wait_for_reply(self, to: str, since: float, timeout: float = 60.0) -> Optional[Tuple[float, str]]:
+        """First reply (not an ignored text) sent to `to` at or after `since` (perf_counter)."""
+        for sent_at, content in self.sent.get(to, []):
+            if sent_at >= since and content not in self.ignore_texts:
+                return sent_at, content
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[to].append((since, future))
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    @property
+    def total_sent(self) -> int:
+        return sum(len(v) for v in self.sent.values())
+
+
+def create_app(latency: Optional[Dict[str, LatencyModel]] = None, ignore_texts: Optional[Set[str]] = None) -> FastAPI:
+    app = FastAPI()
+    sink = app.state.sink = OpenWASink(latency or {"*": LatencyModel()}, ignore_texts)
+
+    @app.post("/sendText")
+    async def send_text(request: Request):
+        args = (await request.json()).get("args", {})
+        sink.calls["sendText"] += 1
+        await asyncio.sleep(pick_latency(sink.latency, "sendText").sample())
+        sink.record(args.get("to", ""), args.get("content", ""))
+        return {"success": True, "response": f"true_{args.get('to')}_fake"}
+
+    @app.post("/simulateTyping")
+    async def simulate_typing(request: Request):
+        await request.json()
+        sink.calls["simulateTyping"] += 1
+        return {"success": True, "response": True}
+
+    @app.post("/webhook")
+    async def register_webhook(request: Request):
+        sink.webhook_registrations.append((await request.json()).get("args", {}))
+        return {"success": True}
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake open-wa REST sink")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9103)
+    parser.add_argument("--latency", default="", help='e.g. "sendText=fixed:0.05"')
+    args = parser.parse_args()
+    uvicorn.run(create_app(parse_latency_map(args.latency)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
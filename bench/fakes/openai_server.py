@@ -0,0 +1,193 @@
+"""
+Local stand-in for the OpenAI chat completions API.
+
+Answers POST /v1/chat/completions with canned structured outputs chosen by the request's
+json_schema name, after sleeping for a per-model latency sample, and GET /v1/models (the
+bot's startup probe) with the models it has latencies for. Point the bot at it with
+OPENAI_BASE_URL=http://127.0.0.1:<port>/v1.
+
+    python -m bench.fakes.openai_server --port 9101 --latency "gpt-4.1=lognormal:0.9:0.3,*=lognormal:0.5:0.3"
+"""
+
+import re
+import json
+import time
+import asyncio
+import argparse
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+
+from bench.latency import LatencyModel, parse_latency_map, pick_latency
+
+# (pattern on the latest user message, preferred classes); the first class present in the
+# request's enum wins, so the same rule drives both classification depths.
+DEFAULT_CLASS_RULES = [
+    (r"\b(bye|end (the )?chat|stop)\b", ["end_session"]),
+    (r"\b(book|confirm|take|reserve)\b|@", ["inquiry", "confirm_booking"]),
+    (r"\b(which of (those|them)|where is|does the \w+ one have)\b", ["inquiry", "venue_details"]),
+    (r"\b(venue|recommend|wedding|meeting|conference|party|hall|room)\b", ["inquiry", "venue_recommendation"]),
+]
+COUNTRIES = ["Indonesia", "Singapore", "Malaysia", "Thailand", "Vietnam"]
+
+
+def _last_user_message(messages: List[Dict[str, Any]]) -> str:
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            return str(message.get("content") or "")
+    return ""
+
+
+def _user_text(messages: List[Dict[str, Any]]) -> str:
+    return "\n".join(str(m.get("content") or "") for m in messages if m.get("role") == "user")
+
+
+def canned_question_class(messages, schema, rules=DEFAULT_CLASS_RULES) -> Dict[str, Any]:
+    enum = schema["schema"]["properties"]["question_class"]["enum"]
+    text = _last_user_message(messages).lower()
+    for pattern, classes in rules:
+        if re.search(pattern, text):
+            for question_class in classes:
+                if question_class in enum:
+                    return {"question_class": question_class}
+    return {"question_class": "general_talk" if "general_talk" in enum else enum[-1]}
+
+
+def canned_user_requirements(messages, schema) -> Dict[str, Any]:
+    """Cheap regex extraction so booking flows can complete."""
+    text = _user_text(messages)
+    email = re.search(r"[\w.+-]+@[\w-]+\.[\w.]+", text)
+    name = re.search(r"my name is ([A-Za-z]+(?: [A-Za-z]+)?)", text, re.I)
+    date = re.search(r"\d{4}-\d{2}-\d{2}", text)
+    attendees = re.search(r"(\d+)\s*(people|guests|pax|attendees)", text, re.I)
+    country = next((c for c in COUNTRIES if c.lower() in text.lower()), None)
+    location = re.search(r"\bin ([A-Z][a-z]+)", text)
+    return {
+        "event_type": "wedding" if "wedding" in text.lower() else ("meeting" if "meeting" in text.lower() else None),
+        "country": country,
+        "location": location.group(1) if location and location.group(1) != country else None,
+        "attendees": int(attendees.group(1)) if attendees else None,
+        "budget": None,
+        "start_date": date.group(0) if date else None,
+        "end_date": None,
+        "email": email.group(0) if email else None,
+        "customer_name": name.group(1) if name else None,
+    }
+
+
+def canned_parsed_venue(messages, schema) -> Dict[str, Any]:
+    return {"venue_name": "", "venue_id": "", "venue_location": "", "venue_amenities": ""}
+
+
+def canned_response(messages, schema) -> Dict[str, Any]:
+    return {
+        "response_header": "Hi, I'm Mary from Venuexplorer!",
+        "response_content": "Could you tell me more about the event you are planning (country, city, date and number of guests)?",
+        "response_footer": "I'm happy to help you find the right venue.",
+    }
+
+
+CANNED_OUTPUTS = {
+    "question_class": canned_question_class,
+    "user_requirements": canned_user_requirements,
+    "parsed_venue": canned_parsed_venue,
+    "response": canned_response,
+}
+DEFAULT_TEXT_OUTPUT = "The user is looking for an event venue matching the requirements discussed so far."
+
+
+class FakeOpenAIState:
+    def __init__(self, latency: Dict[str, LatencyModel], canned_overrides: Optional[Dict[str, Any]] = None):
+        self.latency = latency
+        self.canned_overrides = canned_overrides or {}
+        self.calls: Counter = Counter()  # by schema name ("text" for plain completions)
+        self.calls_by_model: Counter = Counter()
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    def reset(self):
+        self.calls.clear()
+        self.calls_by_model.clear()
+
+
+def create_app(latency: Optional[Dict[str, LatencyModel]] = None, canned_overrides: Optional[Dict[str, Any]] = None) -> FastAPI:
+    """
+    Args:
+        latency: per-model latency models ("*" = fallback), see bench.latency
+        canned_overrides: fixed outputs by schema name (or "text"), replacing the built-in generators
+    """
+    app = FastAPI()
+    app.state.fake = FakeOpenAIState(latency or {"*": LatencyModel()}, canned_overrides)
+
+    @app.get("/v1/models")
+    async def models():
+        names = [name for name in app.state.fake.latency if name != "*"] or ["gpt-4.1-nano"]
+        return {"object": "list", "data": [{"id": name, "object": "model", "created": 0, "owned_by": "bench"} for name in names]}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        state: FakeOpenAIState = app.state.fake
+        body = await request.json()
+        model = body.get("model", "")
+        messages = body.get("messages", [])
+        schema = (body.get("response_format") or {}).get("json_schema")
+        name = schema["name"] if schema else "text"
+        state.calls[name] += 1
+        state.calls_by_model[model] += 1
+
+        await asyncio.sleep(pick_latency(state.latency, model).sample())
+
+        if name in state.canned_overrides:
+            output = state.canned_overrides[name]
+        elif schema and name in CANNED_OUTPUTS:
+            output = CANNED_OUTPUTS[name](messages, schema)
+        elif schema:
+            output = {}
+        else:
+            output = DEFAULT_TEXT_OUTPUT
+        content = output if isinstance(output, str) else json.dumps(output)
+
+        prompt_tokens = sum(len(str(m.get("content") or "")) for m in messages) // 4
+        completion_tokens = len(content) // 4
+        return {
+            "id": f"chatcmpl-fake-{state.total_calls}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake OpenAI chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9101)
+    parser.add_argument("--latency", default="", help='e.g. "gpt-4.1=lognormal:0.9:0.3,*=fixed:0.3"')
+    parser.add_argument("--canned", help="JSON file with fixed outputs by schema name")
+    args = parser.parse_args()
+
+    canned = None
+    if args.canned:
+        with open(args.canned) as f:
+            canned = json.load(f)
+    uvicorn.run(create_app(parse_latency_map(args.latency), canned), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Local stand-in for a Redis server, enough for SESSION_STATE_BACKEND=redis.
+
+Speaks RESP2 over TCP and implements the commands RedisSessionState uses: PING, AUTH,
+SELECT, GET, SET (NX/XX/PX/EX), DEL, PEXPIRE, PTTL, SCAN (MATCH/COUNT) and EVAL for the
+three scripts in core.agent.session_state (there is no Lua interpreter; the scripts are
+recognised by their text). Keys expire lazily on access.
+
+    python -m bench.fakes.redis_server --port 6390
+    SESSION_STATE_BACKEND=redis REDIS_URL=redis://127.0.0.1:6390/0 uvicorn core.agent.main:app --workers 4
+"""
+
+import json
+import time
+import asyncio
+import argparse
+import fnmatch
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from core.agent.session_state import (
+    RENEW_LEASE_SCRIPT,
+    RELEASE_LEASE_SCRIPT,
+    DELETE_SESSION_SCRIPT,
+)
+
+
+class CommandError(Exception):
+    pass
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data: Dict[str, Tuple[str, Optional[float]]] = {}  # key -> (value, expires_at monotonic)
+        self.calls: Counter = Counter()
+
+    # -- storage -------------------------------------------------------
+    def _get(self, key: str) -> Optional[str]:
+        item = self.data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and time.monotonic() >= expires_at:
+            del self.data[key]
+            return None
+        return value
+
+    def _set(self, key: str, value: str, ttl_ms: Optional[int] = None):
+        self.data[key] = (value, time.monotonic() + ttl_ms / 1000 if ttl_ms else None)
+
+    def _delete(self, *keys: str) -> int:
+        return sum(1 for key in keys if self._get(key) is not None and self.data.pop(key, None) is not None)
+
+    def _pexpire(self, key: str, ttl_ms: int) -> int:
+        value = self._get(key)
+        if value is None:
+            return 0
+        self._set(key, value, ttl_ms)
+        return 1
+
+    # -- commands ------------------------------------------------------
+    def execute(self, args: List[str]):
+        command, args = args[0].upper(), args[1:]
+        self.calls[command] += 1
+        handler = getattr(self, f"cmd_{command.lower()}", None)
+        if handler is None:
+            raise CommandError(f"ERR unknown command '{command}'")
+        return handler(*args)
+
+    def cmd_ping(self, *args):
+        return args[0] if args else "PONG"
+
+    def cmd_auth(self, *args):
+        return "OK"
+
+    def cmd_select(self, db):
+        return "OK"
+
+    def cmd_get(self, key):
+        return self._get(key)
+
+    def cmd_set(self, key, value, *options):
+        ttl_ms, nx, xx = None, False, False
+        i = 0
+        while i < len(options):
+            option = options[i].upper()
+            if option == "NX":
+                nx = True
+            elif option == "XX":
+                xx = True
+            elif option in ("PX", "EX"):
+                ttl_ms = int(options[i + 1]) * (1000 if option == "EX" else 1)
+                i += 1
+            else:
+                raise CommandError("ERR syntax error")
+            i += 1
+        exists = self._get(key) is not None
+        if (nx and exists) or (xx and not exists):
+            return None
+        self._set(key, value, ttl_ms)
+        return "OK"
+
+    def cmd_del(self, *keys):
+        return self._delete(*keys)
+
+    def cmd_pexpire(self, key, ttl_ms):
+        return self._pexpire(key, int(ttl_ms))
+
+    def cmd_pttl(self, key):
+        if self._get(key) is None:
+            return -2
+        expires_at = self.data[key][1]
+        return -1 if expires_at is None else int((expires_at - time.monotonic()) * 1000)
+
+    def cmd_scan(self, cursor, *options):
+        pattern, count = "*", 10
+        for name, value in zip(options[::2], options[1::2]):
+            if name.upper() == "MATCH":
+                pattern = value
+            elif name.upper() == "COUNT":
+                count = int(value)
+        keys = sorted(key for key in list(self.data) if self._get(key) is not None)
+        start = int(cursor)
+        page = keys[start:start + count]
+        next_cursor = start + count if start + count < len(keys) else 0
+        return [str(next_cursor), [key for key in page if fnmatch.fnmatchcase(key, pattern)]]
+
+    def cmd_eval(self, script, numkeys, *rest):
+        numkeys = int(numkeys)
+        keys, argv = rest[:numkeys], rest[numkeys:]
+        if script == RENEW_LEASE_SCRIPT:
+            return self._pexpire(keys[0], int(argv[1])) if self._get(keys[0]) == argv[0] else 0
+        if script == RELEASE_LEASE_SCRIPT:
+            return self._delete(keys[0]) if self._get(keys[0]) == argv[0] else 0
+        if script == DELETE_SESSION_SCRIPT:
+            value = self._get(keys[0])
+            if value and json.loads(value)["session_id"] == argv[0]:
+                return self._delete(*keys)
+            return 0
+        raise CommandError("ERR fake redis only knows the session state scripts")
+
+
+# -----------------------------
+# RESP2 server
+# -----------------------------
+def encode(value) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, CommandError):
+        return b"-%s\r\n" % str(value).encode()
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, list):
+        return b"*%d\r\n" % len(value) + b"".join(encode(item) for item in value)
+    if value == "OK" or value == "PONG":
+        return b"+%s\r\n" % value.encode()
+    data = str(value).encode()
+    return b"$%d\r\n%s\r\n" % (len(data), data)
+
+
+async def read_command(reader: asyncio.StreamReader) -> Optional[List[str]]:
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        return line.decode().split()  # inline command (e.g. from redis-cli / telnet)
+    args = []
+    for _ in range(int(line[1:-2])):
+        length = int((await reader.readline())[1:-2])
+        args.append((await reader.readexactly(length + 2))[:-2].decode())
+    return args
+
+
+def create_server(store: Optional[FakeRedis] = None):
+    """Returns (store, client handler) for asyncio.start_server."""
+    store = store or FakeRedis()
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                args = await read_command(reader)
+                if args is None:
+                    break
+                if not args:
+                    continue
+                try:
+                    reply = store.execute(args)
+                except CommandError as e:
+                    reply = e
+                except (TypeError, ValueError, IndexError):
+                    reply = CommandError(f"ERR wrong arguments for '{args[0]}' command")
+                writer.write(encode(reply))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    return store, handle
+
+
+async def start(host: str = "127.0.0.1", port: int = 6390):
+    store, handle = create_server()
+    server = await asyncio.start_server(handle, host, port)
+    return store, server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Redis server for shared session state")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+
+    async def serve():
+        _, server = await start(args.host, args.port)
+        print(f"fake redis listening on {args.host}:{args.port}")
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Local stand-in for the VPS recommendation / booking API used by core/agent/handler.py.
+
+Point the bot at it with VPS_URL=http://127.0.0.1:<port>.
+
+    python -m bench.fakes.vps_server --port 9102 --latency "inquiry=lognormal:1.2:0.3,*=fixed:0.3"
+"""
+
+import random
+import asyncio
+import argparse
+import itertools
+from collections import Counter
+from typing import Dict, List, Optional
+
+from fastapi import FastAPI, Request
+
+from bench.latency import LatencyModel, parse_latency_map, pick_latency
+
+VENUE_TYPES = ["ballroom", "meeting room", "garden", "rooftop", "conference hall", "villa"]
+AMENITIES = ["parking", "wifi", "catering", "projector", "sound system", "pool", "wheelchair access", "stage"]
+CITIES = ["Jakarta", "Bali", "Bandung", "Singapore", "Kuala Lumpur", "Bangkok", "Surabaya", "Yogyakarta"]
+
+
+def build_catalog(size: int, seed: int = 7) -> List[Dict]:
+    rng = random.Random(seed)
+    return [
+        {
+            "id": str(1000 + i),
+            "name": f"{rng.choice(['Grand', 'Royal', 'Sunset', 'Harbour', 'Garden', 'Skyline'])} "
+                    f"{rng.choice(['Hall', 'Pavilion', 'Terrace', 'Suites', 'Center', 'Loft'])} {i}",
+            "location": rng.choice(CITIES),
+            "type": rng.choice(VENUE_TYPES),
+            "amenities": ", ".join(rng.sample(AMENITIES, 3)),
+        }
+        for i in range(size)
+    ]
+
+
+class FakeVPSState:
+    def __init__(self, latency: Dict[str, LatencyModel], catalog: List[Dict], empty_rate: float, error_rate: float, seed: int):
+        self.latency = latency
+        self.catalog = catalog
+        self.empty_rate = empty_rate
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.tickets = itertools.count(1)
+        self.calls: Counter = Counter()
+
+
+def create_app(
+    latency: Optional[Dict[str, LatencyModel]] = None,
+    catalog_size: int = 200,
+    empty_rate: float = 0.0,
+    error_rate: float = 0.0,
+    seed: int = 7,
+) -> FastAPI:
+    """
+    Args:
+        latency: latency models by endpoint ("inquiry", "next", "book", "book_now", "*")
+        catalog_size: number of synthetic venues recommendations are drawn from
+        empty_rate: share of inquiries answered with no venues
+        error_rate: share of calls answered with HTTP 500
+    """
+    app = FastAPI()
+    state = app.state.fake = FakeVPSState(
+        latency or {"*": LatencyModel()}, build_catalog(catalog_size, seed), empty_rate, error_rate, seed
+    )
+
+    async def _simulate(endpoint: str):
+        state.calls[endpoint] += 1
+        await asyncio.sleep(pick_latency(state.latency, endpoint).sample())
+        return state.rng.random() < state.error_rate
+
+    def _recommendation(k: int) -> Dict:
+        if state.rng.random() < state.empty_rate:
+            venues = []
+        else:
+            venues = [
+                {"payload": dict(venue), "score": round(1 - rank * 0.05, 3)}
+                for rank, venue in enumerate(state.rng.sample(state.catalog, min(k, len(state.catalog))))
+            ]
+        return {"ticket_id": f"VX-{next(state.tickets):08d}", "top_k_venues": venues}
+
+    @app.post("/api/v1/recommendation/inquiry/whatsapp")
+    async def inquiry(request: Request):
+        body = await request.json()
+        if await _simulate("inquiry"):
+            return _error()
+        return _recommendation(int(body.get("k_venue", 5)))
+
+    @app.post("/api/v1/recommendation/inquiry/whatsapp/book-now")
+    async def book_now(request: Request):
+        await request.json()
+        if await _simulate("book_now"):
+            return _error()
+        return {"status": "ok"}
+
+    @app.post("/api/v1/recommendation/inquiry/whatsapp/{ticket_id}/next-recommendation")
+    async def next_recommendation(ticket_id: str):
+        if await _simulate("next"):
+            return _error()
+        return _recommendation(5)
+
+    @app.get("/api/v1/recommendation/inquiry/book/{ticket_id}/{venue_id}")
+    async def book(ticket_id: str, venue_id: str):
+        if await _simulate("book"):
+            return _error()
+        return {"status": "ok"}
+
+    return app
+
+
+def _error():
+    from fastapi.responses import JSONResponse
+    return JSONResponse({"detail": "simulated failure"}, status_code=500)
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake VPS recommendation/booking server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9102)
+    parser.add_argument("--latency", default="", help='e.g. "inquiry=lognormal:1.2:0.3,*=fixed:0.2"')
+    parser.add_argument("--catalog-size", type=int, default=200)
+    parser.add_argument("--empty-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    app = create_app(parse_latency_map(args.latency), args.catalog_size, args.empty_rate, args.error_rate)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
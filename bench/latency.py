@@ -0,0 +1,69 @@
+"""
+Latency distributions for the local fakes.
+
+Spec strings:
+    fixed:0.5               always 0.5s
+    uniform:0.2:0.8         uniform between 0.2s and 0.8s
+    normal:0.6:0.1          normal(mean, stddev), clipped at 0
+    lognormal:0.6:0.4       lognormal with median 0.6s and sigma 0.4 (long tail, like real LLM APIs)
+"""
+
+import math
+import random
+from typing import Dict, List, Optional
+
+
+class LatencyModel:
+    def __init__(self, kind: str = "fixed", params: Optional[List[float]] = None, rng: Optional[random.Random] = None):
+        self.kind = kind
+        self.params = params or [0.0]
+        self.rng = rng or random.Random()
+
+    @classmethod
+    def parse(cls, spec: str, rng: Optional[random.Random] = None) -> "LatencyModel":
+        kind, *params = spec.split(":")
+        if kind not in ("fixed", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+        return cls(kind, [float(p) for p in params], rng=rng)
+
+    def sample(self) -> float:
+        if self.kind == "fixed":
+            return self.params[0]
+        if self.kind == "uniform":
+            return self.rng.uniform(self.params[0], self.params[1])
+        if self.kind == "normal":
+            return max(self.rng.gauss(self.params[0], self.params[1]), 0.0)
+        median, sigma = self.params
+        if median <= 0:
+            return 0.0
+        return self.rng.lognormvariate(math.log(median), sigma)
+
+    def __repr__(self):
+        return ":".join([self.kind] + [str(p) for p in self.params])
+
+
+def parse_latency_map(spec: str, default: str = "fixed:0") -> Dict[str, LatencyModel]:
+    """
+    Parse "gpt-4.1=lognormal:0.9:0.3,gpt-4.1-mini=lognormal:0.5:0.3,*=fixed:0.2"
+    into {key: LatencyModel}; "*" is the fallback for unlisted keys.
+    """
+    models = {"*": LatencyModel.parse(default)}
+    for item in filter(None, (part.strip() for part in (spec or "").split(","))):
+        key, _, value = item.partition("=")
+        if not value:
+            key, value = "*", key
+        models[key] = LatencyModel.parse(value)
+    return models
+
+
+def pick_latency(models: Dict[str, LatencyModel], key: str) -> LatencyModel:
+    return models.get(key) or models["*"]
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of `samples` (0 when empty)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(math.ceil(pct / 100 * len(ordered)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
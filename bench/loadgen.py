@@ -0,0 +1,285 @@
+"""
+Open-loop synthetic load generator.
+
+Simulated WhatsApp users arrive as a Poisson process (plus optional bursts) for a fixed
+duration, independent of how fast the bot answers. Each user runs a scripted scenario:
+they send a message, wait for the reply (or give up after --turn-timeout), "think" for a
+sampled time and send the next one. A share of users abandon their session midway so the
+inactivity watcher gets exercised (its warning fires after INACTIVITY_WARNING_SECONDS, so
+use a long enough --duration / --drain to observe it).
+
+For every message the client-side latency of the webhook ack (HTTP response of /webhook)
+and of the outbound reply (arrival at the fake open-wa sink) are recorded.
+
+In-process (bot + all fakes on this event loop):
+    python -m bench.loadgen --rate 20 --duration 60 --out run.csv
+
+Against an already running bot whose OPEN_WA_HOST/OPEN_WA_PORT point at our sink:
+    python -m bench.loadgen --target http://127.0.0.1:8000 --sink-port 8003 --rate 50 --duration 120 --out run.json
+"""
+
+import sys
+import csv
+import json
+import time
+import random
+import asyncio
+import argparse
+import itertools
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+from bench.e2e import BenchStack, non_reply_texts, start_server, stop_server, summarize
+from bench.fakes import open_wa_server
+from bench.latency import LatencyModel, parse_latency_map
+from bench.scenarios import SCENARIOS, DEFAULT_MIX, parse_mix, phone_for, webhook_payload
+
+PUSHNAMES = ["Ana", "Budi", "Citra", "Dewi", "Eko", "Fajar", "Gita", "Hadi", "Intan", "Joko"]
+
+RECORD_FIELDS = [
+    "user", "scenario", "turn", "sent_at", "status", "ack_seconds", "reply_seconds", "outcome",
+]
+
+
+class MessageRecord:
+    def __init__(self, user: int, scenario: str, turn: int, sent_at: float):
+        self.user = user
+        self.scenario = scenario
+        self.turn = turn
+        self.sent_at = sent_at  # seconds since the run started
+        self.status: Optional[int] = None  # HTTP status of the webhook ack
+        self.ack_seconds: Optional[float] = None
+        self.reply_seconds: Optional[float] = None
+        self.outcome = "pending"  # "ok" | "no_reply" | "http_error"
+
+    def as_dict(self) -> Dict:
+        return {
+            "user": self.user,
+            "scenario": self.scenario,
+            "turn": self.turn,
+            "sent_at": round(self.sent_at, 4),
+            "status": self.status,
+            "ack_seconds": None if self.ack_seconds is None else round(self.ack_seconds, 4),
+            "reply_seconds": None if self.reply_seconds is None else round(self.reply_seconds, 4),
+            "outcome": self.outcome,
+        }
+
+
+class LoadGenerator:
+    def __init__(
+        self,
+        bot_url: str,
+        sink: open_wa_server.OpenWASink,
+        http: httpx.AsyncClient,
+        mix,
+        think_time: LatencyModel,
+        abandon_rate: float,
+        turn_timeout: float,
+        seed: int,
+    ):
+        self.bot_url = bot_url
+        self.sink = sink
+        self.http = http
+        self.mix = mix
+        self.think_time = think_time
+        self.abandon_rate = abandon_rate
+        self.turn_timeout = turn_timeout
+        self.rng = random.Random(seed)
+        self.records: List[MessageRecord] = []
+        self.users = Counter()  # started / completed / abandoned
+        self._user_ids = itertools.count()
+        self._message_ids = itertools.count(1)
+        self._tasks: List[asyncio.Task] = []
+        self._started = 0.0
+
+    def _spawn_user(self):
+        user = next(self._user_ids)
+        names = [name for name, _ in self.mix]
+        weights = [weight for _, weight in self.mix]
+        scenario = self.rng.choices(names, weights=weights)[0]
+        script = SCENARIOS[scenario]
+        # abandoning users walk away after a random turn, without ending the chat
+        abandon_after = self.rng.randint(1, len(script)) if self.rng.random() < self.abandon_rate else None
+        self.users["started"] += 1
+        self._tasks.append(asyncio.create_task(self._run_user(user, scenario, script, abandon_after)))
+
+    async def _run_user(self, user: int, scenario: str, script: List[str], abandon_after: Optional[int]):
+        jid = phone_for(user)
+        pushname = self.rng.choice(PUSHNAMES)
+        for turn, body in enumerate(script, start=1):
+            if abandon_after is not None and turn > abandon_after:
+                self.users["abandoned"] += 1
+                return
+            await self._send(user, scenario, turn, jid, pushname, body)
+            if turn < len(script):
+                await asyncio.sleep(self.think_time.sample())
+        self.users["completed"] += 1
+
+    async def _send(self, user: int, scenario: str, turn: int, jid: str, pushname: str, body: str):
+        started = time.perf_counter()
+        record = MessageRecord(user, scenario, turn, started - self._started)
+        self.records.append(record)
+        payload = webhook_payload(jid, body, f"load_{next(self._message_ids)}", pushname=pushname)
+        reply_wait = asyncio.create_task(self.sink.wait_for_reply(jid, since=started, timeout=self.turn_timeout))
+        try:
+            response = await self.http.post(f"{self.bot_url}/webhook", json=payload)
+            record.status = response.status_code
+            record.ack_seconds = time.perf_counter() - started
+        except httpx.HTTPError:
+            record.outcome = "http_error"
+        reply = await reply_wait
+        if reply is not None:
+            record.reply_seconds = reply[0] - started
+            if record.outcome == "pending":
+                record.outcome = "ok"
+        elif record.outcome == "pending":
+            record.outcome = "no_reply"
+
+    async def run(self, rate: float, duration: float, burst_every: float, burst_size: int, drain: float):
+        """Open-loop arrivals: `rate` new users/s for `duration` s, plus `burst_size` users every `burst_every` s."""
+        self._started = time.perf_counter()
+        deadline = self._started + duration
+        next_burst = self._started + burst_every if burst_every > 0 else float("inf")
+        while True:
+            gap = self.rng.expovariate(rate) if rate > 0 else float("inf")
+            wake_at = min(time.perf_counter() + gap, next_burst)
+            if wake_at >= deadline:
+                break
+            await asyncio.sleep(max(wake_at - time.perf_counter(), 0))
+            if wake_at == next_burst:
+                for _ in range(burst_size):
+                    self._spawn_user()
+                next_burst += burst_every
+            else:
+                self._spawn_user()
+        await asyncio.sleep(max(deadline - time.perf_counter(), 0))
+        # let users already in a conversation finish (bounded by --drain)
+        if self._tasks:
+            _, pending = await asyncio.wait(self._tasks, timeout=drain)
+            for task in pending:
+                task.cancel()
+            self.users["cut_off"] += len(pending)
+        return time.perf_counter() - self._started
+
+    def summary(self, wall_seconds: float) -> Dict:
+        acks = [r.ack_seconds for r in self.records if r.ack_seconds is not None]
+        replies = [r.reply_seconds for r in self.records if r.reply_seconds is not None]
+        outcomes = Counter(r.outcome for r in self.records)
+        session_texts = Counter()
+        ignored = non_reply_texts()
+        for sent in self.sink.sent.values():
+            for _, content in sent:
+                if content in ignored:
+                    session_texts[content[:40]] += 1
+        return {
+            "wall_seconds": round(wall_seconds, 3),
+            "users": dict(self.users),
+            "messages": len(self.records),
+            "messages_per_second": round(len(self.records) / wall_seconds, 3) if wall_seconds else 0.0,
+            "outcomes": dict(outcomes),
+            "ack_latency_seconds": summarize(acks),
+            "reply_latency_seconds": summarize(replies),
+            "non_reply_messages": dict(session_texts),
+        }
+
+
+def write_records(records: List[MessageRecord], summary: Dict, path: str):
+    """CSV (one row per message) or JSON ({"summary": ..., "records": [...]}) by file extension."""
+    target = Path(path)
+    if target.suffix == ".csv":
+        with target.open("w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=RECORD_FIELDS)
+            writer.writeheader()
+            for record in records:
+                writer.writerow(record.as_dict())
+        target.with_suffix(".summary.json").write_text(json.dumps(summary, indent=2) + "\n")
+    else:
+        target.write_text(json.dumps({"summary": summary, "records": [r.as_dict() for r in records]}, indent=2) + "\n")
+
+
+async def run_load(args) -> Dict:
+    stack = None
+    sink_server = None
+    if args.target:
+        # external bot: we only provide the open-wa sink it sends replies to
+        wa_app = open_wa_server.create_app(parse_latency_map(args.open_wa_latency), non_reply_texts())
+        sink_server = await start_server(wa_app, args.sink_port)
+        bot_url, sink = args.target.rstrip("/"), wa_app.state.sink
+    else:
+        stack = BenchStack(
+            parse_latency_map(args.openai_latency),
+            parse_latency_map(args.vps_latency),
+            parse_latency_map(args.open_wa_latency),
+            log_level=args.log_level,
+        )
+        await stack.start()
+        bot_url, sink = stack.bot_url, stack.sink
+
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    try:
+        async with httpx.AsyncClient(timeout=args.turn_timeout + 5, limits=limits) as http:
+            generator = LoadGenerator(
+                bot_url, sink, http, parse_mix(args.mix), LatencyModel.parse(args.think_time),
+                args.abandon_rate, args.turn_timeout, args.seed,
+            )
+            wall_seconds = await generator.run(args.rate, args.duration, args.burst_every, args.burst_size, args.drain)
+    finally:
+        if stack:
+            await stack.stop()
+        if sink_server:
+            await stop_server(sink_server)
+
+    summary = generator.summary(wall_seconds)
+    summary["config"] = {
+        "target": args.target or "in-process",
+        "rate": args.rate,
+        "duration": args.duration,
+        "burst_every": args.burst_every,
+        "burst_size": args.burst_size,
+        "think_time": args.think_time,
+        "abandon_rate": args.abandon_rate,
+        "mix": dict(parse_mix(args.mix)),
+        "seed": args.seed,
+    }
+    if stack:
+        summary["llm_calls"] = stack.fake_openai.total_calls
+    if args.out:
+        write_records(generator.records, summary, args.out)
+    return summary
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Open-loop synthetic WhatsApp load generator")
+    parser.add_argument("--target", help="URL of a running bot (default: start bot and fakes in-process)")
+    parser.add_argument("--sink-port", type=int, default=8003, help="fake open-wa port when using --target")
+    parser.add_argument("--rate", type=float, default=5.0, help="new users per second (Poisson arrivals)")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds during which users arrive")
+    parser.add_argument("--burst-every", type=float, default=0.0, help="seconds between bursts (0 = none)")
+    parser.add_argument("--burst-size", type=int, default=0, help="users arriving at once in a burst")
+    parser.add_argument("--think-time", default="lognormal:4:0.5", help="pause between a reply and the next message")
+    parser.add_argument("--abandon-rate", type=float, default=0.2, help="share of users leaving mid-conversation")
+    parser.add_argument("--drain", type=float, default=120.0, help="max seconds to let running users finish")
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--turn-timeout", type=float, default=20.0, help="seconds to wait for a reply")
+    parser.add_argument("--max-connections", type=int, default=1000)
+    parser.add_argument("--openai-latency", default="gpt-4.1=lognormal:0.8:0.35,*=lognormal:0.45:0.3")
+    parser.add_argument("--vps-latency", default="inquiry=lognormal:0.9:0.3,*=lognormal:0.3:0.2")
+    parser.add_argument("--open-wa-latency", default="*=fixed:0.02")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--log-level", default="warning")
+    parser.add_argument("--out", help="write per-message records to .csv (plus .summary.json) or .json")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None):
+    args = build_parser().parse_args(argv)
+    summary = asyncio.run(run_load(args))
+    print(json.dumps(summary, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,459 @@
+"""
+Microbenchmarks for in-process hot paths.
+
+    python -m bench.micro                                   # all benchmarks, default sizes
+    python -m bench.micro --only chatdb --sizes 10000,1000000
+    python -m bench.micro --only memory --memory-sessions 10000,100000
+    python -m bench.micro --save bench/baselines/micro.json
+    python -m bench.micro --compare bench/baselines/micro.json --threshold 0.25
+
+Each benchmark times individual operations and reports ops/s and p50/p95/p99 in
+microseconds. Results are keyed "<benchmark>[<param>]" so a saved baseline can be compared
+against a later run; --compare exits with status 1 when any p50 regressed by more than
+--threshold (a ratio, 0.25 = 25% slower).
+
+ChatDB benchmarks seed the table straight through the sqlite connection in large
+transactions, so sizes up to 10M rows are practical (but take a while and several GB).
+"""
+
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import platform
+import tempfile
+import shutil
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from bench.latency import percentile
+
+MESSAGES_PER_SESSION = 20
+SEED_BATCH = 50_000
+
+BENCHMARKS: Dict[str, Callable] = {}
+
+
+def benchmark(name: str):
+    def register(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return register
+
+
+def summarize_ops(durations: List[float]) -> Dict[str, float]:
+    total = sum(durations)
+    return {
+        "ops": len(durations),
+        "ops_per_second": round(len(durations) / total, 1) if total else 0.0,
+        "p50_us": round(percentile(durations, 50) * 1e6, 2),
+        "p95_us": round(percentile(durations, 95) * 1e6, 2),
+        "p99_us": round(percentile(durations, 99) * 1e6, 2),
+    }
+
+
+async def time_async(fn: Callable, ops: int) -> List[float]:
+    durations = []
+    for i in range(ops):
+        started = time.perf_counter()
+        await fn(i)
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+def time_sync(fn: Callable, ops: int) -> List[float]:
+    durations = []
+    for i in range(ops):
+        started = time.perf_counter()
+        fn(i)
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+class NullClient:
+    """Stands in for the open-wa client; session warnings are discarded."""
+
+    async def sendText(self, to: str, content: str):
+        return None
+
+
+# -----------------------------
+# ChatDB
+# -----------------------------
+def seed_session_id(i: int) -> str:
+    return f"{i:032x}"
+
+
+def seed_chat_db(conn, rows: int):
+    """Insert `rows` messages spread over rows / MESSAGES_PER_SESSION sessions (+ requirements)."""
+    from core.agent.migrations import is_compact
+
+    compact = is_compact(conn)
+    key = (lambda i: bytes.fromhex(seed_session_id(i))) if compact else seed_session_id
+    session_count = max(rows // MESSAGES_PER_SESSION, 1)
+    now = int(time.time())
+    cur = conn.cursor()
+    for start in range(0, session_count, SEED_BATCH):
+        batch = range(start, min(start + SEED_BATCH, session_count))
+        cur.executemany(
+            "INSERT INTO sessions (id, phone, user_name, started_at, last_activity, status) VALUES (?, ?, ?, ?, ?, 'ended')",
+            ((key(i), f"62811{i:08d}", "Seed", now - 86400, now - 86400) for i in batch),
+        )
+        cur.executemany(
+            "INSERT INTO user_requirements (session_id, event_type, country, location, attendees) VALUES (?, 'wedding', 'Indonesia', 'Bali', 100)",
+            ((key(i),) for i in batch),
+        )
+        conn.commit()
+    for start in range(0, rows, SEED_BATCH):
+        if compact:
+            cur.executemany(
+                "INSERT INTO messages (session_id, seq, sender, body, timestamp) VALUES (?, ?, ?, ?, ?)",
+                (
+                    (key((n // MESSAGES_PER_SESSION) % session_count), n // (MESSAGES_PER_SESSION * session_count) * MESSAGES_PER_SESSION + n % MESSAGES_PER_SESSION + 1,
+                     "user" if n % 2 == 0 else "bot", f"seed message {n}", now - 86400 + n % MESSAGES_PER_SESSION)
+                    for n in range(start, min(start + SEED_BATCH, rows))
+                ),
+            )
+        else:
+            cur.executemany(
+                "INSERT INTO messages (id, session_id, sender, body, timestamp) VALUES (?, ?, ?, ?, ?)",
+                (
+                    (f"m{n:014d}", key((n // MESSAGES_PER_SESSION) % session_count),
+                     "user" if n % 2 == 0 else "bot", f"seed message {n}", now - 86400 + n % MESSAGES_PER_SESSION)
+                    for n in range(start, min(start + SEED_BATCH, rows))
+                ),
+            )
+        conn.commit()
+    return session_count
+
+
+@benchmark("chatdb")
+async def bench_chatdb(sizes: List[int], ops: int, workdir: Path) -> Dict[str, Dict]:
+    from core.agent.session import ChatDB
+
+    results = {}
+    requirements = {
+        "event_type": "wedding", "country": "Indonesia", "location": "Bali", "attendees": 120,
+        "start_date": "2026-12-12", "email": "ana@example.com", "customer_name": "Ana",
+    }
+    for size in sizes:
+        db = ChatDB(workdir / f"chatdb_{size}.db")
+        await db.initialize()
+        sessions = await asyncio.get_running_loop().run_in_executor(None, seed_chat_db, db._conn, size)
+        rng = random.Random(size)
+        picks = [seed_session_id(rng.randrange(sessions)) for _ in range(ops)]
+
+        durations = await time_async(lambda i: db.add_message(picks[i], "user", f"benchmark message {i}"), ops)
+        results[f"chatdb.add_message[{size}]"] = summarize_ops(durations)
+
+        durations = await time_async(lambda i: db.get_messages_for_session(picks[i], limit=20), ops)
+        results[f"chatdb.get_messages_for_session[{size}]"] = summarize_ops(durations)
+
+        durations = await time_async(lambda i: db.update_user_requirements(picks[i], requirements), ops)
+        results[f"chatdb.update_user_requirements.update[{size}]"] = summarize_ops(durations)
+
+        new_ids = [seed_session_id(sessions + i) for i in range(ops)]
+        durations = await time_async(lambda i: db.update_user_requirements(new_ids[i], requirements), ops)
+        results[f"chatdb.update_user_requirements.insert[{size}]"] = summarize_ops(durations)
+
+        venues = {"ticket_id": "VX-1", "venue_recommendations": synthetic_venues(5)}
+        durations = await time_async(lambda i: db.update_user_requirements(picks[i], venues), ops)
+        results[f"chatdb.update_user_requirements.venues[{size}]"] = summarize_ops(durations)
+
+        durations = await time_async(lambda i: db.get_user_requirements(picks[i]), ops)
+        results[f"chatdb.get_user_requirements[{size}]"] = summarize_ops(durations)
+
+        terms = [f'"seed message {rng.randrange(size)}"' for _ in range(ops)]
+        durations = await time_async(lambda i: db.search_messages(terms[i], limit=20), ops)
+        results[f"chatdb.search_messages[{size}]"] = summarize_ops(durations)
+
+        await db.close()
+    return results
+
+
+# -----------------------------
+# SessionManager
+# -----------------------------
+@benchmark("sessions")
+async def bench_sessions(sizes: List[int], ops: int, workdir: Path) -> Dict[str, Dict]:
+    from core.agent.session import ChatDB, SessionManager
+
+    results = {}
+    client = NullClient()
+    for live in sizes:
+        db = ChatDB(workdir / f"sessions_{live}.db")
+        await db.initialize()
+        manager = SessionManager(db)
+        phones = [f"62822{i:08d}" for i in range(live)]
+
+        durations = await time_async(
+            lambda i: manager.ensure_session(phones[i], f"{phones[i]}@c.us", "Bench", client), live
+        )
+        results[f"sessions.ensure_session.create[{live}]"] = summarize_ops(durations)
+
+        rng = random.Random(live)
+        picks = [rng.choice(phones) for _ in range(ops)]
+        durations = await time_async(
+            lambda i: manager.ensure_session(picks[i], f"{picks[i]}@c.us", "Bench", client), ops
+        )
+        results[f"sessions.ensure_session.existing[{live}]"] = summarize_ops(durations)
+
+        durations = await time_async(lambda i: manager.touch_session(picks[i], client), ops)
+        results[f"sessions.touch_session[{live}]"] = summarize_ops(durations)
+
+        await manager.shutdown()
+        await db.close()
+    return results
+
+
+@benchmark("memory")
+async def bench_memory(sizes: List[int], ops: int, workdir: Path) -> Dict[str, Dict]:
+    """Python heap held per active session: SessionManager entries, timers and in-memory state."""
+    import gc
+    import tracemalloc
+    from core.agent.session import ChatDB, SessionManager
+
+    results = {}
+    client = NullClient()
+    for live in sizes:
+        db = ChatDB(workdir / f"memory_{live}.db")
+        await db.initialize()
+        manager = SessionManager(db, max_entries=max(live, 1))
+        gc.collect()
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        for i in range(live):
+            phone = f"62833{i:08d}"
+            await manager.ensure_session(phone, f"{phone}@c.us", "Bench", client)
+        gc.collect()
+        held = tracemalloc.get_traced_memory()[0] - baseline
+        tracemalloc.stop()
+        results[f"memory.sessions[{live}]"] = {
+            "sessions": len(manager._sessions),
+            "timers": len(manager._timers),
+            "bytes_total": held,
+            "bytes_per_session": round(held / live, 1),
+        }
+        await manager.shutdown()
+        await db.close()
+    return results
+
+
+# -----------------------------
+# Formatting / prompt construction
+# -----------------------------
+def synthetic_venues(count: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "payload": {
+                "id": str(1000 + i),
+                "name": f"Grand **Pavilion** {i}",
+                "location": "Nusa Dua, Bali",
+                "type": "ballroom",
+                "amenities": "parking, wifi, `catering`, _sound system_, stage",
+            },
+            "score": 0.9,
+        }
+        for i in range(count)
+    ]
+
+
+@benchmark("formatting")
+async def bench_formatting(sizes: List[int], ops: int, workdir: Path) -> Dict[str, Dict]:
+    from core.agent.session import markdown_to_whatsapp
+    from core.agent.templates import render_venue_list
+
+    results = {}
+    for count in (5, 50, 500):
+        venues = synthetic_venues(count)
+        results[f"formatting.render_venue_list[{count}]"] = summarize_ops(
+            time_sync(lambda i: render_venue_list(venues), ops)
+        )
+        text = render_venue_list(venues)
+        results[f"formatting.markdown_to_whatsapp[{count}]"] = summarize_ops(
+            time_sync(lambda i: markdown_to_whatsapp(text), ops)
+        )
+    return results
+
+
+@benchmark("prompts")
+async def bench_prompts(sizes: List[int], ops: int, workdir: Path) -> Dict[str, Dict]:
+    """Prompt and schema construction in core/agent/llm.py, with the OpenAI round trip stubbed out."""
+    from core.agent import llm
+    from core.agent.config import question_class_details
+
+    async def instant_completion(openai_client, user_prompt, system_prompt=None, formatted_schema=None, **kwargs):
+        if formatted_schema and formatted_schema["name"] == "question_class":
+            enum = formatted_schema["schema"]["properties"]["question_class"]["enum"]
+            return {"question_class": "inquiry" if "inquiry" in enum else enum[0]}
+        return {} if formatted_schema else ""
+
+    messages = [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i} about a wedding venue in Bali"}
+        for i in range(10)
+    ]
+    venue_recommendation = {"ticket_id": "VX-1", "top_k_venues": synthetic_venues(5)}
+    cases = {
+        "get_question_class": lambda: llm.get_question_class(None, messages, question_class_details),
+        "get_venue_conclusion": lambda: llm.get_venue_conclusion(None, messages, venue_recommendation),
+        "get_confirm_booking": lambda: llm.get_confirm_booking(None, messages, venue_recommendation),
+        "extract_user_requirements": lambda: llm.extract_user_requirements(None, messages),
+        "get_final_response": lambda: llm.get_final_response(None, messages, extra_prompt="Be brief."),
+    }
+    results = {}
+    original = llm.chat_completion
+    llm.chat_completion = instant_completion
+    try:
+        for name, call in cases.items():
+            results[f"prompts.{name}[10]"] = summarize_ops(await time_async(lambda i: call(), ops))
+    finally:
+        llm.chat_completion = original
+    return results
+
+
+# -----------------------------
+# Webhook ingress
+# -----------------------------
+def open_wa_body(event: str, group: bool = False) -> bytes:
+    """A webhook body about the size of a real open-wa message event (~3 KB: sender and chat objects)."""
+    from bench.scenarios import webhook_payload
+
+    jid = "62811000001@c.us"
+    payload = webhook_payload(jid, "Hi, I need a wedding venue in Bali for 200 guests", "false_62811000001@c.us_3EB0")
+    payload["event"] = event
+    data = payload["data"]
+    data["isGroupMsg"] = group
+    contact = {
+        "id": jid, "name": "Bench User", "shortName": "Bench", "pushname": "Bench User", "type": "in",
+        "isBusiness": False, "isEnterprise": False, "isMe": False, "isMyContact": True, "isPSA": False,
+        "isUser": True, "isWAContact": True, "labels": [], "statusMute": False,
+        "profilePicThumbObj": {"eurl": "https://pps.whatsapp.net/v/t61.24694-24/" + "x" * 400, "id": jid, "tag": "1700000000"},
+    }
+    data["sender"] = contact
+    data["chat"] = {
+        "id": jid, "pendingMsgs": False, "lastReceivedKey": {"fromMe": False, "remote": jid, "id": "3EB0", "_serialized": data["id"]},
+        "t": data["t"], "unreadCount": 1, "archive": False, "isReadOnly": False, "muteExpiration": 0,
+        "name": "Bench User", "notSpam": True, "pin": 0, "msgs": None, "kind": "chat", "isGroup": group, "contact": contact,
+        "groupMetadata": None, "presence": {"id": jid, "chatstates": []},
+    }
+    data.update({
+        "ack": 1, "isNewMsg": True, "star": False, "recvFresh": True, "broadcast": False, "mentionedJidList": [],
+        "isForwarded": False, "labels": [], "quotedMsg": None, "mediaData": {}, "to": "62800000000@c.us",
+    })
+    return json.dumps(payload).encode()
+
+
+@benchmark("ingress")
+async def bench_ingress(sizes: List[int], ops: int, workdir: Path) -> Dict[str, Dict]:
+    """Webhook decoding: the json.loads path the bot used before vs core/agent/ingress.py."""
+    from core.agent.ingress import decode_webhook
+
+    def json_path(body: bytes):
+        payload = json.loads(body)
+        if payload.get("event") == "onMessage":
+            data = payload.get("data", {})
+            return not (data.get("isGroupMsg") or data.get("fromMe"))
+        return False
+
+    bodies = {
+        "onAnyMessage": open_wa_body("onAnyMessage"),
+        "onMessage": open_wa_body("onMessage"),
+        "group": open_wa_body("onMessage", group=True),
+    }
+    results = {}
+    for name, body in bodies.items():
+        results[f"ingress.json[{name}]"] = summarize_ops(time_sync(lambda i: json_path(body), ops))
+        results[f"ingress.decode_webhook[{name}]"] = summarize_ops(time_sync(lambda i: decode_webhook(body), ops))
+    return results
+
+
+# -----------------------------
+# Baselines
+# -----------------------------
+def compare(current: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float) -> List[Dict]:
+    """Benchmarks whose p50 got slower than baseline by more than `threshold` (ratio)."""
+    regressions = []
+    for key, result in sorted(current.items()):
+        base = baseline.get(key)
+        if not base or not base.get("p50_us"):
+            continue
+        ratio = result["p50_us"] / base["p50_us"]
+        if ratio > 1 + threshold:
+            regressions.append({
+                "benchmark": key,
+                "baseline_p50_us": base["p50_us"],
+                "p50_us": result["p50_us"],
+                "ratio": round(ratio, 3),
+            })
+    return regressions
+
+
+async def run(args) -> Dict[str, Any]:
+    import core.agent.session  # noqa: F401  (registers the core loggers before they are quieted)
+
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith("core"):
+            logging.getLogger(name).setLevel(logging.WARNING)
+    selected = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        raise SystemExit(f"Unknown benchmark(s): {sorted(unknown)}, expected {sorted(BENCHMARKS)}")
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    live_sessions = [int(s) for s in args.live_sessions.split(",")]
+    memory_sessions = [int(s) for s in args.memory_sessions.split(",")]
+    workdir = Path(tempfile.mkdtemp(prefix="wa_bot_micro_"))
+    results: Dict[str, Dict] = {}
+    try:
+        for name in selected:
+            started = time.perf_counter()
+            params = {"sessions": live_sessions, "memory": memory_sessions}.get(name, sizes)
+            results.update(await BENCHMARKS[name](params, args.ops, workdir))
+            print(f"{name}: {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "ops": args.ops,
+            "created_at": int(time.time()),
+        },
+        "results": results,
+    }
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Microbenchmarks for ChatDB, SessionManager and formatting hot paths")
+    parser.add_argument("--only", help=f"comma separated subset of {sorted(BENCHMARKS)}")
+    parser.add_argument("--sizes", default="10000,100000", help="ChatDB message table sizes (rows)")
+    parser.add_argument("--live-sessions", default="10000", help="live sessions for the SessionManager churn")
+    parser.add_argument("--memory-sessions", default="10000,100000", help="active sessions for the memory benchmark")
+    parser.add_argument("--ops", type=int, default=2000, help="timed operations per benchmark")
+    parser.add_argument("--save", help="write the results as a JSON baseline")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed p50 slowdown ratio before failing")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None):
+    args = build_parser().parse_args(argv)
+    report = asyncio.run(run(args))
+    exit_code = 0
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        report["regressions"] = compare(report["results"], baseline.get("results", {}), args.threshold)
+        exit_code = 1 if report["regressions"] else 0
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.save:
+        Path(args.save).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.save).write_text(output + "\n")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
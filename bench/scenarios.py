@@ -0,0 +1,89 @@
+"""
+Scripted conversations for the offline benchmarks.
+
+A scenario is a list of user messages sent one after another by a single WhatsApp user.
+The texts are written against the canned outputs of bench.fakes.openai_server (question
+classification by keyword, regex requirement extraction), so each script walks the intended
+path through chat_response.
+"""
+
+import time
+import random
+from typing import Dict, List, Tuple
+
+SCENARIOS: Dict[str, List[str]] = {
+    # small talk, ends with end_session
+    "chitchat": [
+        "Hi!",
+        "What can you help me with?",
+        "Thanks, bye",
+    ],
+    # requirements gathering and a venue list
+    "browse": [
+        "Hello",
+        "I'm looking for a wedding venue in Bali, Indonesia for 150 guests on 2026-12-12",
+        "Could you recommend a venue with a garden?",
+    ],
+    # venue list, then detail questions answered from the local venue index
+    "details": [
+        "I'm looking for a conference venue in Bali, Indonesia for 80 guests on 2026-10-02",
+        "Please recommend a venue",
+        "Which of those has parking?",
+        "Where is the second one?",
+    ],
+    # venue list, selection and booking details
+    "booking": [
+        "Hi, I need a meeting room in Jakarta, Indonesia for 20 people on 2026-11-20",
+        "Please recommend a venue",
+        "Book the second one",
+        "My name is Ana Putri, email ana.putri@example.com",
+    ],
+}
+
+DEFAULT_MIX = "browse=0.5,booking=0.3,chitchat=0.2"
+
+
+def parse_mix(spec: str) -> List[Tuple[str, float]]:
+    """Parse "browse=0.5,booking=0.3,chitchat=0.2" into normalized (scenario, weight) pairs."""
+    pairs = []
+    for item in filter(None, (part.strip() for part in (spec or DEFAULT_MIX).split(","))):
+        name, _, weight = item.partition("=")
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown scenario '{name}', expected one of {sorted(SCENARIOS)}")
+        pairs.append((name, float(weight or 1)))
+    total = sum(weight for _, weight in pairs)
+    if total <= 0:
+        raise ValueError(f"Scenario mix has no weight: {spec}")
+    return [(name, weight / total) for name, weight in pairs]
+
+
+def pick_scenarios(mix: List[Tuple[str, float]], count: int, seed: int = 1) -> List[str]:
+    """`count` scenario names drawn from `mix` (deterministic for a given seed)."""
+    rng = random.Random(seed)
+    names = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+    return rng.choices(names, weights=weights, k=count)
+
+
+def phone_for(index: int) -> str:
+    """Distinct synthetic WhatsApp id per simulated user."""
+    return f"62800{index:07d}@c.us"
+
+
+def webhook_payload(jid: str, body: str, message_id: str, pushname: str = "Bench User") -> Dict:
+    """An open-wa `onMessage` webhook body, as posted to the bot's /webhook."""
+    return {
+        "event": "onMessage",
+        "data": {
+            "id": message_id,
+            "t": int(time.time()),
+            "from": jid,
+            "chatId": jid,
+            "body": body,
+            "type": "chat",
+            "isGroupMsg": False,
+            "fromMe": False,
+            "notifyName": pushname,
+            "sender": {"id": jid, "pushname": pushname},
+        },
+    }
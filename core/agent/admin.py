@@ -0,0 +1,185 @@
+"""
+Read-only admin API for inspecting live state: sessions, transcripts, requirements, search.
+
+    GET /admin/sessions?status=active&limit=100&cursor=...   sessions, most recently active first
+    GET /admin/sessions/{session_id}                          one session with its requirements
+    GET /admin/sessions/{session_id}/messages?cursor=...      transcript, oldest first
+    GET /admin/sessions/{session_id}/requirements
+    GET /admin/phones/{phone}/sessions?cursor=...             a phone's sessions, newest first
+    GET /admin/search?q=wedding+bali&phone=...&since=7d       full-text message search
+
+Lists are keyset-paginated: a response ends with `next_cursor`, which is passed back as
+`cursor` for the next page (null on the last one). Every page is a range scan of an index,
+so page 1000 costs the same as page 1. The reads run on ChatDB's read-only reader pool and
+are fetched in chunks of ADMIN_FETCH_CHUNK rows, with the JSON streamed as they arrive,
+so operator traffic never queues behind the bot's writer.
+
+The API is only mounted when ADMIN_API_KEY is set, and every request must then send it in
+an `X-API-Key` header. Without a key the /admin paths are 404.
+"""
+
+import hmac
+import json
+import base64
+import binascii
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from core.agent.config import ADMIN_PAGE_DEFAULT, ADMIN_PAGE_MAX, ADMIN_FETCH_CHUNK, SEARCH_DEFAULT_LIMIT
+from core.agent.search import parse_time
+from core.agent.session import get_chat_db
+from core.logger import get_logger
+from core.settings import settings
+
+logger = get_logger(__name__, service="Agent")
+
+ADMIN_API_KEY = settings.admin_api_key
+
+Page = Tuple[List[Any], Optional[List[Any]]]
+Fetch = Callable[[Optional[List[Any]], int], Awaitable[Page]]
+
+
+def require_api_key(request: Request):
+    supplied = request.headers.get("x-api-key", "")
+    # constant-time comparison; an unset key never matches (the router should not be mounted then)
+    if not ADMIN_API_KEY or not hmac.compare_digest(supplied.encode(), ADMIN_API_KEY.encode()):
+        raise HTTPException(status_code=401, detail="invalid or missing X-API-Key")
+
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(require_api_key)])
+
+
+# -----------------------------
+# Cursors and streaming
+# -----------------------------
+def encode_cursor(key: Optional[List[Any]]) -> Optional[str]:
+    if key is None:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(key, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[List[Any]]:
+    if not cursor:
+        return None
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    if not isinstance(key, list) or not key or not all(isinstance(value, (int, float, str)) for value in key):
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    return key
+
+
+async def _stream_pages(fetch: Fetch, first: Page, remaining: int) -> AsyncIterator[str]:
+    """`{"items": [...], "next_cursor": ...}`, fetched ADMIN_FETCH_CHUNK rows at a time."""
+    yield '{"items":['
+    separator = ""
+    rows, after = first
+    while True:
+        for row in rows:
+            yield separator + json.dumps(row, ensure_ascii=False, default=str)
+            separator = ","
+        remaining -= len(rows)
+        if after is None or remaining <= 0:
+            break
+        rows, after = await fetch(after, min(ADMIN_FETCH_CHUNK, remaining))
+    yield f'],"next_cursor":{json.dumps(encode_cursor(after))}}}'
+
+
+async def _paged_response(fetch: Fetch, cursor: Optional[str], limit: int) -> StreamingResponse:
+    # the first chunk is read before the response starts, so a cursor the DB rejects is still a 400
+    try:
+        first = await fetch(decode_cursor(cursor), min(ADMIN_FETCH_CHUNK, limit))
+    except (ValueError, TypeError, IndexError):
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    return StreamingResponse(_stream_pages(fetch, first, limit), media_type="application/json")
+
+
+async def _session_or_404(db, session_id: str):
+    try:
+        session = await db.get_session(session_id)
+    except ValueError:  # not a valid id for this layout
+        session = None
+    if session is None:
+        raise HTTPException(status_code=404, detail="session not found")
+    return session
+
+
+# -----------------------------
+# Endpoints
+# -----------------------------
+@router.get("/sessions")
+async def list_sessions(
+    status: Optional[str] = Query(None, description="e.g. active, ended"),
+    limit: int = Query(ADMIN_PAGE_DEFAULT, ge=1, le=ADMIN_PAGE_MAX),
+    cursor: Optional[str] = None,
+):
+    db = await get_chat_db()
+
+    async def fetch(after, count):
+        return await db.page_sessions(status=status, after=after, limit=count)
+
+    return await _paged_response(fetch, cursor, limit)
+
+
+@router.get("/sessions/{session_id}")
+async def get_session(session_id: str):
+    db = await get_chat_db()
+    session = await _session_or_404(db, session_id)
+    return {"session": session, "requirements": await db.get_user_requirements(session_id)}
+
+
+@router.get("/sessions/{session_id}/messages")
+async def session_messages(
+    session_id: str,
+    limit: int = Query(ADMIN_PAGE_DEFAULT, ge=1, le=ADMIN_PAGE_MAX),
+    cursor: Optional[str] = None,
+):
+    db = await get_chat_db()
+    await _session_or_404(db, session_id)
+
+    async def fetch(after, count):
+        return await db.page_messages(session_id, after=after, limit=count)
+
+    return await _paged_response(fetch, cursor, limit)
+
+
+@router.get("/sessions/{session_id}/requirements")
+async def session_requirements(session_id: str):
+    db = await get_chat_db()
+    await _session_or_404(db, session_id)
+    return await db.get_user_requirements(session_id)
+
+
+@router.get("/phones/{phone}/sessions")
+async def phone_sessions(
+    phone: str,
+    limit: int = Query(ADMIN_PAGE_DEFAULT, ge=1, le=ADMIN_PAGE_MAX),
+    cursor: Optional[str] = None,
+):
+    db = await get_chat_db()
+
+    async def fetch(after, count):
+        return await db.page_sessions(phone=phone, after=after, limit=count)
+
+    return await _paged_response(fetch, cursor, limit)
+
+
+@router.get("/search")
+async def search(
+    q: str = Query(..., min_length=1, description='FTS5 query: words, "a phrase", prefix*, OR, NOT'),
+    phone: Optional[str] = None,
+    since: Optional[str] = Query(None, description="epoch, ISO date/datetime or age (30m, 24h, 7d)"),
+    until: Optional[str] = None,
+    sender: Optional[str] = None,
+    limit: int = Query(SEARCH_DEFAULT_LIMIT, ge=1, le=ADMIN_PAGE_MAX),
+):
+    try:
+        since_ts, until_ts = parse_time(since), parse_time(until)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid since/until")
+    db = await get_chat_db()
+    results = await db.search_messages(q, phone=phone, since=since_ts, until=until_ts, sender=sender, limit=limit)
+    return {"items": results}
@@ -0,0 +1,169 @@
+"""
+Admission control for incoming turns.
+
+At most ADMISSION_MAX_IN_FLIGHT turns run at once per worker; up to ADMISSION_MAX_QUEUE
+more wait for a slot, served by priority and then arrival:
+
+    PRIORITY_CONFIRMATION  a booking confirmation ("book 2", an e-mail address, "confirm")
+    PRIORITY_ACTIVE        a user whose session this worker holds
+    PRIORITY_NEW           first contact (greetings, new inquiries)
+
+When the queue is full, the lowest-priority waiter is dropped for a higher-priority
+arrival. Otherwise the arrival itself is dropped. A turn that waits longer than
+ADMISSION_MAX_WAIT_SECONDS is dropped too. Dropped (shed) turns get the canned
+AGENT_BUSY_MESSAGE, at most once per user per ADMISSION_BUSY_WINDOW_SECONDS, instead of
+holding a coroutine, an open-wa connection and memory while the backlog grows.
+
+Everything runs on the event loop, so no locks are needed.
+"""
+
+import re
+import time
+import heapq
+import asyncio
+import itertools
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+from core.agent.config import (
+    ADMISSION_MAX_IN_FLIGHT,
+    ADMISSION_MAX_QUEUE,
+    ADMISSION_MAX_WAIT_SECONDS,
+    ADMISSION_BUSY_WINDOW_SECONDS,
+    ADMISSION_CONFIRMATION_PATTERN,
+)
+from core.logger import get_logger
+from core.metrics import ADMISSION_QUEUE_DEPTH, ADMISSION_WAIT_SECONDS, TURNS_SHED
+
+logger = get_logger(__name__, service="Agent")
+
+# Lower value = admitted first
+PRIORITY_CONFIRMATION = 0
+PRIORITY_ACTIVE = 1
+PRIORITY_NEW = 2
+PRIORITY_NAMES = {PRIORITY_CONFIRMATION: "confirmation", PRIORITY_ACTIVE: "active", PRIORITY_NEW: "new"}
+
+CONFIRMATION_PATTERN = re.compile(ADMISSION_CONFIRMATION_PATTERN, re.IGNORECASE)
+
+
+def turn_priority(text: str, active_session: bool) -> int:
+    if CONFIRMATION_PATTERN.search(text or ""):
+        return PRIORITY_CONFIRMATION
+    return PRIORITY_ACTIVE if active_session else PRIORITY_NEW
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "future")
+
+    def __init__(self, priority: int, seq: int, future: asyncio.Future):
+        self.priority = priority
+        self.seq = seq
+        self.future = future
+
+    def __lt__(self, other: "_Waiter"):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_in_flight: int = ADMISSION_MAX_IN_FLIGHT,
+        max_queue: int = ADMISSION_MAX_QUEUE,
+        max_wait: float = ADMISSION_MAX_WAIT_SECONDS,
+        busy_window: float = ADMISSION_BUSY_WINDOW_SECONDS,
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.busy_window = busy_window
+        self.in_flight = 0
+        self._queue: List[_Waiter] = []  # heap; waiters that gave up are removed lazily
+        self._queued = 0
+        self._seq = itertools.count()
+        self._busy_sent: "OrderedDict[str, float]" = OrderedDict()  # phone -> when, oldest first
+        ADMISSION_QUEUE_DEPTH.set_function(lambda: [({}, float(self._queued))])
+
+    @property
+    def queued(self) -> int:
+        return self._queued
+
+    @property
+    def saturated(self) -> bool:
+        """Every slot busy and the queue full: new first-contact turns are being shed."""
+        return self.in_flight >= self.max_in_flight and self._queued >= self.max_queue
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queued": self._queued,
+            "max_queue": self.max_queue,
+        }
+
+    async def acquire(self, priority: int) -> bool:
+        """Take a turn slot, waiting in the queue if needed. False = shed; do not call release()."""
+        if self.in_flight < self.max_in_flight and not self._queued:
+            self.in_flight += 1
+            ADMISSION_WAIT_SECONDS.observe(0.0, priority=PRIORITY_NAMES[priority])
+            return True
+        if self._queued >= self.max_queue and not self._displace(priority):
+            TURNS_SHED.inc(priority=PRIORITY_NAMES[priority], reason="queue_full")
+            return False
+
+        waiter = _Waiter(priority, next(self._seq), asyncio.get_running_loop().create_future())
+        if len(self._queue) >= 2 * self.max_queue:
+            # drop displaced / timed-out waiters that release() has not popped yet
+            self._queue = [queued for queued in self._queue if not queued.future.done()]
+            heapq.heapify(self._queue)
+        heapq.heappush(self._queue, waiter)
+        self._queued += 1
+        started = time.perf_counter()
+        try:
+            admitted = await asyncio.wait_for(asyncio.shield(waiter.future), timeout=self.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.future.done() and not waiter.future.cancelled() and waiter.future.result():
+                # the slot was handed over just as we gave up: pass it on
+                self.release()
+            elif not waiter.future.done():
+                waiter.future.cancel()
+                self._queued -= 1
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            TURNS_SHED.inc(priority=PRIORITY_NAMES[priority], reason="timeout")
+            return False
+        ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - started, priority=PRIORITY_NAMES[priority])
+        if not admitted:
+            TURNS_SHED.inc(priority=PRIORITY_NAMES[priority], reason="displaced")
+        return admitted
+
+    def _displace(self, priority: int) -> bool:
+        """Drop the lowest-priority, most recent waiter if it ranks below `priority`."""
+        live = [waiter for waiter in self._queue if not waiter.future.done()]
+        if not live:
+            return False
+        victim = max(live)
+        if victim.priority <= priority:
+            return False
+        victim.future.set_result(False)
+        self._queued -= 1
+        return True
+
+    def release(self):
+        """Give the slot to the best waiter, or free it."""
+        while self._queue:
+            waiter = heapq.heappop(self._queue)
+            if not waiter.future.done():
+                waiter.future.set_result(True)
+                self._queued -= 1
+                return
+        self.in_flight -= 1
+
+    def should_send_busy(self, phone: str) -> bool:
+        """True at most once per phone per busy window."""
+        now = time.monotonic()
+        while self._busy_sent and now - next(iter(self._busy_sent.values())) >= self.busy_window:
+            self._busy_sent.popitem(last=False)
+        if phone in self._busy_sent:
+            return False
+        self._busy_sent[phone] = now
+        return True
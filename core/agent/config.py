@@ -4,11 +4,145 @@ INACTIVITY_END_SECONDS = 5 * 60  # 5 minutes
 FORCED_SESSION_SECONDS = 1 * 30 * 30  # 1 hour
 FORCED_WARNING_BEFORE = 5 * 60  # 5 minutes
 
+# Chat DB Configuration (location / shard count from CHAT_DB_PATH / CHAT_DB_SHARDS env)
+CHAT_DB_READ_CONNECTIONS = 4  # read-only connections per DB file (the writer has its own)
+SEARCH_DEFAULT_LIMIT = 20  # message search results (core/agent/search.py)
+SEARCH_SNIPPET_TOKENS = 12  # words of context in each search snippet
+EXPORT_CHUNK_ROWS = 10000  # rows per fetch / written batch of the analytics export (core/agent/export.py)
+# Export files are Parquet only when the optional pyarrow package is installed (it is not in
+# requirements.txt); otherwise, and with --format csv, they are gzipped CSV.
+EXPORT_LAG_SECONDS = 120  # exports stop this far behind now (well over a turn), so turns in flight land in the next run
+ADMIN_PAGE_DEFAULT = 100  # rows per admin API page (core/agent/admin.py)
+ADMIN_PAGE_MAX = 1000
+ADMIN_FETCH_CHUNK = 200  # rows per read-pool query while streaming a page
+VENUE_CATALOG_SIZE = 5000  # venue payloads kept in the in-process LRU (core/agent/venue_catalog.py)
+
+# Retention Configuration (core/agent/retention.py, archive location from CHAT_ARCHIVE_DIR env)
+RETENTION_ENABLED = False  # opt-in: when on, archived sessions are deleted from the live DB
+RETENTION_DAYS = 90  # sessions ended longer ago than this move to the monthly archive files
+RETENTION_INTERVAL_SECONDS = 6 * 60 * 60
+RETENTION_BATCH_SESSIONS = 200  # sessions archived + deleted per write transaction
+RETENTION_BATCH_PAUSE_SECONDS = 0.5  # gives live traffic the writer between batches
+RETENTION_VACUUM_PAGES = 1000  # free pages returned to the OS per incremental_vacuum step
+
+# Shared Session State Configuration (backend selected by SESSION_STATE_BACKEND / REDIS_URL env)
+SESSION_STATE_KEY_PREFIX = "wa_bot:"
+SESSION_LEASE_SECONDS = 60  # a worker owns a session's timers for this long without renewing
+SESSION_LEASE_RENEW_SECONDS = 20  # owners renew their leases this often
+SESSION_SWEEP_SECONDS = 60  # how often workers adopt sessions whose owner went away
+SESSION_MAX_ENTRIES = 200_000  # session entries kept in memory per worker; least recently active evicted (stay in the DB)
+SESSION_INTERN_JIDS = True  # one shared str per phone / jid across entries, state and timers
+SESSION_EXPIRE_BATCH = 500  # abandoned idle DB sessions ended per sweep
+
+# Dispatcher Configuration (core/agent/dispatcher.py, worker count from --workers / BOT_WORKERS env)
+DISPATCHER_VIRTUAL_NODES = 64  # points per worker on the consistent-hash ring
+DISPATCHER_FORWARD_TIMEOUT_SECONDS = 90  # workers answer /webhook only after the turn is done
+DISPATCHER_WORKER_START_TIMEOUT_SECONDS = 30
+DISPATCHER_RESTART_BACKOFF_SECONDS = 2
+
+# Admission Control Configuration (core/agent/admission.py)
+ADMISSION_MAX_IN_FLIGHT = 64  # turns processed at once per worker
+ADMISSION_MAX_QUEUE = 256  # turns waiting for a slot; past this the lowest priority is shed
+ADMISSION_MAX_WAIT_SECONDS = 20  # a queued turn that waits longer is shed (its reply would be late anyway)
+ADMISSION_BUSY_WINDOW_SECONDS = 300  # a shed user gets AGENT_BUSY_MESSAGE at most once per window
+ADMISSION_CONFIRMATION_PATTERN = r"^\s*book\s+\d+\s*$|\bconfirm|\b[\w.+-]+@[\w-]+\.[\w.]+\b"  # booking confirmations, served first
+
+# Startup Configuration (core/agent/main.py, disable the warm-up with BOT_WARMUP=0)
+STARTUP_WARMUP_TIMEOUT_SECONDS = 10  # per warm-up step (DB, OpenAI, VPS, webhook); a slow step is skipped, not fatal
+STARTUP_OPENAI_PROBE = True  # GET /v1/models during warm-up to open the OpenAI connection (and check the key)
+
 # Messages Configuration
 AGENT_ERROR_DEFAULT_MESSAGE = "Sorry, but I can't assist you with that."
 AGENT_SESSION_WARNING_MESSAGE = "Mary will end this chat in 2 minutes due to inactivity. Just reply to continue the conversation."
 AGENT_SESSION_LIMIT_MESSAGE = "Mary will end this chat in 5 minutes due to session limit."
 AGENT_SESSION_END_MESSAGE = "Thank you for contacting Mary! If you need help again later, feel free to reach out anytime."
+AGENT_TIMEOUT_MESSAGE = "Sorry, this is taking longer than expected. Please try again in a moment."
+AGENT_EARLY_ACK_MESSAGE = "One moment please, I'm looking into it…"
+AGENT_VENUE_SEARCH_ACK_MESSAGE = "Searching venues for you…"
+AGENT_BUSY_MESSAGE = "Mary is helping a lot of people right now. Please send your message again in a few minutes."
+
+
+# Turn Deadline Configuration
+TURN_DEADLINE_SECONDS = 12  # overall latency budget for answering one incoming message
+EXTRACTION_MIN_BUDGET_SECONDS = 8  # skip requirements extraction when less budget remains
+VENUE_SUMMARY_MIN_BUDGET_SECONDS = 7  # skip the venue summary LLM call when less budget remains
+
+
+# Perceived Latency Configuration
+TYPING_INDICATOR_ENABLED = True
+TYPING_REFRESH_SECONDS = 10  # WhatsApp drops the typing state after a while, so it is re-sent
+EARLY_ACK_AFTER_SECONDS = 4  # send a short acknowledgement when a turn runs longer than this
+
+
+# Venue Selection Resolver Configuration
+VENUE_RESOLVER_MIN_CONFIDENCE = 0.8  # below this, get_confirm_booking (LLM) decides
+VENUE_RESOLVER_AMBIGUITY_MARGIN = 0.1  # top two venues closer than this are ambiguous
+VENUE_RESOLVER_MAX_MESSAGES = 3  # recent user messages searched for a selection
+
+# Venue Index Configuration (follow-up detail questions, core/agent/venue_index.py)
+VENUE_INDEX_MAX_VENUES = 20000  # payloads in the inverted index, oldest evicted first
+
+
+# Response Templates Configuration
+# Deterministic replies (venue lists, missing booking fields, booking results) are rendered
+# from these templates instead of going through the final-response LLM.
+DEFAULT_LOCALE = "en"
+# Map phone prefixes (country calling codes) to a locale, e.g. {"62": "id"}. Longest prefix wins.
+LOCALE_BY_PHONE_PREFIX = {}
+RESPONSE_TEMPLATES = {
+    "en": {
+        "venue_list_header_one": "I have found one venue that fits your criteria:",
+        "venue_list_header_many": "I have found {count} venues that fit your criteria:",
+        "venue_list_footer_one": "Would you like to proceed with booking this venue?",
+        "venue_list_footer_many": "Which venue do you prefer? Let me know so I can assist you with the booking.",
+        "venue_item": "{index}. *{name}*\n   📍 Location: {location}\n   🏷️ Type: {type}\n   ⭐ Amenities: {amenities}",
+        "venue_unknown_name": "Unknown",
+        "venue_missing_value": "N/A",
+        "missing_fields_header": "Please provide your {fields} so we can proceed with the booking confirmation.",
+        "missing_fields_footer": "",
+        "field_customer_name": "full name",
+        "field_email": "email address",
+        "field_event_date": "event date (when you want to book the venue)",
+        "list_conjunction": "and",
+        "booking_result_footer": "Is there anything else I can help you with?",
+        "label_location": "📍 Location",
+        "label_type": "🏷️ Type",
+        "label_amenities": "⭐ Amenities",
+        "venue_detail_has": "Yes, *{name}* lists {terms}:",
+        "venue_detail_has_not": "*{name}* does not list {terms}:",
+        "venue_filter_header_one": "Of the venues I showed you, only this one lists {terms}:",
+        "venue_filter_header_many": "Of the venues I showed you, these list {terms}:",
+        "venue_filter_item": "{index}. *{name}*",
+        "venue_filter_none": "None of the venues I showed you list {terms}.",
+        "venue_detail_footer": "Would you like to book one of them, or is there anything else you want to know?",
+    },
+    "id": {
+        "venue_list_header_one": "Saya menemukan satu venue yang sesuai dengan kriteria Anda:",
+        "venue_list_header_many": "Saya menemukan {count} venue yang sesuai dengan kriteria Anda:",
+        "venue_list_footer_one": "Apakah Anda ingin melanjutkan pemesanan venue ini?",
+        "venue_list_footer_many": "Venue mana yang Anda pilih? Beri tahu saya agar saya dapat membantu pemesanannya.",
+        "venue_item": "{index}. *{name}*\n   📍 Lokasi: {location}\n   🏷️ Tipe: {type}\n   ⭐ Fasilitas: {amenities}",
+        "venue_unknown_name": "Tidak diketahui",
+        "venue_missing_value": "-",
+        "missing_fields_header": "Mohon berikan {fields} Anda agar kami dapat melanjutkan konfirmasi pemesanan.",
+        "missing_fields_footer": "",
+        "field_customer_name": "nama lengkap",
+        "field_email": "alamat email",
+        "field_event_date": "tanggal acara (kapan Anda ingin memesan venue)",
+        "list_conjunction": "dan",
+        "booking_result_footer": "Apakah ada hal lain yang bisa saya bantu?",
+        "label_location": "📍 Lokasi",
+        "label_type": "🏷️ Tipe",
+        "label_amenities": "⭐ Fasilitas",
+        "venue_detail_has": "Ya, *{name}* mencantumkan {terms}:",
+        "venue_detail_has_not": "*{name}* tidak mencantumkan {terms}:",
+        "venue_filter_header_one": "Dari venue yang saya tunjukkan, hanya yang ini yang mencantumkan {terms}:",
+        "venue_filter_header_many": "Dari venue yang saya tunjukkan, yang berikut mencantumkan {terms}:",
+        "venue_filter_item": "{index}. *{name}*",
+        "venue_filter_none": "Tidak ada venue yang saya tunjukkan yang mencantumkan {terms}.",
+        "venue_detail_footer": "Apakah Anda ingin memesan salah satunya, atau ada hal lain yang ingin Anda ketahui?",
+    },
+}
 
 
 # Question Class Configuration
@@ -20,8 +154,12 @@ question_class_details = {
                 "description": "Use this subclass when the user clearly indicates they want to confirm or finalize. Only for final decision of booking, not just providing extra detail.",
                 "tools": "confirm_booking"
             },
+            "venue_details": {
+                "description": "Use this subclass when venues were already recommended in the chat and the user asks about the details of THOSE venues: their location, type or amenities, which of them has a feature (e.g. 'which of those has parking?', 'where is the second one?', 'does the first one have a pool?'). Not for new searches or changed requirements.",
+                "tools": "venue_details",
+            },
             "venue_recommendation": {
-                "description": "Use this subclass when the user is asking for venue recommendations, still exploring options, asking for venue details, comparing choices, or responding to the assistant's suggestions about potential venues. If the user says things like 'give me recommendations', 'show me venues', 'find me a venue', etc., choose this subclass. If the chat history never giving venue comparison to user, you must choose this subclass.",
+                "description": "Use this subclass when the user is asking for venue recommendations, still exploring options, comparing choices, or responding to the assistant's suggestions about potential venues. If the user says things like 'give me recommendations', 'show me venues', 'find me a venue', etc., choose this subclass. If the chat history never giving venue comparison to user, you must choose this subclass.",
                 "tools": "venue_recommendation",
             }
         }
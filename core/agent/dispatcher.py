@@ -0,0 +1,258 @@
+"""
+Front dispatcher: phone-affinity sharding of webhook traffic across worker processes.
+
+    python -m core.agent.dispatcher --workers 4 --port 8000
+
+Starts N bot workers (`uvicorn core.agent.main:app`) on unix sockets, each with its own
+SQLite file (CHAT_DB_PATH) and its own in-memory SessionManager. Every /webhook is
+consistent-hashed on the chat's phone to one worker and forwarded over that worker's
+socket, so a user always lands on the same process: sessions, timers and caches stay
+local and warm, and the workers share nothing.
+
+The ring is keyed by worker index, so restarting with the same --workers keeps every
+user on their shard. Changing the worker count moves about 1/N of the users to another
+shard; a running session of theirs restarts there (its history stays in the old file).
+For sessions that must survive that, use the shared session state instead
+(SESSION_STATE_BACKEND=redis with plain `uvicorn --workers N`).
+"""
+
+import os
+import sys
+import time
+import asyncio
+import bisect
+import hashlib
+import argparse
+import tempfile
+import httpx
+from pathlib import Path
+from typing import List, Optional
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse, Response
+from contextlib import asynccontextmanager
+
+from core.logger import get_logger, stop_logging
+from core.settings import settings
+from core.metrics import render_prometheus, DISPATCH_SECONDS, DISPATCH_ERRORS, WORKER_RESTARTS
+from core.agent.config import (
+    DISPATCHER_VIRTUAL_NODES,
+    DISPATCHER_FORWARD_TIMEOUT_SECONDS,
+    DISPATCHER_WORKER_START_TIMEOUT_SECONDS,
+    DISPATCHER_RESTART_BACKOFF_SECONDS,
+)
+from core.agent.session import DB_DIR
+from core.agent.ingress import decode_webhook, message_phone, rejection_response
+
+logger = get_logger(__name__, service="Dispatcher")
+
+BOT_PORT = settings.bot_port
+BOT_WORKERS = settings.bot_workers or os.cpu_count() or 1
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent hashing of keys onto nodes, with virtual nodes for an even spread."""
+
+    def __init__(self, nodes: List[int], vnodes: int = DISPATCHER_VIRTUAL_NODES):
+        points = sorted((_hash(f"worker-{node}#{i}"), node) for node in nodes for i in range(vnodes))
+        self._points = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node_for(self, key: str) -> int:
+        index = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._nodes[index]
+
+
+# -----------------------------
+# Workers
+# -----------------------------
+class WorkerProcess:
+    """One `uvicorn core.agent.main:app` child on a unix socket, restarted if it exits."""
+
+    def __init__(self, index: int, socket_path: Path, db_path: Path, log_level: str):
+        self.index = index
+        self.socket_path = socket_path
+        self.db_path = db_path
+        self.log_level = log_level
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.client = httpx.AsyncClient(
+            transport=httpx.AsyncHTTPTransport(uds=str(socket_path)),
+            base_url="http://worker",
+            timeout=DISPATCHER_FORWARD_TIMEOUT_SECONDS,
+        )
+        self._stopping = False
+        self._supervisor: Optional[asyncio.Task] = None
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    async def start(self):
+        self.socket_path.unlink(missing_ok=True)
+        env = dict(os.environ)
+        env["CHAT_DB_PATH"] = str(self.db_path)
+        env["BOT_REGISTER_WEBHOOK"] = "0"
+        self.process = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "uvicorn", "core.agent.main:app",
+            "--uds", str(self.socket_path), "--log-level", self.log_level,
+            env=env,
+        )
+        await self._wait_ready()
+        logger.info(f"Worker {self.index} ready (pid {self.process.pid}, db {self.db_path})")
+        if self._supervisor is None:
+            self._supervisor = asyncio.create_task(self._supervise())
+
+    async def _wait_ready(self):
+        deadline = time.monotonic() + DISPATCHER_WORKER_START_TIMEOUT_SECONDS
+        while time.monotonic() < deadline:
+            if not self.alive:
+                raise RuntimeError(f"Worker {self.index} exited during startup")
+            if self.socket_path.exists():
+                try:
+                    response = await self.client.get("/health", timeout=2.0)
+                    if response.status_code == 200:
+                        return
+                except httpx.HTTPError:
+                    pass
+            await asyncio.sleep(0.1)
+        raise RuntimeError(f"Worker {self.index} not ready after {DISPATCHER_WORKER_START_TIMEOUT_SECONDS}s")
+
+    async def _supervise(self):
+        while not self._stopping:
+            returncode = await self.process.wait()
+            if self._stopping:
+                return
+            logger.error(f"Worker {self.index} exited with code {returncode}, restarting")
+            WORKER_RESTARTS.inc(worker=self.index)
+            await asyncio.sleep(DISPATCHER_RESTART_BACKOFF_SECONDS)
+            try:
+                await self.start()
+            except Exception:
+                logger.exception(f"Failed to restart worker {self.index}")
+
+    async def forward(self, body: bytes) -> httpx.Response:
+        return await self.client.post("/webhook", content=body, headers={"content-type": "application/json"})
+
+    async def stop(self, timeout: float = 15.0):
+        """SIGTERM (the worker finishes its lifespan shutdown), then SIGKILL after `timeout`."""
+        self._stopping = True
+        if self._supervisor:
+            self._supervisor.cancel()
+        if self.alive:
+            self.process.terminate()
+            try:
+                await asyncio.wait_for(self.process.wait(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Worker {self.index} did not stop in {timeout}s, killing")
+                self.process.kill()
+                await self.process.wait()
+        await self.client.aclose()
+        self.socket_path.unlink(missing_ok=True)
+
+
+class Dispatcher:
+    def __init__(self, workers: int, db_dir: Path, socket_dir: Path, log_level: str = "info"):
+        self.workers = [
+            WorkerProcess(i, socket_dir / f"worker-{i}.sock", db_dir / f"chat_sessions.shard{i}.db", log_level)
+            for i in range(workers)
+        ]
+        self.ring = HashRing(list(range(workers)))
+
+    def worker_for(self, key: str) -> WorkerProcess:
+        return self.workers[self.ring.node_for(key)]
+
+    async def start(self):
+        await asyncio.gather(*(worker.start() for worker in self.workers))
+
+    async def stop(self):
+        await asyncio.gather(*(worker.stop() for worker in self.workers), return_exceptions=True)
+
+
+# -----------------------------
+# App
+# -----------------------------
+def create_app(workers: int, db_dir: Path, socket_dir: Path, log_level: str = "info") -> FastAPI:
+    dispatcher = Dispatcher(workers, db_dir, socket_dir, log_level)
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        logger.info(f"🚀 Starting dispatcher with {workers} workers (sockets in {socket_dir})")
+        await dispatcher.start()
+        # imported here: workers do not register, the dispatcher is what open-wa calls
+        from core.agent.main import register_webhook
+        await register_webhook()
+        logger.info("✅ Dispatcher is running. Waiting for messages...")
+        yield
+        logger.info("🛑 Stopping workers...")
+        await dispatcher.stop()
+        logger.info("✅ Dispatcher stopped.")
+        stop_logging()
+
+    app = FastAPI(lifespan=lifespan)
+    app.state.dispatcher = dispatcher
+
+    @app.post("/webhook")
+    async def webhook_handler(request: Request):
+        """Forward the webhook to the worker owning the sender's phone."""
+        body = await request.body()
+        # events no worker would answer are rejected here, without a hop to a worker
+        _, data, outcome = decode_webhook(body)
+        if outcome != "accepted":
+            return rejection_response(outcome)
+        worker = dispatcher.worker_for(message_phone(data))
+        try:
+            with DISPATCH_SECONDS.time(worker=worker.index):
+                response = await worker.forward(body)
+        except httpx.HTTPError as e:
+            DISPATCH_ERRORS.inc(worker=worker.index)
+            logger.error(f"❌ Worker {worker.index} could not take webhook: {e}")
+            return {"status": "error", "message": f"worker {worker.index} unavailable"}
+        return Response(content=response.content, status_code=response.status_code, media_type="application/json")
+
+    @app.get("/health")
+    async def health_check():
+        states = [{"index": w.index, "pid": w.process.pid if w.process else None, "alive": w.alive} for w in dispatcher.workers]
+        healthy = all(state["alive"] for state in states)
+        return {"status": "healthy" if healthy else "degraded", "workers": states}
+
+    @app.get("/metrics")
+    async def metrics():
+        """Dispatcher metrics; each worker's own metrics are at /workers/{index}/metrics"""
+        return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+    @app.get("/workers/{index}/metrics")
+    async def worker_metrics(index: int):
+        if not 0 <= index < len(dispatcher.workers):
+            return PlainTextResponse("unknown worker\n", status_code=404)
+        try:
+            response = await dispatcher.workers[index].client.get("/metrics", timeout=5.0)
+        except httpx.HTTPError as e:
+            return PlainTextResponse(f"worker {index} unavailable: {e}\n", status_code=503)
+        return PlainTextResponse(response.text, media_type="text/plain; version=0.0.4")
+
+    return app
+
+
+def main(argv: Optional[List[str]] = None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="WhatsApp bot with phone-affinity worker processes")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=BOT_PORT)
+    parser.add_argument("--workers", type=int, default=BOT_WORKERS, help="worker processes (default: BOT_WORKERS or CPU count)")
+    parser.add_argument("--db-dir", default=str(DB_DIR), help="directory for the per-worker SQLite files")
+    parser.add_argument("--socket-dir", help="directory for the worker sockets (default: a fresh temp dir)")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    socket_dir = Path(args.socket_dir or tempfile.mkdtemp(prefix="wa_bot_workers_"))
+    socket_dir.mkdir(parents=True, exist_ok=True)
+    app = create_app(args.workers, Path(args.db_dir), socket_dir, args.log_level)
+    uvicorn.run(app, host=args.host, port=args.port, log_level=args.log_level)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+"""
+Analytics export: sessions, extracted requirements, messages and booking outcomes as files
+partitioned by day, for loading into a warehouse.
+
+    python -m core.agent.export --out exports/              # everything since the last run
+    python -m core.agent.export --out exports/ --since 2026-10-01 --format csv
+
+Output (Parquet when pyarrow is installed, gzipped CSV otherwise or with --format csv;
+pyarrow is optional and not in requirements.txt):
+
+    <out>/sessions/date=2026-10-18/<db>-<since>.parquet      sessions changed in the window
+    <out>/requirements/date=2026-10-18/<db>-<since>.parquet  their user_requirements
+    <out>/messages/date=2026-10-18/<db>-<since>.parquet      messages sent in the window
+    <out>/bookings/date=2026-10-18/<db>-<since>.parquet      booking attempts (bot message metadata)
+    <out>/_watermarks.json                                   per DB file: end of the last export
+
+Each run exports the window (watermark, now - EXPORT_LAG_SECONDS] and then moves the
+watermark, so runs are incremental and a window is never exported twice. Files are named
+after the start of their window: a run that died before moving the watermark starts from
+the same place, and its re-run replaces those files instead of adding a second copy of
+the rows to the day (an explicit --since is a backfill: it writes files of its own next to
+the ones already exported for those days and never moves the watermark back). Messages and
+bookings are append-only; sessions and requirements rows are the state at export time of
+every session that changed in the window, so a session appears again in every window it
+changes in (keep the row with the latest `changed_at`). Partitions are by UTC day.
+
+Every DB file is read on its own read-only connection inside one read transaction: the
+export sees a consistent snapshot while the bot keeps writing (WAL), and rows are fetched
+and written EXPORT_CHUNK_ROWS at a time, so memory stays flat whatever the DB size. Files
+are written under a temporary name and renamed when complete.
+"""
+
+import os
+import sys
+import csv
+import gzip
+import json
+import time
+import sqlite3
+import argparse
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from core.agent.config import EXPORT_CHUNK_ROWS, EXPORT_LAG_SECONDS
+from core.agent.migrations import is_compact
+from core.agent.search import parse_time
+from core.agent.session import REQUIREMENT_COLUMNS
+from core.agent.venue_catalog import referenced_ids
+from core.logger import get_logger
+
+logger = get_logger(__name__, service="Agent")
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # optional: `pip install pyarrow` for Parquet output
+    pyarrow = None
+
+# dataset -> [(column, type)]
+DATASETS: Dict[str, List[Tuple[str, str]]] = {
+    "sessions": [
+        ("session_id", "string"), ("phone", "string"), ("user_name", "string"), ("started_at", "int"),
+        ("last_activity", "int"), ("status", "string"), ("ended_at", "int"), ("changed_at", "int"),
+    ],
+    "requirements": [
+        ("session_id", "string"), ("changed_at", "int"),
+        ("event_type", "string"), ("country", "string"), ("location", "string"), ("attendees", "int"),
+        ("budget", "string"), ("start_date", "string"), ("end_date", "string"), ("email", "string"),
+        ("customer_name", "string"), ("ticket_id", "string"), ("venue_ids", "string"),
+    ],
+    "messages": [
+        ("session_id", "string"), ("message_id", "string"), ("sender", "string"), ("body", "string"),
+        ("timestamp", "int"), ("metadata", "string"),
+    ],
+    "bookings": [
+        ("session_id", "string"), ("message_id", "string"), ("timestamp", "int"), ("status", "string"),
+        ("ticket_id", "string"), ("venue_id", "string"), ("venue_name", "string"), ("event_date", "string"),
+    ],
+}
+DATE_COLUMNS = {"sessions": "changed_at", "requirements": "changed_at", "messages": "timestamp", "bookings": "timestamp"}
+
+WATERMARKS_FILE = "_watermarks.json"
+
+
+def _day(ts: int) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+# -----------------------------
+# Partitioned writers
+# -----------------------------
+class _ParquetSink:
+    TYPES = {"string": "string", "int": "int64"}
+
+    def __init__(self, path: Path, columns: List[Tuple[str, str]]):
+        self.names = [name for name, _ in columns]
+        self.schema = pyarrow.schema([(name, self.TYPES[kind]) for name, kind in columns])
+        self.writer = pyarrow.parquet.ParquetWriter(str(path), self.schema, compression="zstd")
+
+    def write(self, rows: List[tuple]):
+        arrays = [pyarrow.array(values, type=field.type) for values, field in zip(zip(*rows), self.schema)]
+        self.writer.write_table(pyarrow.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+class _CsvSink:
+    def __init__(self, path: Path, columns: List[Tuple[str, str]]):
+        self.file = gzip.open(path, "wt", encoding="utf-8", newline="")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow([name for name, _ in columns])
+
+    def write(self, rows: List[tuple]):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class PartitionedWriter:
+    """One file per day of `dataset` under <root>/<dataset>/date=YYYY-MM-DD/<name>.<ext>."""
+
+    def __init__(self, root: Path, dataset: str, name: str, fmt: str):
+        self.root = Path(root) / dataset
+        self.dataset = dataset
+        self.name = name
+        self.columns = DATASETS[dataset]
+        self.date_index = [column for column, _ in self.columns].index(DATE_COLUMNS[dataset])
+        self.sink_class, self.suffix = (_ParquetSink, ".parquet") if fmt == "parquet" else (_CsvSink, ".csv.gz")
+        self.sinks: Dict[str, Any] = {}
+        self.rows = 0
+
+    def _path(self, day: str) -> Path:
+        return self.root / f"date={day}" / f"{self.name}{self.suffix}"
+
+    def write(self, rows: List[tuple]):
+        by_day: Dict[str, List[tuple]] = {}
+        for row in rows:
+            by_day.setdefault(_day(row[self.date_index]), []).append(row)
+        for day, day_rows in by_day.items():
+            sink = self.sinks.get(day)
+            if sink is None:
+                path = self._path(day)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                sink = self.sinks[day] = self.sink_class(path.with_name(f".{path.name}.tmp"), self.columns)
+            sink.write(day_rows)
+        self.rows += len(rows)
+
+    def close(self):
+        for day, sink in self.sinks.items():
+            sink.close()
+            path = self._path(day)
+            os.replace(path.with_name(f".{path.name}.tmp"), path)
+        self.sinks.clear()
+
+    def abort(self):
+        for day, sink in self.sinks.items():
+            try:
+                sink.close()
+            finally:
+                path = self._path(day)
+                path.with_name(f".{path.name}.tmp").unlink(missing_ok=True)
+        self.sinks.clear()
+
+
+# -----------------------------
+# Snapshot reads
+# -----------------------------
+def _chunks(cur: sqlite3.Cursor) -> Iterator[List[tuple]]:
+    while True:
+        rows = cur.fetchmany(EXPORT_CHUNK_ROWS)
+        if not rows:
+            return
+        yield rows
+
+
+def _session_id(key, shard: Optional[int]) -> str:
+    session_id = key.hex() if isinstance(key, bytes) else key
+    return f"s{shard}_{session_id}" if shard is not None else session_id
+
+
+def export_sessions(conn: sqlite3.Connection, shard: Optional[int], since: int, until: int,
+                    sessions: PartitionedWriter, requirements: PartitionedWriter):
+    """Sessions active or ended in (since, until], with their requirements."""
+    # two index range scans (idx_sessions_last_activity, idx_sessions_ended) OR-ed together
+    cur = conn.execute(
+        f"""SELECT s.id, s.phone, s.user_name, s.started_at, s.last_activity, s.status, s.ended_at,
+                   r.session_id, {', '.join(f'r.{column}' for column in REQUIREMENT_COLUMNS)}
+            FROM sessions s LEFT JOIN user_requirements r ON r.session_id = s.id
+            WHERE (s.last_activity > ? AND s.last_activity <= ?) OR (s.ended_at > ? AND s.ended_at <= ?)""",
+        (since, until, since, until),
+    )
+    for rows in _chunks(cur):
+        session_rows, requirement_rows = [], []
+        for row in rows:
+            session_id = _session_id(row[0], shard)
+            changed_at = max(row[4], row[6] or 0)
+            session_rows.append((session_id, *row[1:7], changed_at))
+            if row[7] is not None:
+                refs = row[-1]
+                venue_ids = json.dumps(referenced_ids(json.loads(refs))) if refs else None
+                requirement_rows.append((session_id, changed_at, *row[8:-1], venue_ids))
+        sessions.write(session_rows)
+        if requirement_rows:
+            requirements.write(requirement_rows)
+
+
+def export_messages(conn: sqlite3.Connection, shard: Optional[int], since: int, until: int,
+                    messages: PartitionedWriter, bookings: PartitionedWriter):
+    """Messages sent in (since, until], in time order (idx_messages_timestamp); bookings from their metadata."""
+    key = "seq" if is_compact(conn) else "id"
+    cur = conn.execute(
+        f"SELECT session_id, {key}, sender, body, timestamp, metadata FROM messages "
+        "WHERE timestamp > ? AND timestamp <= ? ORDER BY timestamp",
+        (since, until),
+    )
+    for rows in _chunks(cur):
+        message_rows, booking_rows = [], []
+        for session_key, message_key, sender, body, timestamp, metadata in rows:
+            session_id = _session_id(session_key, shard)
+            message_id = f"{session_id}:{message_key}" if key == "seq" else message_key
+            message_rows.append((session_id, message_id, sender, body, timestamp, metadata))
+            if metadata and '"booking"' in metadata:
+                booking = json.loads(metadata).get("booking")
+                if booking:
+                    booking_rows.append((
+                        session_id, message_id, timestamp, booking.get("status"), booking.get("ticket_id"),
+                        booking.get("venue_id"), booking.get("venue_name"), booking.get("event_date"),
+                    ))
+        messages.write(message_rows)
+        if booking_rows:
+            bookings.write(booking_rows)
+
+
+def export_db(path: Path, shard: Optional[int], out: Path, since: int, until: int, fmt: str) -> Dict[str, int]:
+    """Export one DB file's window (since, until]. Returns rows written per dataset."""
+    # named by the window start: re-exporting from the same watermark replaces the files
+    name = f"{path.stem}-{since}"
+    writers = {dataset: PartitionedWriter(out, dataset, name, fmt) for dataset in DATASETS}
+    conn = sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro", uri=True, isolation_level=None)
+    try:
+        # one read transaction: both queries see the same snapshot (the writer is not blocked,
+        # but the WAL cannot be checkpointed past it until the export finishes)
+        conn.execute("BEGIN")
+        export_sessions(conn, shard, since, until, writers["sessions"], writers["requirements"])
+        export_messages(conn, shard, since, until, writers["messages"], writers["bookings"])
+        conn.execute("COMMIT")
+    except BaseException:
+        for writer in writers.values():
+            writer.abort()
+        raise
+    finally:
+        conn.close()
+    for writer in writers.values():
+        writer.close()
+    return {dataset: writer.rows for dataset, writer in writers.items()}
+
+
+# -----------------------------
+# Watermarks
+# -----------------------------
+def load_watermarks(out: Path) -> Dict[str, int]:
+    path = Path(out) / WATERMARKS_FILE
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text())
+
+
+def save_watermarks(out: Path, watermarks: Dict[str, int]):
+    path = Path(out) / WATERMARKS_FILE
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(json.dumps(watermarks, indent=2, sort_keys=True))
+    os.replace(tmp, path)
+
+
+def run_export(paths: List[Tuple[Optional[int], Path]], out: Path, fmt: str, since: Optional[int] = None,
+               until: Optional[int] = None) -> Dict[str, Dict[str, int]]:
+    """Export each DB file from its watermark (or `since`) to `until` and advance the watermarks."""
+    out = Path(out)
+    out.mkdir(parents=True, exist_ok=True)
+    until = until if until is not None else int(time.time()) - EXPORT_LAG_SECONDS
+    watermarks = load_watermarks(out)
+    totals = {}
+    for shard, path in paths:
+        if not path.exists():
+            continue
+        start = since if since is not None else watermarks.get(path.name, 0)
+        if start >= until:
+            continue
+        began = time.monotonic()
+        totals[path.name] = counts = export_db(path, shard, out, start, until, fmt)
+        # only moves forward: an explicit --since re-export must not rewind the incremental runs
+        watermarks[path.name] = max(watermarks.get(path.name, 0), until)
+        save_watermarks(out, watermarks)
+        logger.info(
+            f"Exported {path.name} ({_day(start) if start else 'start'} .. {_day(until)}) in "
+            f"{time.monotonic() - began:.1f}s: " + ", ".join(f"{count} {dataset}" for dataset, count in counts.items())
+        )
+    return totals
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+def _db_paths() -> List[Tuple[Optional[int], Path]]:
+    """(shard index or None, file) of DB_PATH or each of its shards."""
+    from core.agent.session import DB_PATH, CHAT_DB_SHARDS, create_chat_db
+
+    db = create_chat_db(DB_PATH, CHAT_DB_SHARDS)
+    shards = getattr(db, "shards", None)
+    if shards is None:
+        return [(None, db.db_path)]
+    return [(index, shard.db_path) for index, shard in enumerate(shards)]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Export chat data for analytics, partitioned by day (read-only)")
+    parser.add_argument("--out", required=True, help="output directory (also holds the watermarks)")
+    parser.add_argument("--format", choices=["auto", "parquet", "csv"], default="auto",
+                        help="auto: Parquet if pyarrow is installed, else gzipped CSV")
+    parser.add_argument("--since", help="export from here instead of the watermark (epoch, ISO date or age like 7d)")
+    parser.add_argument("--until", help=f"export up to here (default: now - {EXPORT_LAG_SECONDS}s)")
+    parser.add_argument("--db", action="append", help="DB file (repeatable; default: DB_PATH and its shards)")
+    args = parser.parse_args(argv)
+
+    fmt = args.format
+    if fmt == "auto":
+        fmt = "parquet" if pyarrow is not None else "csv"
+        if pyarrow is None:
+            logger.info("pyarrow is not installed: exporting gzipped CSV (pip install pyarrow for Parquet)")
+    if fmt == "parquet" and pyarrow is None:
+        parser.error("--format parquet needs pyarrow (pip install pyarrow)")
+    paths = [(None, Path(p)) for p in args.db] if args.db else _db_paths()
+    totals = run_export(paths, Path(args.out), fmt, since=parse_time(args.since), until=parse_time(args.until))
+    print(json.dumps(totals))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,37 +1,77 @@
 import httpx
 import re
-import os
+from typing import Optional, Tuple
 
-from core.logger import get_logger
+from core.deadline import Deadline, DeadlineExceeded, deadline_timeout
+from core.logger import get_logger, truncated
+from core.metrics import VPS_REQUEST_SECONDS
+from core.settings import settings
 
 logger = get_logger(__name__)
 
-from dotenv import load_dotenv
-load_dotenv()
-
-VPS_URL = os.getenv("VPS_URL")
+VPS_URL = settings.vps_url
 
 INQUIRY_URL = "{VPS_URL}/api/v1/recommendation/inquiry/whatsapp"
 BOOKING_URL = "{VPS_URL}/api/v1/recommendation/inquiry/book/{ticket_id}/{venue_id}"
 NEXT_BOOKING_URL = "{VPS_URL}/api/v1/recommendation/inquiry/whatsapp/{ticket_id}/next-recommendation"  # add phone number
 BOOK_NOW_URL = "{VPS_URL}/api/v1/recommendation/inquiry/whatsapp/book-now"
 
-async def get_venue_recommendation(phone_number: str, text_body: str, k_venue=5):
+VPS_TIMEOUT_SECONDS = 15
+
+
+# One pooled client for every VPS call, so turns reuse keep-alive connections instead of
+# paying a TCP (and TLS) handshake each; timeouts are passed per request.
+_vps_client: Optional[httpx.AsyncClient] = None
+
+
+def get_vps_client() -> httpx.AsyncClient:
+    global _vps_client
+    if _vps_client is None or _vps_client.is_closed:
+        _vps_client = httpx.AsyncClient(timeout=VPS_TIMEOUT_SECONDS)
+    return _vps_client
+
+
+async def warm_vps_client(timeout: float) -> Optional[int]:
+    """Open a keep-alive connection to the VPS before the first turn needs it. Returns the HTTP status."""
+    if not VPS_URL:
+        return None
+    response = await get_vps_client().get(VPS_URL, timeout=timeout)
+    return response.status_code
+
+
+async def close_vps_client():
+    global _vps_client
+    if _vps_client is not None:
+        await _vps_client.aclose()
+        _vps_client = None
+
+
+def _vps_timeout(deadline: Optional[Deadline]) -> float:
+    """VPS call timeout: the remaining turn budget, capped at VPS_TIMEOUT_SECONDS."""
+    return deadline_timeout(deadline, default=VPS_TIMEOUT_SECONDS)
+
+
+async def get_venue_recommendation(phone_number: str, text_body: str, k_venue=5, deadline: Optional[Deadline] = None):
     payload = {
         "phone_number": phone_number,
         "text_body": text_body,
         "k_venue": k_venue
     }
     
-    logger.info(f"Get Venue Recommendation: payload: {payload}")
+    logger.info("Get Venue Recommendation: payload: %s", truncated(payload))
 
     inquiry_url = INQUIRY_URL.format(VPS_URL=VPS_URL)
-    async with httpx.AsyncClient(timeout=15) as client:
-        response = await client.post(inquiry_url, json=payload)
+    try:
+        with VPS_REQUEST_SECONDS.time(endpoint="inquiry"):
+            response = await get_vps_client().post(inquiry_url, json=payload, timeout=_vps_timeout(deadline))
         response.raise_for_status()
+    except httpx.TimeoutException:
+        if deadline is not None and deadline.expired:
+            raise DeadlineExceeded("venue recommendation exceeded the turn deadline")
+        raise
         
     response_json = response.json()
-    logger.info(f"Venue Recommendation: {response_json}")
+    logger.info("Venue Recommendation: %s", truncated(response_json))
     return response_json
     
 
@@ -55,9 +95,8 @@ async def chat_inquiry(user_name: str, message: str, phone_number: str, k_venue:
     }
 
     inquiry_url = INQUIRY_URL.format(VPS_URL=VPS_URL)
-    async with httpx.AsyncClient(timeout=15) as client:
-        response = await client.post(inquiry_url, json=payload)
-        # response.raise_for_status()
+    response = await get_vps_client().post(inquiry_url, json=payload)
+    # response.raise_for_status()
         
     if response.status_code != 200:
         return "Failed to request inquiry. Please try again later."
@@ -121,8 +160,7 @@ async def chat_inquiry_next(user_name: str, phone_number: str, last_message: str
     payload = {
         "phone_number": phone_number
     }
-    async with httpx.AsyncClient(timeout=15) as client:
-        response = await client.post(next_booking_url, json=payload)
+    response = await get_vps_client().post(next_booking_url, json=payload)
         
     if response.status_code != 200:
         return "Failed to request next booking. Please try again later."
@@ -157,7 +195,8 @@ async def chat_inquiry_next(user_name: str, phone_number: str, last_message: str
 
     return response_text
 
-async def book_now(ticket_id: str, venue_name: str, venue_id: str, email_address: str, customer_name: str, event_date: str, send_email: bool = True):
+async def book_now(ticket_id: str, venue_name: str, venue_id: str, email_address: str, customer_name: str, event_date: str, send_email: bool = True, deadline: Optional[Deadline] = None) -> Tuple[bool, str]:
+    """(booked, message for the user)"""
     book_now_url = BOOK_NOW_URL.format(VPS_URL=VPS_URL)
     logger.info(f"Book Now: book_now_url: {book_now_url}")
     
@@ -170,23 +209,27 @@ async def book_now(ticket_id: str, venue_name: str, venue_id: str, email_address
         "event_date": event_date,
     }
     
-    logger.info(f"Book Now: payload: {payload}")
+    logger.info("Book Now: payload: %s", truncated(payload))
     
-    async with httpx.AsyncClient(timeout=15) as client:
-        response = await client.post(book_now_url, json=payload)
+    try:
+        with VPS_REQUEST_SECONDS.time(endpoint="book_now"):
+            response = await get_vps_client().post(book_now_url, json=payload, timeout=_vps_timeout(deadline))
+    except httpx.TimeoutException:
+        if deadline is not None and deadline.expired:
+            raise DeadlineExceeded("booking exceeded the turn deadline")
+        raise
         
-    logger.info(f"Book now response: {response}")
+    logger.info("Book now response: %s", truncated(response))
     if response.status_code == 200:
-        return f"I've noted {email_address} and has been sent the detailed information about the venue *{venue_name}* ({venue_id}) under ticket {ticket_id}."
+        return True, f"I've noted {email_address} and has been sent the detailed information about the venue *{venue_name}* ({venue_id}) under ticket {ticket_id}."
     else:
-        return f"Failed to book the venue *{venue_name}* ({venue_id}). Please request another inquiry or try again later."
+        return False, f"Failed to book the venue *{venue_name}* ({venue_id}). Please request another inquiry or try again later."
 
 
-async def book_venue(ticket_id: str, venue_name: str, venue_id: str):
+async def book_venue(ticket_id: str, venue_name: str, venue_id: str, deadline: Optional[Deadline] = None):
     booking_url = BOOKING_URL.format(VPS_URL=VPS_URL, ticket_id=ticket_id, venue_id=venue_id)
     logger.info(f"Book Selected Venue: booking_url: {booking_url}")
-    async with httpx.AsyncClient(timeout=15) as client:
-        response = await client.get(booking_url)
+    response = await get_vps_client().get(booking_url, timeout=_vps_timeout(deadline))
 
     logger.info(f"Book Selected Venue: response: {response}")
     if response.status_code == 200:
@@ -229,13 +272,12 @@ async def book_selected_venue(selected_venue_index: int, inquiry_chat: str) -> s
     # 3. Get selected venue
     selected_venue = venues[selected_venue_index - 1]
     _, name, venue_id, location, venue_type, amenities = selected_venue
-    logger.info(f"Book Selected Venue: selected_venues: {selected_venue}")
+    logger.info("Book Selected Venue: selected_venues: %s", truncated(selected_venue))
 
     # 4. Hit booking API
     booking_url = BOOKING_URL.format(VPS_URL=VPS_URL, ticket_id=ticket_id, venue_id=venue_id)
     logger.info(f"Book Selected Venue: booking_url: {booking_url}")
-    async with httpx.AsyncClient(timeout=15) as client:
-        response = await client.get(booking_url)
+    response = await get_vps_client().get(booking_url)
 
     logger.info(f"Book Selected Venue: response: {response}")
     if response.status_code == 200:
@@ -0,0 +1,84 @@
+"""
+Lean decoding of open-wa webhook bodies, shared by the bot and the dispatcher.
+
+open-wa posts most messages twice, as `onAnyMessage` and `onMessage`, and only
+`onMessage` is answered. open-wa writes `event` as the first key of the body, so the
+event type is read with one anchored regex match on the raw bytes. Events the bot ignores
+are rejected before the body is parsed. Everything else is decoded with orjson. Group
+and self messages are rejected right after decoding, before a trace id, logging or a turn.
+
+Every event is counted in wa_bot_webhook_events_total{event, outcome}.
+"""
+
+import re
+from typing import Any, Dict, Optional, Tuple
+
+import orjson
+from fastapi.responses import Response
+
+from core.metrics import WEBHOOK_EVENTS
+
+ACCEPTED_EVENTS = frozenset({"onMessage"})
+# event label values; anything else is counted as "other" so senders cannot grow the label set
+KNOWN_EVENTS = frozenset({"onMessage", "onAnyMessage", "onAck", "onStateChanged", "onAddedToGroup", "onIncomingCall"})
+
+# `{"event": "<name>"` at the very start: the event is the top-level first key, as open-wa sends it
+_EVENT_PREFIX = re.compile(rb'\s*\{\s*"event"\s*:\s*"([A-Za-z]{1,64})"')
+
+# outcome -> response body; "accepted" events are answered by the turn handler
+_REPLIES = {
+    "skipped": b'{"status":"ok"}',
+    "group": b'{"status":"ignored"}',
+    "self": b'{"status":"ignored"}',
+    "invalid": b'{"status":"error","message":"invalid webhook payload"}',
+}
+
+
+def peek_event(body: bytes) -> Optional[str]:
+    """The event name when it is the body's first key, without parsing the rest; None otherwise."""
+    match = _EVENT_PREFIX.match(body)
+    return match.group(1).decode("ascii") if match else None
+
+
+def _counted(event: Optional[str], outcome: str, data: Optional[Dict[str, Any]] = None) -> Tuple[str, Optional[Dict[str, Any]], str]:
+    event = event if isinstance(event, str) else ""
+    WEBHOOK_EVENTS.inc(event=event if event in KNOWN_EVENTS else "other", outcome=outcome)
+    return event, data, outcome
+
+
+def decode_webhook(body: bytes) -> Tuple[str, Optional[Dict[str, Any]], str]:
+    """
+    (event, message data, outcome) of a webhook body. outcome is "accepted" (data is the
+    message to answer), "skipped" (an event the bot ignores), "group", "self" or "invalid".
+    """
+    event = peek_event(body)
+    if event is not None and event not in ACCEPTED_EVENTS:
+        return _counted(event, "skipped")
+    try:
+        payload = orjson.loads(body)
+    except orjson.JSONDecodeError:
+        return _counted(event, "invalid")
+    if not isinstance(payload, dict):
+        return _counted(event, "invalid")
+    event = payload.get("event")
+    if event not in ACCEPTED_EVENTS:
+        return _counted(event, "skipped")
+    data = payload.get("data")
+    if not isinstance(data, dict):
+        return _counted(event, "invalid")
+    if data.get("isGroupMsg"):
+        return _counted(event, "group")
+    if data.get("fromMe"):
+        return _counted(event, "self")
+    return _counted(event, "accepted", data)
+
+
+def message_phone(data: Dict[str, Any]) -> str:
+    """The phone an accepted message belongs to, derived the same way chat_response derives it."""
+    jid = data.get("chatId") or (data.get("chat") or {}).get("id") or data.get("from") or ""
+    return str(jid).split("@")[0]
+
+
+def rejection_response(outcome: str) -> Response:
+    """The reply to a webhook that was not accepted (pre-encoded, no JSON serialization)."""
+    return Response(content=_REPLIES[outcome], media_type="application/json")
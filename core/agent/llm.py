@@ -1,12 +1,10 @@
 import copy
 from datetime import datetime, timedelta, timezone
-from typing import List, Dict, Any
-import pandas as pd
+from typing import TYPE_CHECKING, List, Dict, Any, Optional
 import json
-from openai import AsyncOpenAI
-from openai.types.chat import ChatCompletionMessageParam
 
-from core.openai import chat_completion
+from core.openai import chat_completion, PRIORITY_INTERACTIVE
+from core.deadline import Deadline
 from core.agent.formatted_schemas import (
     get_question_class_formatted_schema,
     get_confirm_booking_formatted_schema,
@@ -23,12 +21,17 @@ from core.agent.prompts import (
 
 from core.logger import get_logger
 
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+    from openai.types.chat import ChatCompletionMessageParam
+
 logger = get_logger(__name__, service="LLM")
 
 async def get_question_class(
-    openai_client: AsyncOpenAI,
-    messages: List[ChatCompletionMessageParam],
+    openai_client: "AsyncOpenAI",
+    messages: List["ChatCompletionMessageParam"],
     question_class_details: Dict[str, Dict],
+    deadline: Optional[Deadline] = None,
     # Reccuring
     depth: int = 1,
 ) -> List[str]:
@@ -48,6 +51,7 @@ async def get_question_class(
             question_classes_list=question_classes_list
         ),
         model_name="gpt-4.1",
+        deadline=deadline,
     )
     
     question_class_result: List[str] = [question_class_llm_result.get("question_class", "")]
@@ -63,14 +67,16 @@ async def get_question_class(
             openai_client=openai_client,
             messages=messages,
             question_class_details=question_class_dict.get("subclass"),
+            deadline=deadline,
             depth=depth+1
         )
         
     return question_class_result
 
 async def get_venue_summary(
-    openai_client: AsyncOpenAI,
-    messages: List[ChatCompletionMessageParam]
+    openai_client: "AsyncOpenAI",
+    messages: List["ChatCompletionMessageParam"],
+    deadline: Optional[Deadline] = None,
 ):
     # messages_user = [msg for msg in messages if msg.get("role") == "user"]
     venue_summary = await chat_completion(
@@ -78,14 +84,16 @@ async def get_venue_summary(
         user_prompt=messages,
         system_prompt=VENUE_SUMMARY_SYSTEM_PROMPT,
         model_name="gpt-4.1-mini",
+        deadline=deadline,
     )
     
     return venue_summary
 
 async def get_venue_conclusion(
-    openai_client: AsyncOpenAI,
-    messages: List[ChatCompletionMessageParam],
-    venue_recommendation: Dict
+    openai_client: "AsyncOpenAI",
+    messages: List["ChatCompletionMessageParam"],
+    venue_recommendation: Dict,
+    deadline: Optional[Deadline] = None,
 ):
     venue_conclusion = await chat_completion(
         openai_client=openai_client,
@@ -93,15 +101,17 @@ async def get_venue_conclusion(
         system_prompt=VENUE_CONCLUSION_SYSTEM_PROMPT.format(
             venue_recommendation=str(venue_recommendation)
         ),
-        model_name="gpt-4.1-mini"
+        model_name="gpt-4.1-mini",
+        deadline=deadline,
     )
     
     return venue_conclusion
 
 async def get_confirm_booking(
-    openai_client: AsyncOpenAI,
-    messages: List[ChatCompletionMessageParam],
+    openai_client: "AsyncOpenAI",
+    messages: List["ChatCompletionMessageParam"],
     venue_recommendation: str,
+    deadline: Optional[Deadline] = None,
 ):
     confirm_book_response = await chat_completion(
         openai_client=openai_client,
@@ -111,17 +121,21 @@ async def get_confirm_booking(
         ),
         formatted_schema=get_confirm_booking_formatted_schema(),
         model_name="gpt-4.1-mini",
+        deadline=deadline,
     )
     
     return confirm_book_response
 
 async def extract_user_requirements(
-    openai_client: AsyncOpenAI,
-    messages: List[ChatCompletionMessageParam]
+    openai_client: "AsyncOpenAI",
+    messages: List["ChatCompletionMessageParam"],
+    priority: int = PRIORITY_INTERACTIVE,
+    deadline: Optional[Deadline] = None,
 ) -> Dict[str, Any]:
     """
     Extract structured user requirements from conversation history.
     Returns a dictionary with keys: event_type, country, location, attendees, budget, start_date, end_date, email, customer_name
+    Pass priority=PRIORITY_BACKGROUND when no user is waiting for the result.
     """
     system_prompt = """
     You are an assistant that extracts structured information about venue requirements from conversations.
@@ -161,12 +175,15 @@ async def extract_user_requirements(
         system_prompt=system_prompt,
         formatted_schema=get_extract_user_requirements_formatted_schema(),
         model_name="gpt-4.1-mini",
+        priority=priority,
+        deadline=deadline,
     )
 
 async def get_final_response(
-    openai_client: AsyncOpenAI,
-    messages: List[ChatCompletionMessageParam],
+    openai_client: "AsyncOpenAI",
+    messages: List["ChatCompletionMessageParam"],
     extra_prompt: str,
+    deadline: Optional[Deadline] = None,
 ):
     final_response = await chat_completion(
         openai_client=openai_client,
@@ -176,6 +193,7 @@ async def get_final_response(
         ),
         formatted_schema=get_final_response_formatted_schema(),
         model_name="gpt-4.1-mini",
+        deadline=deadline,
     )
     
     return final_response
\ No newline at end of file
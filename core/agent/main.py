@@ -1,31 +1,125 @@
+import time
+_IMPORTS_STARTED = time.perf_counter()  # first line, so the startup report includes this module's imports
+
 import asyncio
 import re
-import os
 import httpx
+from typing import Awaitable, Callable, Dict, List, Optional
 from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
 
 from core.openai import create_client
-from core.logger import get_logger
-from core.agent.session import chat_response
+from core.deadline import Deadline
+from core.logger import get_logger, set_trace_id, stop_logging, truncated
+from core.settings import settings
+from core.metrics import (
+    render_prometheus,
+    TURN_SECONDS,
+    TURNS_IN_FLIGHT,
+    OPEN_WA_REQUEST_SECONDS,
+    STARTUP_SECONDS,
+)
+from core.agent.config import (
+    TURN_DEADLINE_SECONDS,
+    TYPING_INDICATOR_ENABLED,
+    TYPING_REFRESH_SECONDS,
+    EARLY_ACK_AFTER_SECONDS,
+    AGENT_EARLY_ACK_MESSAGE,
+    AGENT_BUSY_MESSAGE,
+    STARTUP_WARMUP_TIMEOUT_SECONDS,
+    STARTUP_OPENAI_PROBE,
+)
+from core.agent.session import chat_response, shutdown_sessions, get_chat_db, has_active_session
+from core.agent.handler import warm_vps_client, close_vps_client
+from core.agent.ingress import ACCEPTED_EVENTS, decode_webhook, message_phone, rejection_response
+from core.agent.admission import AdmissionController, turn_priority, PRIORITY_NAMES
+from core.agent.retention import start_retention_job
+from core.agent.admin import router as admin_router, ADMIN_API_KEY
 
 logger = get_logger(__name__)
 
-from dotenv import load_dotenv
-load_dotenv()
-
-openai_client = create_client()
+IMPORT_SECONDS = time.perf_counter() - _IMPORTS_STARTED
 
-OPEN_WA_HOST = os.getenv("OPEN_WA_HOST", "172.17.0.1")
-OPEN_WA_PORT = os.getenv("OPEN_WA_PORT", "8003")
-OPEN_WA_API_KEY = os.getenv("OPEN_WA_API_KEY", "my_secret_api_key")
-BOT_PORT = int(os.getenv("BOT_PORT", "8000"))
+OPEN_WA_HOST = settings.open_wa_host
+OPEN_WA_PORT = settings.open_wa_port
+OPEN_WA_API_KEY = settings.open_wa_api_key
+BOT_PORT = settings.bot_port
+BOT_REGISTER_WEBHOOK = settings.bot_register_webhook  # off for dispatcher workers
 
 OPEN_WA_BASE_URL = f"http://{OPEN_WA_HOST}:{OPEN_WA_PORT}"
 
 book_pattern = re.compile(r"^book (\d+)$", re.IGNORECASE)
 
 
+class TurnPresence:
+    """
+    Perceived-latency helper for one turn: keeps the "typing..." indicator on while the
+    turn runs and sends one short acknowledgement if the turn gets slow.
+    
+    Use through OpenWAClient.turn_presence(jid) as an async context manager.
+    """
+    
+    def __init__(self, client: "OpenWAClient", to: str, refresh_seconds: float, ack_after_seconds: float, ack_message: str):
+        self.client = client
+        self.to = to
+        self.refresh_seconds = refresh_seconds
+        self.ack_after_seconds = ack_after_seconds
+        self.ack_message = ack_message
+        self.acknowledged = False
+        self.replied = False
+        self._started_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+    
+    async def __aenter__(self):
+        # never awaits open-wa: the indicator is sent by the background task while the turn runs
+        self._started_at = time.monotonic()
+        self.client._presence[self.to] = self
+        self._task = asyncio.create_task(self._run())
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        if self._task:
+            self._task.cancel()
+        if self.client._presence.get(self.to) is self:
+            self.client._presence.pop(self.to, None)
+        if not self.replied:
+            self.client.in_background(self.client.simulateTyping(self.to, False))
+        return False
+    
+    async def _run(self):
+        try:
+            await self.client.simulateTyping(self.to, True)
+            next_refresh = self.refresh_seconds
+            while True:
+                elapsed = time.monotonic() - self._started_at
+                if not self.acknowledged and elapsed >= self.ack_after_seconds:
+                    await self.acknowledge()
+                    continue
+                wake_at = next_refresh if self.acknowledged else min(next_refresh, self.ack_after_seconds)
+                await asyncio.sleep(max(wake_at - elapsed, 0))
+                if time.monotonic() - self._started_at >= next_refresh:
+                    await self.client.simulateTyping(self.to, True)
+                    next_refresh += self.refresh_seconds
+        except asyncio.CancelledError:
+            return
+        except Exception:
+            logger.exception(f"Typing indicator failed for {self.to}")
+    
+    async def acknowledge(self):
+        """Send the early acknowledgement once, unless the real reply already went out."""
+        if self.acknowledged or self.replied:
+            self.acknowledged = True
+            return
+        self.acknowledged = True
+        try:
+            await self.client._post("sendText", {"to": self.to, "content": self.ack_message})
+            # sending a message clears the typing state
+            await self.client.simulateTyping(self.to, True)
+        except Exception as e:
+            logger.warning(f"Failed to send early acknowledgement: {e}")
+
+
 class OpenWAClient:
     """HTTP client for open-wa REST API"""
     
@@ -33,9 +127,55 @@ class OpenWAClient:
         self.base_url = base_url
         self.api_key = api_key
         self.client = httpx.AsyncClient(timeout=30.0)
+        self._presence: Dict[str, TurnPresence] = {}  # active turns keyed by jid
+        self._background: set = set()  # fire-and-forget calls, referenced until done
+    
+    async def _post(self, method: str, args: dict):
+        with OPEN_WA_REQUEST_SECONDS.time(method=method):
+            response = await self.client.post(
+                f"{self.base_url}/{method}",
+                json={"args": args},
+                headers={"api_key": self.api_key},
+            )
+        response.raise_for_status()
+        return response.json()
+    
+    def in_background(self, call: Awaitable):
+        """Run a best-effort call without holding up the caller."""
+        task = asyncio.create_task(call)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def turn_presence(self, to: str) -> TurnPresence:
+        """Typing indicator + early acknowledgement for the turn answering `to`."""
+        return TurnPresence(
+            self,
+            to,
+            refresh_seconds=TYPING_REFRESH_SECONDS,
+            ack_after_seconds=EARLY_ACK_AFTER_SECONDS,
+            ack_message=AGENT_EARLY_ACK_MESSAGE,
+        )
+    
+    def set_ack_message(self, to: str, text: str):
+        """Change what the early acknowledgement says for the running turn (e.g. before a venue search)."""
+        presence = self._presence.get(to)
+        if presence:
+            presence.ack_message = text
+    
+    async def simulateTyping(self, to: str, on: bool):
+        """Show/hide the typing indicator. Best effort: failures are only logged."""
+        if not TYPING_INDICATOR_ENABLED:
+            return
+        try:
+            await self._post("simulateTyping", {"to": to, "on": on})
+        except Exception as e:
+            logger.debug(f"simulateTyping failed for {to}: {e}")
     
     async def sendText(self, to: str, content: str):
         """Send a text message - matches the SocketClient API"""
+        presence = self._presence.get(to)
+        if presence:
+            presence.replied = True
         url = f"{self.base_url}/sendText"
         payload = {
             "args": {
@@ -45,7 +185,8 @@ class OpenWAClient:
         }
         headers = {"api_key": self.api_key}
         try:
-            response = await self.client.post(url, json=payload, headers=headers)
+            with OPEN_WA_REQUEST_SECONDS.time(method="sendText"):
+                response = await self.client.post(url, json=payload, headers=headers)
             response.raise_for_status()
             return response.json()
         except Exception as e:
@@ -53,17 +194,94 @@ class OpenWAClient:
             raise
     
     async def close(self):
+        for task in list(self._background):
+            task.cancel()
         await self.client.aclose()
 
 
-# Global client instance
+# Global client instances
 wa_client: OpenWAClient = None
+admission = AdmissionController()
+openai_client = None  # created off the event loop by get_openai_client(), the SDK import is slow
+
+
+async def get_openai_client():
+    global openai_client
+    if openai_client is None:
+        openai_client = await asyncio.to_thread(create_client)
+    return openai_client
+
+
+# -----------------------------
+# Startup warm-up
+# -----------------------------
+class Startup:
+    """
+    Warm-up that runs once the server is listening: the chat DB and its reader pool, the
+    OpenAI client and the VPS connection are opened, and the webhook registered, all
+    concurrently. Each step is cut off after STARTUP_WARMUP_TIMEOUT_SECONDS and a slow or
+    failed one is only logged (the connection is then opened by the first turn instead; a
+    chat DB that is still migrating keeps opening in the background). /health answers 503
+    until the warm-up is done, so at most that long, and turns that arrive earlier wait for
+    it just as long.
+    """
+
+    def __init__(self):
+        self.ready = asyncio.Event()
+        self.timings: Dict[str, float] = {"imports": round(IMPORT_SECONDS, 3)}
+        self.failed: List[str] = []
+        self.task: Optional[asyncio.Task] = None
+        self._started = 0.0
+
+    def start(self, steps: Dict[str, Callable[[], Awaitable]]):
+        self._started = time.perf_counter()
+        self.task = asyncio.create_task(self._run(steps))
+
+    async def _step(self, name: str, fn: Callable[[], Awaitable]):
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(fn(), STARTUP_WARMUP_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            self.failed.append(name)
+            logger.warning(f"⚠️ Warm-up of {name} timed out after {STARTUP_WARMUP_TIMEOUT_SECONDS}s")
+        except Exception as e:
+            self.failed.append(name)
+            logger.warning(f"⚠️ Warm-up of {name} failed: {type(e).__name__}: {e}")
+        finally:
+            self.timings[name] = round(time.perf_counter() - started, 3)
+
+    async def _run(self, steps: Dict[str, Callable[[], Awaitable]]):
+        await asyncio.gather(*(self._step(name, fn) for name, fn in steps.items()))
+        self.timings["ready"] = round(time.perf_counter() - self._started, 3)
+        for phase, seconds in self.timings.items():
+            STARTUP_SECONDS.set(seconds, phase=phase)
+        self.ready.set()
+        breakdown = ", ".join(f"{phase}={seconds:.3f}s" for phase, seconds in self.timings.items())
+        logger.info(f"✅ Warm-up done: {breakdown}" + (f" (failed: {', '.join(self.failed)})" if self.failed else ""))
+
+
+async def _warm_db():
+    db = await get_chat_db()
+    await db.warm(timeout=STARTUP_WARMUP_TIMEOUT_SECONDS)
+
+
+async def _warm_openai():
+    client = await get_openai_client()
+    if STARTUP_OPENAI_PROBE:
+        await client.models.list(timeout=STARTUP_WARMUP_TIMEOUT_SECONDS)
+
+
+async def _warm_vps():
+    await warm_vps_client(timeout=STARTUP_WARMUP_TIMEOUT_SECONDS)
+
+
+startup: Optional[Startup] = None
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup and shutdown events"""
-    global wa_client
+    global wa_client, startup
     
     logger.info("🚀 Starting WhatsApp bot...")
     logger.info(f"📡 OPEN_WA_HOST={OPEN_WA_HOST}, OPEN_WA_PORT={OPEN_WA_PORT}")
@@ -72,8 +290,18 @@ async def lifespan(app: FastAPI):
     wa_client = OpenWAClient(OPEN_WA_BASE_URL, OPEN_WA_API_KEY)
     logger.info(f"✅ OpenWA client initialized: {OPEN_WA_BASE_URL}")
     
-    # Register webhook with open-wa
-    await register_webhook()
+    # Open connections and register the webhook in the background, so the server starts
+    # listening right away (behind the dispatcher, the dispatcher registers itself)
+    steps: Dict[str, Callable[[], Awaitable]] = {}
+    if settings.bot_warmup:
+        steps.update(db=_warm_db, openai=_warm_openai, vps=_warm_vps)
+    if BOT_REGISTER_WEBHOOK:
+        steps["webhook"] = register_webhook
+    startup = Startup()
+    startup.start(steps)
+    
+    # Archive old ended sessions in the background
+    retention_task = start_retention_job()
     
     logger.info("✅ Bot is running. Waiting for messages...")
     
@@ -81,18 +309,28 @@ async def lifespan(app: FastAPI):
     
     # Cleanup
     logger.info("🛑 Shutting down...")
+    if startup.task:
+        startup.task.cancel()
+    if retention_task:
+        retention_task.cancel()
+    await shutdown_sessions()
     if wa_client:
         await wa_client.close()
+    await close_vps_client()
     logger.info("✅ Bot stopped.")
+    stop_logging()
 
 
 app = FastAPI(lifespan=lifespan)
+# the admin API serves transcripts and phone numbers: only mounted when a key is configured
+if ADMIN_API_KEY:
+    app.include_router(admin_router)
 
 
 async def register_webhook():
     """Register this bot as a webhook receiver with open-wa"""
     # Get the container's IP on the docker bridge network
-    bot_webhook_url = os.getenv("BOT_WEBHOOK_URL")
+    bot_webhook_url = settings.bot_webhook_url
     
     if not bot_webhook_url:
         # Try to auto-detect - the bot container IP that open-wa can reach
@@ -108,19 +346,22 @@ async def register_webhook():
     payload = {
         "args": {
             "url": bot_webhook_url,
-            "events": ["onAnyMessage", "onMessage"]
+            "events": sorted(ACCEPTED_EVENTS)  # onAnyMessage would only double the traffic
         }
     }
     headers = {"api_key": OPEN_WA_API_KEY}
     
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.post(url, json=payload, headers=headers)
-            logger.info(f"📝 Webhook registration response: {response.status_code}")
-            if response.status_code == 200:
-                logger.info("✅ Webhook registered successfully!")
-            else:
-                logger.warning(f"⚠️ Webhook registration returned: {response.text}")
+        if wa_client is not None:
+            response = await wa_client.client.post(url, json=payload, headers=headers, timeout=10.0)
+        else:  # the dispatcher has no OpenWAClient
+            async with httpx.AsyncClient(timeout=10.0) as client:
+                response = await client.post(url, json=payload, headers=headers)
+        logger.info(f"📝 Webhook registration response: {response.status_code}")
+        if response.status_code == 200:
+            logger.info("✅ Webhook registered successfully!")
+        else:
+            logger.warning("⚠️ Webhook registration returned: %s", truncated(response.text))
     except Exception as e:
         logger.warning(f"⚠️ Could not register webhook automatically: {e}")
         logger.info(f"💡 You may need to manually configure open-wa webhook to: {bot_webhook_url}")
@@ -130,29 +371,34 @@ async def register_webhook():
 async def webhook_handler(request: Request):
     """Handle incoming webhook events from open-wa"""
     try:
-        data = await request.json()
-        event = data.get("event", "unknown")
-        logger.info(f"📨 Received webhook event: {event}")
+        # only onMessage is answered; onAnyMessage duplicates, group and self messages are
+        # rejected by ingress before any per-turn work (see core/agent/ingress.py)
+        event, msg_data, outcome = decode_webhook(await request.body())
+        if outcome != "accepted":
+            logger.debug(f"Skipping webhook event {event or 'unknown'}: {outcome}")
+            return rejection_response(outcome)
+        
+        # one trace id per turn, carried through every log line of this message
+        trace_id = set_trace_id()
+        logger.debug(f"Trace {trace_id} for message {msg_data.get('id')}")
+        
+        sender = msg_data.get("from", "unknown")
+        body = msg_data.get("body", "")
+        logger.info(f"📩 Message from {sender}: {body[:50]}...")
         
-        # Only process onMessage event (ignore onAnyMessage to avoid duplicates)
-        # open-wa sends BOTH events for each message
-        if event == "onMessage":
-            msg_data = data.get("data", {})
-            
-            # Skip group messages and messages from self
-            if msg_data.get("isGroupMsg") or msg_data.get("fromMe"):
-                logger.debug("Skipping group/self message")
-                return {"status": "ignored"}
-            
-            sender = msg_data.get("from", "unknown")
-            body = msg_data.get("body", "")
-            logger.info(f"📩 Message from {sender}: {body[:50]}...")
-            
-            # Process the message
+        # Bounded in-flight turns and queue: past them the turn is shed with a busy reply
+        phone = message_phone(msg_data)
+        priority = turn_priority(body, has_active_session(phone))
+        if not await admission.acquire(priority):
+            logger.debug(f"🚦 Shed {PRIORITY_NAMES[priority]} message from {sender}: {admission.stats()}")
+            await send_busy_reply(msg_data, phone)
+            return {"status": "busy"}
+        
+        # Process the message
+        try:
             await process_message(msg_data)
-        elif event == "onAnyMessage":
-            # Skip onAnyMessage to avoid duplicate processing
-            logger.debug("Skipping onAnyMessage (using onMessage instead)")
+        finally:
+            admission.release()
         
         return {"status": "ok"}
     except Exception as e:
@@ -160,25 +406,75 @@ async def webhook_handler(request: Request):
         return {"status": "error", "message": str(e)}
 
 
+async def send_busy_reply(msg: dict, phone: str):
+    """Tell a shed user to retry later, at most once per busy window. Best effort."""
+    if not admission.should_send_busy(phone):
+        return
+    try:
+        await wa_client.sendText(msg.get("chatId") or msg.get("from") or "", AGENT_BUSY_MESSAGE)
+    except Exception as e:
+        logger.warning(f"Failed to send busy reply to {phone}: {e}")
+
+
 async def process_message(msg: dict):
     """Process an incoming message"""
+    TURNS_IN_FLIGHT.inc()
+    started = time.perf_counter()
+    outcome = "ok"
     try:
+        # a message that arrives during the warm-up waits for it instead of opening its own connections
+        if startup is not None and not startup.ready.is_set():
+            try:
+                await asyncio.wait_for(startup.ready.wait(), STARTUP_WARMUP_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                pass  # every step is bounded by the same timeout; go ahead rather than hold the turn
+        
         # Wrap message in expected format for chat_response
         wrapped_msg = {"data": msg}
         
-        await chat_response(
-            msg=wrapped_msg,
-            client=wa_client,
-            openai_client=openai_client,
-        )
+        # One latency budget for the whole turn, shared by every LLM / VPS call
+        deadline = Deadline(TURN_DEADLINE_SECONDS)
+        
+        reply_to = msg.get("chatId") or msg.get("from") or ""
+        async with wa_client.turn_presence(reply_to):
+            await chat_response(
+                msg=wrapped_msg,
+                client=wa_client,
+                openai_client=await get_openai_client(),
+                deadline=deadline,
+            )
     except Exception as e:
+        outcome = "error"
         logger.error(f"❌ Error processing message: {e}")
+    finally:
+        TURNS_IN_FLIGHT.dec()
+        TURN_SECONDS.observe(time.perf_counter() - started, outcome=outcome)
 
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
-    return {"status": "healthy", "open_wa_url": OPEN_WA_BASE_URL}
+    """Health check endpoint; 503 until the startup warm-up is done and while admission is saturated"""
+    if startup is None or not startup.ready.is_set():
+        return JSONResponse(status_code=503, content={"status": "starting", "open_wa_url": OPEN_WA_BASE_URL})
+    if admission.saturated:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "saturated", "open_wa_url": OPEN_WA_BASE_URL, "admission": admission.stats()},
+        )
+    return {
+        "status": "healthy",
+        "ready": True,
+        "open_wa_url": OPEN_WA_BASE_URL,
+        "admission": admission.stats(),
+        "startup_seconds": startup.timings,
+        "warmup_failed": startup.failed,
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics endpoint"""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
 
 
 @app.get("/")
@@ -0,0 +1,573 @@
+"""
+Versioned schema migrations for the chat DB (sqlite).
+
+The schema version of a DB file is its `PRAGMA user_version`. ChatDB runs `migrate()` when
+it opens a file, which applies every migration above that version in order, each in its
+own transaction together with the version bump, so existing files are upgraded in place
+and an interrupted upgrade is simply retried on the next start.
+
+Migrations may list query-plan checks: the plans of those queries are logged before and
+after the migration and a warning is logged if the expected index is not used afterwards.
+
+    python -m core.agent.migrations --status            # version of each DB file
+    python -m core.agent.migrations                     # upgrade DB_PATH (and its shards)
+    python -m core.agent.migrations --explain           # query plans of all checks
+    python -m core.agent.migrations --db other.db --target 2
+
+Storage layout: v4 creates new (empty) files in the compact layout (time-ordered 16-byte ids,
+messages clustered by (session_id, seq) in a WITHOUT ROWID table, NULL instead of '{}'
+metadata) unless CHAT_DB_FORMAT=legacy. Files that already hold sessions keep the legacy
+layout: rewriting a whole file holds its writer, so it is never done at startup. ChatDB
+detects the layout of each file; convert existing files offline (bot stopped) with:
+
+    python -m core.agent.migrations --compact
+
+Never edit a released migration; add a new one.
+"""
+
+import sys
+import sqlite3
+import json
+import time
+import argparse
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from core.agent.venue_catalog import split_recommendations, encode_payload
+from core.logger import get_logger
+from core.settings import settings
+
+logger = get_logger(__name__, service="Agent")
+
+CHAT_DB_FORMAT = settings.chat_db_format  # "compact" | "legacy": layout v4 gives new files
+
+
+# -----------------------------
+# Query plan checks
+# -----------------------------
+# name -> (query, params, what the plan should use - any of)
+QUERY_PLAN_CHECKS: Dict[str, Tuple[str, tuple, Tuple[str, ...]]] = {
+    "session_by_phone": (
+        "SELECT id FROM sessions WHERE phone = ? ORDER BY started_at DESC LIMIT 1",
+        ("6281",),
+        ("idx_sessions_phone_started",),
+    ),
+    "idle_sessions": (
+        "SELECT id FROM sessions WHERE status = ? AND last_activity < ?",
+        ("active", 0),
+        ("idx_sessions_status_activity",),
+    ),
+    "requirements_by_session": (
+        "SELECT event_type FROM user_requirements WHERE session_id = ?",
+        ("s",),
+        ("ux_user_requirements_session", "PRIMARY KEY"),
+    ),
+    "expired_sessions": (
+        "SELECT id FROM sessions WHERE ended_at IS NOT NULL AND ended_at < ? ORDER BY ended_at LIMIT 100",
+        (0,),
+        ("idx_sessions_ended",),
+    ),
+    "venues_by_id": (
+        "SELECT id, payload FROM venues WHERE id IN (?, ?)",
+        ("1", "2"),
+        ("sqlite_autoindex_venues_1", "PRIMARY KEY"),
+    ),
+    "messages_since": (
+        "SELECT body FROM messages WHERE timestamp > ? AND timestamp <= ? ORDER BY timestamp",
+        (0, 1),
+        ("idx_messages_timestamp",),
+    ),
+    # compact layout only
+    "history_by_session": (
+        "SELECT body FROM messages WHERE session_id = ? ORDER BY seq DESC LIMIT 20",
+        (b"s",),
+        ("PRIMARY KEY",),
+    ),
+    # the delete trigger's lookup, once per deleted message
+    "search_doc_by_message": (
+        "SELECT doc FROM message_search_docs WHERE session_id = ? AND seq = ?",
+        (b"s", 1),
+        ("ux_message_search_docs",),
+    ),
+}
+
+
+def explain(conn: sqlite3.Connection, query: str, params: tuple = ()) -> List[str]:
+    """EXPLAIN QUERY PLAN details, one line per plan step."""
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()]
+
+
+def _plan_text(plan: List[str]) -> str:
+    return " | ".join(plan)
+
+
+# -----------------------------
+# Migrations
+# -----------------------------
+class Migration:
+    def __init__(self, version: int, description: str, statements: List[str] = (), apply: Optional[Callable] = None, checks: List[str] = (), vacuum: bool = False):
+        self.version = version
+        self.description = description
+        self.statements = list(statements)
+        self.apply = apply  # optional fn(conn) run before the statements
+        self.checks = list(checks)
+        self.vacuum = vacuum  # rewrites most of the file: VACUUM afterwards to give the space back
+
+    def run(self, conn: sqlite3.Connection) -> bool:
+        """Returns False when the migration turned out to be a no-op for this file."""
+        changed = self.apply(conn) if self.apply else True
+        for statement in self.statements:
+            conn.execute(statement)
+        return changed is not False
+
+
+def _dedupe_user_requirements(conn: sqlite3.Connection):
+    """Fold duplicate user_requirements rows into the newest one per session."""
+    columns = [
+        "event_type", "country", "location", "attendees", "budget", "start_date", "end_date",
+        "email", "customer_name", "ticket_id", "venue_recommendations",
+    ]
+    duplicated = [
+        row[0] for row in conn.execute(
+            "SELECT session_id FROM user_requirements GROUP BY session_id HAVING COUNT(*) > 1"
+        ).fetchall()
+    ]
+    for session_id in duplicated:
+        # newest non-null value of each column, the same result the old SELECT + UPDATE path converged to
+        assignments = ", ".join(
+            f"{col} = (SELECT {col} FROM user_requirements WHERE session_id = :sid AND {col} IS NOT NULL ORDER BY rowid DESC LIMIT 1)"
+            for col in columns
+        )
+        keep = conn.execute("SELECT MAX(rowid) FROM user_requirements WHERE session_id = ?", (session_id,)).fetchone()[0]
+        conn.execute(f"UPDATE user_requirements SET {assignments} WHERE rowid = :keep", {"sid": session_id, "keep": keep})
+        conn.execute("DELETE FROM user_requirements WHERE session_id = ? AND rowid != ?", (session_id, keep))
+    if duplicated:
+        logger.info(f"Merged duplicate user_requirements rows of {len(duplicated)} sessions")
+
+
+COMPACT_SCHEMA = [
+    """CREATE TABLE sessions (
+        id BLOB PRIMARY KEY,
+        phone TEXT NOT NULL,
+        user_name TEXT,
+        started_at INTEGER NOT NULL,
+        last_activity INTEGER NOT NULL,
+        status TEXT NOT NULL DEFAULT 'active',
+        ended_at INTEGER,
+        metadata TEXT
+    ) WITHOUT ROWID""",
+    "CREATE INDEX idx_sessions_phone_started ON sessions(phone, started_at)",
+    "CREATE INDEX idx_sessions_status_activity ON sessions(status, last_activity)",
+    "CREATE INDEX idx_sessions_last_activity ON sessions(last_activity)",
+    """CREATE TABLE messages (
+        session_id BLOB NOT NULL,
+        seq INTEGER NOT NULL,
+        sender TEXT NOT NULL,
+        body TEXT,
+        timestamp INTEGER NOT NULL,
+        metadata TEXT,
+        PRIMARY KEY (session_id, seq),
+        FOREIGN KEY(session_id) REFERENCES sessions(id)
+    ) WITHOUT ROWID""",
+    """CREATE TABLE user_requirements (
+        session_id BLOB PRIMARY KEY,
+        event_type TEXT,
+        country TEXT,
+        location TEXT,
+        attendees INTEGER,
+        budget TEXT,
+        start_date TEXT,
+        end_date TEXT,
+        email TEXT,
+        customer_name TEXT,
+        ticket_id TEXT,
+        venue_recommendations TEXT,
+        FOREIGN KEY(session_id) REFERENCES sessions(id)
+    ) WITHOUT ROWID""",
+]
+
+
+# Full-text search over messages.body (core/agent/search.py). messages_fts is an external-content
+# FTS5 table: bodies are not stored twice, the index reads them through message_search_content.
+# message_search_docs gives every searchable message an integer doc id (the compact messages table
+# has no rowid); triggers keep docs and index in step with every insert / delete on messages.
+def search_index_schema(compact: bool) -> List[str]:
+    if compact:
+        key_columns, key_new, key_old = "session_id BLOB NOT NULL, seq INTEGER NOT NULL", "new.session_id, new.seq", "session_id = old.session_id AND seq = old.seq"
+        docs_columns, join = "session_id, seq", "m.session_id = d.session_id AND m.seq = d.seq"
+    else:
+        key_columns, key_new, key_old = "message_id TEXT NOT NULL", "new.id", "message_id = old.id"
+        docs_columns, join = "message_id", "m.id = d.message_id"
+    return [
+        f"CREATE TABLE message_search_docs (doc INTEGER PRIMARY KEY, {key_columns})",
+        f"CREATE UNIQUE INDEX ux_message_search_docs ON message_search_docs({docs_columns})",
+        f"""CREATE VIEW message_search_content AS
+            SELECT d.doc AS doc, m.body AS body FROM message_search_docs d JOIN messages m ON {join}""",
+        """CREATE VIRTUAL TABLE messages_fts USING fts5(
+            body, content='message_search_content', content_rowid='doc', tokenize='unicode61 remove_diacritics 2'
+        )""",
+        f"""CREATE TRIGGER messages_search_insert AFTER INSERT ON messages WHEN new.body IS NOT NULL AND new.body != '' BEGIN
+            INSERT INTO message_search_docs ({docs_columns}) VALUES ({key_new});
+            INSERT INTO messages_fts (rowid, body) VALUES (last_insert_rowid(), new.body);
+        END""",
+        f"""CREATE TRIGGER messages_search_delete AFTER DELETE ON messages BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, body)
+                SELECT 'delete', doc, old.body FROM message_search_docs WHERE {key_old};
+            DELETE FROM message_search_docs WHERE {key_old};
+        END""",
+    ]
+
+
+def has_search_index(conn: sqlite3.Connection) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'messages_fts'").fetchone() is not None
+
+
+def drop_search_index(conn: sqlite3.Connection) -> bool:
+    """Drop the search index objects; returns whether there were any."""
+    existed = has_search_index(conn)
+    for statement in (
+        "DROP TRIGGER IF EXISTS messages_search_insert",
+        "DROP TRIGGER IF EXISTS messages_search_delete",
+        "DROP TABLE IF EXISTS messages_fts",
+        "DROP VIEW IF EXISTS message_search_content",
+        "DROP TABLE IF EXISTS message_search_docs",
+    ):
+        conn.execute(statement)
+    return existed
+
+
+def create_search_index(conn: sqlite3.Connection):
+    """Create the search index for the file's layout and index the existing messages."""
+    if has_search_index(conn):
+        return False
+    compact = is_compact(conn)
+    for statement in search_index_schema(compact):
+        conn.execute(statement)
+    docs_key, message_key = ("session_id, seq", "session_id, seq") if compact else ("message_id", "id")
+    conn.execute(
+        f"INSERT INTO message_search_docs ({docs_key}) SELECT {message_key} FROM messages WHERE body IS NOT NULL AND body != ''"
+    )
+    conn.execute("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')")
+    indexed = conn.execute("SELECT COUNT(*) FROM message_search_docs").fetchone()[0]
+    logger.info(f"Indexed {indexed} messages for full-text search")
+    return True
+
+
+def is_compact(conn: sqlite3.Connection) -> bool:
+    """True if the file uses the compact layout (messages keyed by (session_id, seq))."""
+    return any(row[1] == "seq" for row in conn.execute("PRAGMA table_info(messages)").fetchall())
+
+
+def _id_blob(session_id: str) -> bytes:
+    """Legacy text id -> 16-byte blob (ids are 32 hex chars, possibly behind an old shard tag)."""
+    return bytes.fromhex(session_id.rsplit("_", 1)[-1])
+
+
+def convert_to_compact(conn: sqlite3.Connection):
+    """Rewrite a legacy-layout file into the compact layout (inside the caller's transaction)."""
+    if is_compact(conn):
+        return False
+    searchable = drop_search_index(conn)  # rebuilt for the new layout below
+    conn.create_function("id_blob", 1, _id_blob, deterministic=True)
+    # indexes of later migrations go away with the legacy tables
+    later_indexes = [
+        row[0] for row in conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'index' AND name IN ('idx_sessions_ended', 'idx_messages_timestamp')"
+        ).fetchall()
+    ]
+    for table in ("sessions", "messages", "user_requirements"):
+        conn.execute(f"ALTER TABLE {table} RENAME TO legacy_{table}")
+    for index in ("idx_sessions_phone_started", "idx_sessions_status_activity", "idx_sessions_last_activity", "idx_messages_session_ts", "ux_user_requirements_session"):
+        conn.execute(f"DROP INDEX IF EXISTS {index}")
+    for statement in COMPACT_SCHEMA:
+        conn.execute(statement)
+    conn.execute(
+        """INSERT INTO sessions (id, phone, user_name, started_at, last_activity, status, ended_at, metadata)
+        SELECT id_blob(id), phone, user_name, started_at, last_activity, status, ended_at, NULLIF(metadata, '{}')
+        FROM legacy_sessions"""
+    )
+    # seq follows the old history order (timestamp, then insertion)
+    conn.execute(
+        """INSERT INTO messages (session_id, seq, sender, body, timestamp, metadata)
+        SELECT id_blob(session_id), ROW_NUMBER() OVER (PARTITION BY session_id ORDER BY timestamp, rowid),
+               sender, body, timestamp, NULLIF(metadata, '{}')
+        FROM legacy_messages"""
+    )
+    conn.execute(
+        """INSERT INTO user_requirements
+        SELECT id_blob(session_id), event_type, country, location, attendees, budget, start_date, end_date,
+               email, customer_name, ticket_id, venue_recommendations
+        FROM legacy_user_requirements"""
+    )
+    for table in ("sessions", "messages", "user_requirements"):
+        conn.execute(f"DROP TABLE legacy_{table}")
+    for statement in later_indexes:
+        conn.execute(statement)
+    if searchable:
+        create_search_index(conn)
+    return True
+
+
+VENUES_SCHEMA = """CREATE TABLE IF NOT EXISTS venues (
+    id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    updated_at INTEGER NOT NULL
+)"""
+
+
+def _normalize_venue_recommendations(conn: sqlite3.Connection):
+    """Move venue payloads out of user_requirements into `venues`, keeping [id, score] references."""
+    conn.execute(VENUES_SCHEMA)
+    now = int(time.time())
+    converted = 0
+    rows = conn.execute(
+        "SELECT session_id, venue_recommendations FROM user_requirements WHERE venue_recommendations IS NOT NULL"
+    ).fetchall()
+    for session_id, stored in rows:
+        try:
+            venues = json.loads(stored)
+        except ValueError:
+            continue
+        if not isinstance(venues, list):
+            continue
+        refs, payloads = split_recommendations(venues)
+        if not payloads:
+            continue  # already references, or nothing with an id
+        conn.executemany(
+            "INSERT INTO venues (id, payload, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET payload = excluded.payload, updated_at = excluded.updated_at",
+            [(venue_id, encode_payload(payload), now) for venue_id, payload in payloads.items()]
+        )
+        conn.execute(
+            "UPDATE user_requirements SET venue_recommendations = ? WHERE session_id = ?",
+            (json.dumps(refs), session_id)
+        )
+        converted += 1
+    if converted:
+        logger.info(f"Normalized the venue recommendations of {converted} sessions into the venues table")
+    return converted > 0
+
+
+def _compact_layout(conn: sqlite3.Connection):
+    if CHAT_DB_FORMAT == "legacy":
+        logger.info("CHAT_DB_FORMAT=legacy: keeping the legacy storage layout")
+        return False
+    if not is_compact(conn) and conn.execute("SELECT 1 FROM sessions LIMIT 1").fetchone():
+        logger.info("Keeping the legacy layout of a chat DB with sessions; convert it with `python -m core.agent.migrations --compact`")
+        return False
+    return convert_to_compact(conn)
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(
+        1,
+        "baseline schema (tables as created before versioning)",
+        [
+            """CREATE TABLE IF NOT EXISTS sessions (
+                id TEXT PRIMARY KEY,
+                phone TEXT NOT NULL,
+                user_name TEXT,
+                started_at INTEGER NOT NULL,
+                last_activity INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'active',
+                ended_at INTEGER,
+                metadata TEXT
+            )""",
+            "CREATE INDEX IF NOT EXISTS idx_sessions_phone ON sessions(phone)",
+            "CREATE INDEX IF NOT EXISTS idx_sessions_last_activity ON sessions(last_activity)",
+            """CREATE TABLE IF NOT EXISTS messages (
+                id TEXT PRIMARY KEY,
+                session_id TEXT NOT NULL,
+                sender TEXT NOT NULL,
+                body TEXT,
+                timestamp INTEGER NOT NULL,
+                metadata TEXT,
+                FOREIGN KEY(session_id) REFERENCES sessions(id)
+            )""",
+            "CREATE INDEX IF NOT EXISTS idx_messages_session_ts ON messages(session_id, timestamp)",
+            """CREATE TABLE IF NOT EXISTS user_requirements (
+                session_id TEXT NOT NULL,
+                event_type TEXT,
+                country TEXT,
+                location TEXT,
+                attendees INTEGER,
+                budget TEXT,
+                start_date TEXT,
+                end_date TEXT,
+                email TEXT,
+                customer_name TEXT,
+                ticket_id TEXT,
+                venue_recommendations TEXT,
+                FOREIGN KEY(session_id) REFERENCES sessions(id)
+            )""",
+        ],
+    ),
+    Migration(
+        2,
+        "one user_requirements row per session (enables INSERT ... ON CONFLICT upserts)",
+        ["CREATE UNIQUE INDEX IF NOT EXISTS ux_user_requirements_session ON user_requirements(session_id)"],
+        apply=_dedupe_user_requirements,
+        checks=["requirements_by_session"],
+    ),
+    Migration(
+        3,
+        "(phone, started_at) index for latest-session lookups, (status, last_activity) for sweeps",
+        [
+            "CREATE INDEX IF NOT EXISTS idx_sessions_phone_started ON sessions(phone, started_at)",
+            # prefix of the new index
+            "DROP INDEX IF EXISTS idx_sessions_phone",
+            "CREATE INDEX IF NOT EXISTS idx_sessions_status_activity ON sessions(status, last_activity)",
+        ],
+        checks=["session_by_phone", "idle_sessions"],
+    ),
+    Migration(
+        4,
+        "compact layout for new files: time-ordered blob ids, messages clustered by (session_id, seq), NULL empty metadata",
+        apply=_compact_layout,
+        checks=["history_by_session", "session_by_phone"],
+        vacuum=True,
+    ),
+    Migration(
+        5,
+        "incremental auto-vacuum and an ended_at index for the retention job",
+        [
+            # takes effect with the VACUUM below; afterwards freed pages can be returned in small steps
+            "PRAGMA auto_vacuum = INCREMENTAL",
+            "CREATE INDEX IF NOT EXISTS idx_sessions_ended ON sessions(ended_at) WHERE ended_at IS NOT NULL",
+        ],
+        checks=["expired_sessions"],
+        vacuum=True,
+    ),
+    Migration(
+        6,
+        "venues table: sessions keep [venue id, score] references instead of full payloads",
+        apply=_normalize_venue_recommendations,
+        checks=["venues_by_id"],
+        vacuum=True,
+    ),
+    Migration(
+        7,
+        "FTS5 index over messages.body, maintained by triggers",
+        apply=create_search_index,
+        checks=["search_doc_by_message"],
+    ),
+    Migration(
+        8,
+        "messages.timestamp index for incremental analytics exports",
+        ["CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages(timestamp)"],
+        checks=["messages_since"],
+    ),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def get_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def _tables_exist(conn: sqlite3.Connection) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sessions'").fetchone() is not None
+
+
+def migrate(conn: sqlite3.Connection, target: Optional[int] = None, label: str = "") -> int:
+    """Apply pending migrations up to `target` (default: all). Returns the resulting version."""
+    target = LATEST_VERSION if target is None else target
+    current = get_version(conn)
+    if current > LATEST_VERSION:
+        logger.warning(f"Chat DB {label} is at schema version {current}, newer than this code ({LATEST_VERSION})")
+        return current
+    pending = [m for m in MIGRATIONS if current < m.version <= target]
+    if not pending:
+        return current
+
+    for migration in pending:
+        _apply(conn, migration.version, migration.description, migration.run, migration.checks, migration.vacuum, label)
+    return get_version(conn)
+
+
+def _plans(conn: sqlite3.Connection, checks: List[str]) -> Dict[str, List[str]]:
+    plans = {}
+    for name in checks:
+        try:
+            plans[name] = explain(conn, *QUERY_PLAN_CHECKS[name][:2])
+        except sqlite3.OperationalError:
+            pass  # table / column not there (yet, or in this layout)
+    return plans
+
+
+def _apply(conn: sqlite3.Connection, version: Optional[int], description: str, run: Callable, checks: List[str], vacuum: bool, label: str):
+    """Run `run(conn)` (and bump user_version to `version`) in one transaction, then check query plans."""
+    before = _plans(conn, checks)
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None  # explicit transactions: DDL + version bump commit together
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            changed = run(conn)
+            if version is not None:
+                conn.execute(f"PRAGMA user_version = {version}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            logger.exception(f"Chat DB {label} migration failed: {description}")
+            raise
+        logger.info(f"Chat DB {label} migrated{f' to v{version}' if version else ''}: {description}")
+        if vacuum and changed is not False:
+            pages_before = conn.execute("PRAGMA page_count").fetchone()[0]
+            conn.execute("VACUUM")
+            pages_after = conn.execute("PRAGMA page_count").fetchone()[0]
+            logger.info(f"Chat DB {label} vacuumed: {pages_before} -> {pages_after} pages")
+    finally:
+        conn.isolation_level = isolation_level
+    after = _plans(conn, checks)
+    for name, plan in after.items():
+        expected = QUERY_PLAN_CHECKS[name][2]
+        if name in before:
+            logger.info(f"Query plan {name}: {_plan_text(before[name])} -> {_plan_text(plan)}")
+        if not any(use in step for step in plan for use in expected):
+            logger.warning(f"Query plan {name} does not use {' / '.join(expected)}: {_plan_text(plan)}")
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+def _default_db_paths() -> List[Path]:
+    from core.agent.session import DB_PATH, CHAT_DB_SHARDS, create_chat_db
+
+    db = create_chat_db(DB_PATH, CHAT_DB_SHARDS)
+    return [shard.db_path for shard in getattr(db, "shards", [db])]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Chat DB schema migrations")
+    parser.add_argument("--db", action="append", help="DB file (repeatable; default: DB_PATH and its shards)")
+    parser.add_argument("--target", type=int, help=f"migrate up to this version (default: {LATEST_VERSION})")
+    parser.add_argument("--status", action="store_true", help="only print the schema version of each file")
+    parser.add_argument("--explain", action="store_true", help="print the query plans of all checks")
+    parser.add_argument("--compact", action="store_true", help="convert legacy-layout files to the compact layout")
+    args = parser.parse_args(argv)
+
+    paths = [Path(p) for p in args.db] if args.db else _default_db_paths()
+    for path in paths:
+        if not path.exists() and args.status:
+            print(f"{path}: missing")
+            continue
+        conn = sqlite3.connect(str(path))
+        try:
+            if not args.status:
+                migrate(conn, target=args.target, label=str(path))
+                if args.compact and not is_compact(conn):
+                    _apply(conn, None, "converted to the compact layout", convert_to_compact, ["history_by_session"], True, str(path))
+            layout = "compact" if is_compact(conn) else "legacy"
+            print(f"{path}: v{get_version(conn)} (latest v{LATEST_VERSION}), {layout} layout, {path.stat().st_size} bytes")
+            if args.explain and _tables_exist(conn):
+                for name, plan in _plans(conn, list(QUERY_PLAN_CHECKS)).items():
+                    print(f"  {name} [{' / '.join(QUERY_PLAN_CHECKS[name][2])}]: {_plan_text(plan)}")
+        finally:
+            conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
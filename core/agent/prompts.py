@@ -111,12 +111,13 @@ Answer the user message using the following format: {venue_conclusion}
 - If multiple venues are still available, include in the 'response_footer' a follow-up prompting the user to share their preference (e.g., "Please let me know your preference so I can assist you further.").              
 """
 
-CONFIRM_BOOKING_EXTRA_PROMPT = """
-Answer the user message using the format: '{book_venue_text}'  
+VENUE_DETAILS_EXTRA_PROMPT = """
+The user is asking about the venues that were already recommended in this chat. Answer ONLY from their data below (numbered in the order they were shown):
+{venues}
 
-- Place the answer in 'response_header'.  
-- Leave 'response_content' as an empty string.  
-- Set 'response_footer' to: "Is there anything else I can help you with?"  
+- Refer to venues by their number and exact name.
+- If the data does not say, tell the user that information is not listed. Do NOT make up or hallucinate any venue details.
+- In 'response_footer', ask whether they would like to book one of them.
 """
 
 FINAL_RESPONSE_SYSTEM_PROMPT = """
@@ -0,0 +1,339 @@
+"""
+Retention for the chat DB: ended sessions move out of the live files into archives.
+
+Every RETENTION_INTERVAL_SECONDS the job takes sessions that ended more than RETENTION_DAYS
+ago, in batches of RETENTION_BATCH_SESSIONS, and for each batch:
+
+1. exports the sessions with their messages and requirements,
+2. appends them to `<db name>-YYYY-MM.jsonl.gz` in CHAT_ARCHIVE_DIR (month of `ended_at`),
+3. deletes them from the live DB in one transaction,
+
+then returns the freed pages with incremental VACUUM and truncates the WAL. Off by default
+(RETENTION_ENABLED): deployments opt in, or run it by hand with the CLI below.
+
+A batch is written to a journal (`<db name>.pending.json`: its session ids and the archive
+file sizes before the append) before the archive, and the journal is removed once the delete
+has committed. After a crash, the next pass finds the journal: if the sessions are still in
+the DB the append is cut off again (they are archived anew), otherwise the archive already
+holds them. Either way every session ends up in the archive exactly once. One process at a
+time archives a DB file (`<db name>.lock`); a pass that finds it taken skips that file.
+
+Archives are gzip files of one JSON record per line, appended one gzip member per batch:
+
+    {"session": {...}, "messages": [{"seq": 1, "sender": "user", ...}], "requirements": {...},
+     "venues": {"<venue id>": {...payload}}}
+
+    python -m core.agent.retention run [--days 30] [--dry-run]
+    python -m core.agent.retention restore <session_id>
+    python -m core.agent.retention list
+"""
+
+import os
+import sys
+import gzip
+import json
+import time
+import fcntl
+import asyncio
+import argparse
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, List, Optional, Union
+
+from core.agent.config import (
+    RETENTION_ENABLED,
+    RETENTION_DAYS,
+    RETENTION_INTERVAL_SECONDS,
+    RETENTION_BATCH_SESSIONS,
+    RETENTION_BATCH_PAUSE_SECONDS,
+    RETENTION_VACUUM_PAGES,
+)
+from core.agent.session import ChatDB, ShardedChatDB, DB_DIR, get_chat_db
+from core.logger import get_logger
+from core.metrics import RETENTION_SESSIONS
+from core.settings import settings
+
+logger = get_logger(__name__, service="Agent")
+
+CHAT_ARCHIVE_DIR = Path(settings.chat_archive_dir or DB_DIR / "archive")
+
+
+def _shards(db: Union[ChatDB, ShardedChatDB]) -> List[ChatDB]:
+    return getattr(db, "shards", [db])
+
+
+def _month(ts: int) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m")
+
+
+def _fsync_dir(path: Path):
+    # makes a rename / unlink in the directory durable
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class SessionArchive:
+    """Monthly append-only archive files of one ChatDB file."""
+
+    def __init__(self, db_path: Path, archive_dir: Path = CHAT_ARCHIVE_DIR):
+        self.archive_dir = Path(archive_dir)
+        self.prefix = Path(db_path).stem
+
+    def path_for(self, month: str) -> Path:
+        return self.archive_dir / f"{self.prefix}-{month}.jsonl.gz"
+
+    def files(self) -> List[Path]:
+        return sorted(self.archive_dir.glob(f"{self.prefix}-*.jsonl.gz"))
+
+    @property
+    def journal_path(self) -> Path:
+        return self.archive_dir / f"{self.prefix}.pending.json"
+
+    def try_lock(self) -> Optional[IO]:
+        """Exclusive lock on this DB's archive (held until unlock()); None if another process has it. Blocking."""
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        f = open(self.archive_dir / f"{self.prefix}.lock", "a")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            return None
+        return f
+
+    @staticmethod
+    def unlock(f: IO):
+        fcntl.flock(f, fcntl.LOCK_UN)
+        f.close()
+
+    def begin(self, records: List[Dict[str, Any]]):
+        """Journal a batch before it is appended: its session ids and the sizes of the files it touches. Blocking."""
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        paths = {self.path_for(_month(record["session"]["ended_at"])) for record in records}
+        journal = {
+            "ids": [record["session"]["id"] for record in records],
+            "sizes": {path.name: path.stat().st_size if path.exists() else 0 for path in paths},
+        }
+        tmp = self.journal_path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(journal, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.journal_path)
+        _fsync_dir(self.archive_dir)
+
+    def pending(self) -> Optional[Dict[str, Any]]:
+        """The journal of a batch that was not finished (the process died), if any. Blocking."""
+        try:
+            with open(self.journal_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def rollback(self, journal: Dict[str, Any]):
+        """Cut the files back to their size before the journaled append (complete or torn). Blocking."""
+        for name, size in journal["sizes"].items():
+            path = self.archive_dir / name
+            if path.exists() and path.stat().st_size > size:
+                with open(path, "r+b") as f:
+                    f.truncate(size)
+                    os.fsync(f.fileno())
+
+    def commit(self):
+        """The journaled batch is archived and deleted from the DB. Blocking."""
+        self.journal_path.unlink(missing_ok=True)
+        _fsync_dir(self.archive_dir)
+
+    def append(self, records: List[Dict[str, Any]]):
+        """Append records (one gzip member per month touched) and fsync. Blocking."""
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        by_month: Dict[str, List[Dict[str, Any]]] = {}
+        for record in records:
+            by_month.setdefault(_month(record["session"]["ended_at"]), []).append(record)
+        for month, month_records in by_month.items():
+            payload = "".join(json.dumps(r, ensure_ascii=False, separators=(",", ":")) + "\n" for r in month_records)
+            data = gzip.compress(payload.encode("utf-8"))
+            with open(self.path_for(month), "ab") as f:
+                # another process may be archiving the same file
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def iter_records(self, path: Path) -> Iterator[Dict[str, Any]]:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def find(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Last archived copy of a session. Blocking; scans the likely months first."""
+        files = self.files()
+        likely = set()
+        try:
+            # time-ordered ids start with the creation time in ms; sessions end within a month of it
+            started = int(session_id[:12], 16) / 1000
+            if 1_500_000_000 < started < time.time() + 86400:
+                likely = {self.path_for(_month(started)), self.path_for(_month(started + 31 * 86400))}
+        except ValueError:
+            pass
+        ordered = [p for p in files if p in likely] + [p for p in files if p not in likely]
+        for path in ordered:
+            found = None
+            for record in self.iter_records(path):
+                if record["session"]["id"] == session_id:
+                    found = record
+            if found:
+                return found
+        return None
+
+
+class RetentionJob:
+    def __init__(self, db: Union[ChatDB, ShardedChatDB], days: int = RETENTION_DAYS, archive_dir: Path = CHAT_ARCHIVE_DIR):
+        self.db = db
+        self.days = days
+        self.archive_dir = Path(archive_dir)
+
+    async def run_once(self, dry_run: bool = False) -> Dict[str, int]:
+        """One full pass over every shard. Returns sessions archived and pages freed."""
+        cutoff = int(time.time()) - self.days * 86400
+        totals = {"sessions": 0, "messages": 0, "pages_freed": 0}
+        loop = asyncio.get_running_loop()
+        for shard in _shards(self.db):
+            archive = SessionArchive(shard.db_path, self.archive_dir)
+            lock = await loop.run_in_executor(None, archive.try_lock)
+            if lock is None:
+                logger.info(f"Retention skipped {shard.db_path.name}: another process is archiving it")
+                continue
+            try:
+                if not dry_run:
+                    await self._recover(shard, archive)
+                await self._archive_shard(shard, archive, cutoff, dry_run, totals)
+            finally:
+                archive.unlock(lock)
+        if totals["sessions"]:
+            logger.info(
+                f"Retention {'(dry run) ' if dry_run else ''}archived {totals['sessions']} sessions / "
+                f"{totals['messages']} messages ended before {_month(cutoff)}, freed {totals['pages_freed']} pages"
+            )
+        return totals
+
+    async def _recover(self, shard: ChatDB, archive: SessionArchive):
+        """Finish the batch a crashed pass left between archive append and DB delete."""
+        loop = asyncio.get_running_loop()
+        journal = await loop.run_in_executor(None, archive.pending)
+        if journal is None:
+            return
+        live = [session_id for session_id in journal["ids"] if await shard.get_session(session_id)]
+        if live:
+            # not deleted: drop whatever was appended, the sessions are archived again this pass
+            await loop.run_in_executor(None, archive.rollback, journal)
+        logger.warning(
+            f"Retention recovered an unfinished batch of {len(journal['ids'])} sessions in {shard.db_path.name}: "
+            f"{'re-archiving' if live else 'already archived and deleted'}"
+        )
+        await loop.run_in_executor(None, archive.commit)
+
+    async def _archive_shard(self, shard: ChatDB, archive: SessionArchive, cutoff: int, dry_run: bool, totals: Dict[str, int]):
+        loop = asyncio.get_running_loop()
+        while True:
+            records = await shard.export_ended_sessions(cutoff, RETENTION_BATCH_SESSIONS)
+            if not records:
+                break
+            totals["sessions"] += len(records)
+            totals["messages"] += sum(len(r["messages"]) for r in records)
+            if dry_run:
+                return
+            await loop.run_in_executor(None, archive.begin, records)
+            await loop.run_in_executor(None, archive.append, records)
+            await shard.delete_sessions([r["session"]["id"] for r in records])
+            await loop.run_in_executor(None, archive.commit)
+            RETENTION_SESSIONS.inc(len(records), action="archived")
+            if len(records) < RETENTION_BATCH_SESSIONS:
+                break
+            await asyncio.sleep(RETENTION_BATCH_PAUSE_SECONDS)
+        while True:
+            freed = await shard.incremental_vacuum(RETENTION_VACUUM_PAGES)
+            totals["pages_freed"] += freed
+            if freed < RETENTION_VACUUM_PAGES:
+                break
+            await asyncio.sleep(RETENTION_BATCH_PAUSE_SECONDS)
+
+    async def run_forever(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Retention pass failed")
+            await asyncio.sleep(RETENTION_INTERVAL_SECONDS)
+
+
+async def restore_session(db: Union[ChatDB, ShardedChatDB], session_id: str, archive_dir: Path = CHAT_ARCHIVE_DIR) -> bool:
+    """Bring an archived session back into the live DB (it stays in the archive too)."""
+    if isinstance(db, ShardedChatDB):
+        shard, local_id = db.shard_for_session(session_id)
+    else:
+        shard, local_id = db, session_id
+    archive = SessionArchive(shard.db_path, archive_dir)
+    record = await asyncio.get_running_loop().run_in_executor(None, archive.find, local_id)
+    if record is None:
+        return False
+    restored = await shard.restore_session_record(record)
+    if restored:
+        RETENTION_SESSIONS.inc(action="restored")
+        logger.info(f"Restored archived session {session_id} ({len(record['messages'])} messages)")
+    return True
+
+
+def start_retention_job() -> Optional[asyncio.Task]:
+    """Background retention for the app's chat DB (None when disabled)."""
+    if not RETENTION_ENABLED:
+        return None
+
+    async def _run():
+        await RetentionJob(await get_chat_db()).run_forever()
+
+    return asyncio.create_task(_run())
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+async def _cli(args) -> int:
+    db = await get_chat_db()
+    if args.command == "run":
+        totals = await RetentionJob(db, days=args.days).run_once(dry_run=args.dry_run)
+        print(json.dumps(totals))
+    elif args.command == "restore":
+        found = await restore_session(db, args.session_id)
+        print("restored" if found else "not found in archive")
+        return 0 if found else 1
+    elif args.command == "list":
+        for shard in _shards(db):
+            for path in SessionArchive(shard.db_path).files():
+                print(f"{path} {path.stat().st_size} bytes")
+    await db.close()
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Chat DB retention and archive restore")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("run", help="archive sessions ended more than --days ago")
+    run.add_argument("--days", type=int, default=RETENTION_DAYS)
+    run.add_argument("--dry-run", action="store_true", help="only count what would be archived (first batch per shard)")
+    restore = sub.add_parser("restore", help="copy an archived session back into the live DB")
+    restore.add_argument("session_id")
+    sub.add_parser("list", help="list archive files")
+    return asyncio.run(_cli(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""
+Full-text search over conversation history, for support and operations.
+
+Backed by the FTS5 index of migration v7 (messages_fts, kept in step with messages by
+triggers), so a search is an index lookup instead of a `LIKE` scan of every body. Searches
+only ever use read-only connections: ChatDB.search_messages runs on the reader pool and the
+CLI opens the files with `mode=ro`, so they never hold up the bot's writer.
+
+Queries use FTS5 syntax: words (all must match), "exact phrases", prefix* and OR / NOT.
+Text that is not valid FTS5 syntax is searched as plain words.
+
+    python -m core.agent.search 'wedding bali'
+    python -m core.agent.search '"wedding venue" bal*' --phone 628123456789 --since 7d
+    python -m core.agent.search 'refund OR cancel' --since 2026-10-01 --until 2026-10-08 --json
+"""
+
+import re
+import sys
+import json
+import time
+import sqlite3
+import argparse
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from core.agent.config import SEARCH_DEFAULT_LIMIT, SEARCH_SNIPPET_TOKENS
+from core.agent.migrations import is_compact, has_search_index
+
+RELATIVE_TIME = re.compile(r"^(\d+)([mhdw])$")
+RELATIVE_UNITS = {"m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+
+
+def parse_time(value: Union[str, int, None]) -> Optional[int]:
+    """Epoch seconds from an epoch, an ISO date/datetime or a relative age like "30m", "24h", "7d"."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, int) or str(value).isdigit():
+        return int(value)
+    relative = RELATIVE_TIME.match(str(value))
+    if relative:
+        return int(time.time()) - int(relative.group(1)) * RELATIVE_UNITS[relative.group(2)]
+    return int(datetime.fromisoformat(str(value)).timestamp())
+
+
+def quote_terms(text: str) -> str:
+    """Plain-word FTS5 query for text that is not valid FTS5 syntax."""
+    return " ".join('"' + word.replace('"', '""') + '"' for word in text.split())
+
+
+def search_messages(
+    conn: sqlite3.Connection,
+    compact: bool,
+    query: str,
+    phone: Optional[str] = None,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    sender: Optional[str] = None,
+    limit: int = SEARCH_DEFAULT_LIMIT,
+    highlight: Tuple[str, str] = ("[", "]"),
+) -> List[Dict[str, Any]]:
+    """Best matches first (bm25), each with a snippet around the matched words."""
+    if not query.strip():
+        return []
+    if compact:
+        joins = "JOIN messages m ON m.session_id = d.session_id AND m.seq = d.seq"
+        message_key = "m.seq"
+    else:
+        joins = "JOIN messages m ON m.id = d.message_id"
+        message_key = "m.id"
+    filters, params = [], []
+    for clause, value in (("s.phone = ?", phone), ("m.timestamp >= ?", since), ("m.timestamp < ?", until), ("m.sender = ?", sender)):
+        if value is not None:
+            filters.append(clause)
+            params.append(value)
+    sql = f"""
+        SELECT s.id, s.phone, s.user_name, {message_key}, m.sender, m.timestamp,
+               snippet(messages_fts, 0, ?, ?, '…', ?), bm25(messages_fts)
+        FROM messages_fts
+        JOIN message_search_docs d ON d.doc = messages_fts.rowid
+        {joins}
+        JOIN sessions s ON s.id = m.session_id
+        WHERE messages_fts MATCH ? {''.join(f' AND {f}' for f in filters)}
+        ORDER BY bm25(messages_fts), m.timestamp DESC
+        LIMIT ?"""
+    head = [highlight[0], highlight[1], SEARCH_SNIPPET_TOKENS]
+    try:
+        rows = conn.execute(sql, head + [query] + params + [limit]).fetchall()
+    except sqlite3.OperationalError:
+        # not valid FTS5 syntax ("unterminated string", "syntax error near ..."): search the words
+        rows = conn.execute(sql, head + [quote_terms(query)] + params + [limit]).fetchall()
+    results = []
+    for session_key, row_phone, user_name, key, row_sender, timestamp, snippet, rank in rows:
+        session_id = session_key.hex() if isinstance(session_key, bytes) else session_key
+        results.append({
+            "session_id": session_id,
+            "message_id": f"{session_id}:{key}" if compact else key,
+            "phone": row_phone,
+            "user_name": user_name,
+            "sender": row_sender,
+            "timestamp": timestamp,
+            "snippet": snippet,
+            "rank": rank,
+        })
+    return results
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+def _db_paths(phone: Optional[str]) -> List[Tuple[Optional[int], Path]]:
+    """(shard index or None, file) to search: DB_PATH, or its shards (only the phone's one if given)."""
+    from core.agent.session import DB_PATH, CHAT_DB_SHARDS, create_chat_db
+
+    db = create_chat_db(DB_PATH, CHAT_DB_SHARDS)
+    shards = getattr(db, "shards", None)
+    if shards is None:
+        return [(None, db.db_path)]
+    indexes = [db.shard_index(phone)] if phone else range(len(shards))
+    return [(index, shards[index].db_path) for index in indexes]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Full-text search over chat history (read-only)")
+    parser.add_argument("query", help='FTS5 query: words, "a phrase", prefix*, OR, NOT')
+    parser.add_argument("--phone", help="only this phone number")
+    parser.add_argument("--since", help="epoch, ISO date/datetime or age (30m, 24h, 7d, 2w)")
+    parser.add_argument("--until", help="epoch, ISO date/datetime or age")
+    parser.add_argument("--sender", choices=["user", "bot"])
+    parser.add_argument("--limit", type=int, default=SEARCH_DEFAULT_LIMIT)
+    parser.add_argument("--db", action="append", help="DB file (repeatable; default: DB_PATH and its shards)")
+    parser.add_argument("--json", action="store_true", help="one JSON object per line")
+    args = parser.parse_args(argv)
+
+    since, until = parse_time(args.since), parse_time(args.until)
+    paths = [(None, Path(p)) for p in args.db] if args.db else _db_paths(args.phone)
+    results = []
+    for shard, path in paths:
+        if not path.exists():
+            continue
+        conn = sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro", uri=True)
+        try:
+            if not has_search_index(conn):
+                print(f"{path}: no search index (run python -m core.agent.migrations)", file=sys.stderr)
+                continue
+            for r in search_messages(
+                conn, is_compact(conn), args.query, phone=args.phone, since=since, until=until,
+                sender=args.sender, limit=args.limit, highlight=("*", "*"),
+            ):
+                if shard is not None:
+                    r["session_id"] = f"s{shard}_{r['session_id']}"
+                results.append(r)
+        finally:
+            conn.close()
+    results.sort(key=lambda r: (r["rank"], -r["timestamp"]))
+    for r in results[:args.limit]:
+        if args.json:
+            print(json.dumps(r, ensure_ascii=False))
+        else:
+            when = datetime.fromtimestamp(r["timestamp"]).strftime("%Y-%m-%d %H:%M")
+            print(f"{when}  {r['phone']}  {r['sender']:<4}  {r['snippet']}  ({r['session_id']})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -17,12 +17,14 @@ DB location (auto-created): ./src/orin_wa_report/core/database/chat_sessions.db
 
 Design notes
 - sessions table: one row per session (session = conversation between bot and single phone) -- scalable. 
-- messages table: one row per chat bubble (user or bot), linked to sessions by session_id.
+- messages table: one row per chat bubble (user or bot), linked to sessions by session_id. In the compact layout
+  (core/agent/migrations.py) ids are time-ordered 16-byte blobs and messages are clustered by (session_id, seq).
 - Session lifecycle: session starts on first user message, inactivity end after 15 minutes (with 5-min warning at 10m),
   forced end after 2 hours (with 5-min warning at 1h55m). Both warnings are sent to the user. 
 
-This file tries to avoid external dependencies (uses builtin sqlite3). It serializes DB operations using a small
-asyncio.Lock + run_in_executor to avoid blocking the event loop.
+This file tries to avoid external dependencies (uses builtin sqlite3). Writes run on one writer thread per DB file
+and reads on a small pool of read-only connections, so the event loop never blocks on sqlite. CHAT_DB_SHARDS > 1
+splits the data over several files by phone hash (ShardedChatDB) for more write throughput.
 
 If you want a production setup: migrate to Postgres+async driver or a dedicated session service; for contextual
 responses integrate a small LLM or vector DB using the messages history.
@@ -34,13 +36,18 @@ import asyncio
 import os
 import sqlite3
 import time
-import uuid
 import json
 import re
+import hashlib
+import heapq
+import itertools
+import threading
+import sys
 import httpx
-from openai import OpenAI
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Dict, Any, List
+from typing import TYPE_CHECKING, Optional, Dict, Any, List, Tuple, Union, Callable, Awaitable
 
 
 import copy
@@ -66,121 +73,222 @@ from core.agent.config import (
     AGENT_SESSION_WARNING_MESSAGE,
     AGENT_SESSION_END_MESSAGE,
     AGENT_SESSION_LIMIT_MESSAGE,
+    VENUE_RESOLVER_MIN_CONFIDENCE,
+    VENUE_RESOLVER_MAX_MESSAGES,
+    TURN_DEADLINE_SECONDS,
+    EXTRACTION_MIN_BUDGET_SECONDS,
+    VENUE_SUMMARY_MIN_BUDGET_SECONDS,
+    AGENT_TIMEOUT_MESSAGE,
+    AGENT_VENUE_SEARCH_ACK_MESSAGE,
+    CHAT_DB_READ_CONNECTIONS,
+    SEARCH_DEFAULT_LIMIT,
+    SESSION_LEASE_SECONDS,
+    SESSION_LEASE_RENEW_SECONDS,
+    SESSION_SWEEP_SECONDS,
+    SESSION_MAX_ENTRIES,
+    SESSION_INTERN_JIDS,
+    SESSION_EXPIRE_BATCH,
 )
 
 from core.agent.prompts import (
     GENERAL_TALK_EXTRA_PROMPT,
     VENUE_RECOMMENDATION_EXTRA_PROMPT,
-    CONFIRM_BOOKING_EXTRA_PROMPT,
+    VENUE_DETAILS_EXTRA_PROMPT,
+)
+from core.agent.templates import (
+    resolve_locale,
+    render_venue_list,
+    render_missing_fields,
+    render_booking_result,
+)
+from core.agent.venue_resolver import (
+    resolve_from_messages,
+    record_resolution,
+)
+from core.agent.venue_index import VENUE_INDEX
+from core.agent.migrations import migrate, is_compact
+from core.agent.search import search_messages
+from core.agent.venue_catalog import (
+    VenueCatalog,
+    VENUE_CATALOG,
+    split_recommendations,
+    referenced_ids,
+    hydrate,
+    encode_payload,
+)
+from core.agent.session_state import (
+    SessionStateBackend,
+    InMemorySessionState,
+    create_session_state,
+    new_owner_id,
 )
 
-from core.logger import get_logger
-
-logger = get_logger(__name__, service="Agent")
+from core.deadline import Deadline, DeadlineExceeded
+from core.openai import PRIORITY_BACKGROUND
+from core.logger import get_logger, truncated
+from core.settings import settings
+from core.metrics import track_stage, DB_OP_SECONDS, DB_QUEUE_DEPTH, CACHE_REQUESTS, SESSION_ENTRIES, SESSIONS_EVICTED, SESSIONS_EXPIRED
 
-from dotenv import load_dotenv
-load_dotenv(override=True)
+if TYPE_CHECKING:  # the SDK is imported lazily by core.openai
+    from openai import AsyncOpenAI
 
+logger = get_logger(__name__, service="Agent")
 
 # -----------------------------
 # Configuration / constants
 # -----------------------------
 CORE_DIR = Path(__file__).resolve().parents[1]  # core/
 DB_DIR = CORE_DIR / "database"
-DB_PATH = DB_DIR / "chat_sessions.db"
+DB_PATH = Path(settings.chat_db_path or DB_DIR / "chat_sessions.db")  # set per worker by the dispatcher
+CHAT_DB_SHARDS = settings.chat_db_shards  # >1 splits DB_PATH into that many files by phone hash
 
 # -----------------------------
 # Lightweight sqlite wrapper
 # -----------------------------
 
+REQUIREMENT_COLUMNS = [
+    "event_type", "country", "location", "attendees", "budget", "start_date", "end_date",
+    "email", "customer_name", "ticket_id", "venue_recommendations",
+]
+
+def new_record_id() -> str:
+    """Time-ordered 128-bit id as 32 hex chars: 48-bit millisecond timestamp + 80 random bits (ULID layout)."""
+    return (int(time.time() * 1000).to_bytes(6, "big") + os.urandom(10)).hex()
+
 class ChatDB:
-    def __init__(self, db_path: Path):
+    def __init__(self, db_path: Path, read_connections: int = CHAT_DB_READ_CONNECTIONS, catalog: Optional[VenueCatalog] = None):
         self.db_path = Path(db_path)
+        self.venues = catalog if catalog is not None else VENUE_CATALOG
         self._conn: Optional[sqlite3.Connection] = None
         self._init_done = False
-        # small in-process sqlite is protected by an asyncio lock and run_in_executor for blocking ops
-        self._lock = asyncio.Lock()
+        self._init_lock = asyncio.Lock()
+        # SQLite has one writer per file: a single writer thread owns the read-write connection,
+        # which serializes writes without holding up the event loop. Reads go to a small pool
+        # of read-only connections that WAL lets run alongside the writer.
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chatdb-writer")
+        self._readers = ThreadPoolExecutor(max_workers=read_connections, thread_name_prefix="chatdb-reader")
+        self._read_connections = read_connections
+        self._reader_local = threading.local()
+        self._reader_conns: List[sqlite3.Connection] = []
+        self.compact = False  # storage layout of the file, known once it is opened
 
     async def initialize(self):
-        async with self._lock:
+        async with self._init_lock:
             if self._init_done:
                 return
             self.db_path.parent.mkdir(parents=True, exist_ok=True)
-            # connect
-            self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
-            # safer WAL mode for concurrent readers/writers
-            self._conn.execute("PRAGMA journal_mode = WAL;")
-            self._conn.execute("PRAGMA synchronous = NORMAL;")
-            await asyncio.get_running_loop().run_in_executor(None, self._create_tables)
+            await asyncio.get_running_loop().run_in_executor(self._writer, self._open)
             self._init_done = True
             logger.info(f"ChatDB initialized at {self.db_path}")
 
-    def _create_tables(self):
-        c = self._conn.cursor()
-        c.executescript(
-            """
-            CREATE TABLE IF NOT EXISTS sessions (
-                id TEXT PRIMARY KEY,
-                phone TEXT NOT NULL,
-                user_name TEXT,
-                started_at INTEGER NOT NULL,
-                last_activity INTEGER NOT NULL,
-                status TEXT NOT NULL DEFAULT 'active',
-                ended_at INTEGER,
-                metadata TEXT
-            );
-
-            CREATE INDEX IF NOT EXISTS idx_sessions_phone ON sessions(phone);
-            CREATE INDEX IF NOT EXISTS idx_sessions_last_activity ON sessions(last_activity);
-
-            CREATE TABLE IF NOT EXISTS messages (
-                id TEXT PRIMARY KEY,
-                session_id TEXT NOT NULL,
-                sender TEXT NOT NULL,
-                body TEXT,
-                timestamp INTEGER NOT NULL,
-                metadata TEXT,
-                FOREIGN KEY(session_id) REFERENCES sessions(id)
-            );
-
-            CREATE INDEX IF NOT EXISTS idx_messages_session_ts ON messages(session_id, timestamp);
-            
-            -- NEW TABLE FOR USER REQUIREMENTS
-            CREATE TABLE IF NOT EXISTS user_requirements (
-                session_id TEXT NOT NULL,
-                event_type TEXT,
-                country TEXT,
-                location TEXT,
-                attendees INTEGER,
-                budget TEXT,
-                start_date TEXT,
-                end_date TEXT,
-                email TEXT,
-                customer_name TEXT,
-                ticket_id TEXT,
-                venue_recommendations TEXT,
-                FOREIGN KEY(session_id) REFERENCES sessions(id)
-            );
-            """
-        )
-        self._conn.commit()
+    def _open(self):
+        # connect
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        # safer WAL mode for concurrent readers/writers
+        self._conn.execute("PRAGMA journal_mode = WAL;")
+        self._conn.execute("PRAGMA synchronous = NORMAL;")
+        migrate(self._conn, label=str(self.db_path))
+        self.compact = is_compact(self._conn)
+
+    def _reader_conn(self) -> sqlite3.Connection:
+        """Read-only connection of the calling reader thread."""
+        conn = getattr(self._reader_local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"{self.db_path.resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False)
+            self._reader_local.conn = conn
+            self._reader_conns.append(conn)
+        return conn
+
+    async def warm(self, timeout: float = 5.0) -> int:
+        """
+        Open the DB and every reader connection now, so the first reads after startup don't
+        pay for connecting and loading the schema. Returns the number of open reader connections.
+        """
+        await self.initialize()
+        # each task holds its thread at the barrier, so the pool starts one thread (and connection) per task
+        barrier = threading.Barrier(self._read_connections)
+
+        def _open_reader():
+            self._reader_conn().execute("SELECT count(*) FROM sqlite_master").fetchone()
+            try:
+                barrier.wait(timeout)
+            except threading.BrokenBarrierError:
+                pass
+
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self._readers, _open_reader) for _ in range(self._read_connections)))
+        return len(self._reader_conns)
+
+    async def _submit(self, executor: ThreadPoolExecutor, op: str, call):
+        """Run `call` on `executor`, recording queue wait and execution time per op."""
+        submitted = time.perf_counter()
+        timings = []
+
+        def _timed():
+            started = time.perf_counter()
+            try:
+                return call()
+            finally:
+                timings.extend((started, time.perf_counter()))
+
+        DB_QUEUE_DEPTH.inc()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, _timed)
+        finally:
+            DB_QUEUE_DEPTH.dec()
+            if timings:
+                started, finished = timings
+                DB_OP_SECONDS.observe(started - submitted, op=op, phase="queue_wait")
+                DB_OP_SECONDS.observe(finished - started, op=op, phase="execute")
+
+    @staticmethod
+    def _op_name(fn) -> str:
+        # "ChatDB.add_message.<locals>._add" -> "add_message"
+        return fn.__qualname__.split(".<locals>")[0].rsplit(".", 1)[-1]
 
     async def _run(self, fn, *args, **kwargs):
-        """Run a blocking DB call in executor with lock."""
-        async with self._lock:
-            loop = asyncio.get_running_loop()
-            return await loop.run_in_executor(None, lambda: fn(*args, **kwargs))
+        """Run a blocking write (or read-modify-write) on the writer thread."""
+        return await self._submit(self._writer, self._op_name(fn), lambda: fn(*args, **kwargs))
+
+    async def _read(self, fn, *args, **kwargs):
+        """Run a blocking read on a reader thread; `fn` gets that thread's read-only connection."""
+        return await self._submit(self._readers, self._op_name(fn), lambda: fn(self._reader_conn(), *args, **kwargs))
+
+    # --- ids ---
+    def _key(self, session_id: str):
+        """Session id as stored: 16-byte blob in the compact layout, hex text in the legacy one."""
+        return bytes.fromhex(session_id) if self.compact else session_id
+
+    @staticmethod
+    def _session_row(row) -> Dict[str, Any]:
+        keys = ["id","phone","user_name","started_at","last_activity","status","ended_at"]
+        result = dict(zip(keys, row))
+        if isinstance(result["id"], bytes):
+            result["id"] = result["id"].hex()
+        return result
+
+    async def close(self):
+        """Wait for queued operations, then close every connection."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._readers.shutdown)
+        await loop.run_in_executor(None, self._writer.shutdown)
+        for conn in self._reader_conns:
+            conn.close()
+        self._reader_conns.clear()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
 
     # --- session operations ---
     async def create_session(self, phone: str, user_name: str, started_at: Optional[int] = None) -> str:
         if started_at is None:
             started_at = int(time.time())
-        session_id = uuid.uuid4().hex
+        session_id = new_record_id()
         def _create():
             cur = self._conn.cursor()
             cur.execute(
                 "INSERT INTO sessions (id, phone, user_name, started_at, last_activity, status) VALUES (?, ?, ?, ?, ?, ?)",
-                (session_id, phone, user_name, started_at, started_at, 'active')
+                (self._key(session_id), phone, user_name, started_at, started_at, 'active')
             )
             self._conn.commit()
             return session_id
@@ -193,7 +301,7 @@ class ChatDB:
             cur = self._conn.cursor()
             cur.execute(
                 "UPDATE sessions SET last_activity = ? WHERE id = ?",
-                (last_activity, session_id)
+                (last_activity, self._key(session_id))
             )
             self._conn.commit()
         await self._run(_update)
@@ -205,14 +313,33 @@ class ChatDB:
             cur = self._conn.cursor()
             cur.execute(
                 "UPDATE sessions SET status = ?, ended_at = ? WHERE id = ?",
-                (status, ended_at, session_id)
+                (status, ended_at, self._key(session_id))
             )
             self._conn.commit()
         await self._run(_end)
 
+    async def idle_sessions(self, idle_before: int, limit: int) -> List[Tuple[str, str]]:
+        """(id, phone) of active sessions with no activity since `idle_before`, longest idle first."""
+        def _idle(conn):
+            rows = conn.execute(
+                "SELECT id, phone FROM sessions WHERE status = 'active' AND last_activity < ? ORDER BY last_activity LIMIT ?",
+                (idle_before, limit)
+            ).fetchall()
+            return [(key.hex() if isinstance(key, bytes) else key, phone) for key, phone in rows]
+        return await self._read(_idle)
+
+    async def end_sessions(self, session_ids: List[str], ended_at: Optional[int] = None, status: str = "ended"):
+        if ended_at is None:
+            ended_at = int(time.time())
+        params = [(status, ended_at, self._key(session_id)) for session_id in session_ids]
+        def _end():
+            self._conn.executemany("UPDATE sessions SET status = ?, ended_at = ? WHERE id = ?", params)
+            self._conn.commit()
+        await self._run(_end)
+
     async def get_session_by_phone(self, phone: str) -> Optional[Dict[str, Any]]:
-        def _get():
-            cur = self._conn.cursor()
+        def _get(conn):
+            cur = conn.cursor()
             cur.execute(
                 "SELECT id, phone, user_name, started_at, last_activity, status, ended_at FROM sessions WHERE phone = ? ORDER BY started_at DESC LIMIT 1",
                 (phone,)
@@ -220,340 +347,904 @@ class ChatDB:
             row = cur.fetchone()
             if not row:
                 return None
-            keys = ["id","phone","user_name","started_at","last_activity","status","ended_at"]
-            return dict(zip(keys, row))
-        return await self._run(_get)
+            return self._session_row(row)
+        return await self._read(_get)
 
     async def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
-        def _get():
-            cur = self._conn.cursor()
+        def _get(conn):
+            cur = conn.cursor()
             cur.execute(
                 "SELECT id, phone, user_name, started_at, last_activity, status, ended_at FROM sessions WHERE id = ?",
-                (session_id,)
+                (self._key(session_id),)
             )
             row = cur.fetchone()
             if not row:
                 return None
-            keys = ["id","phone","user_name","started_at","last_activity","status","ended_at"]
-            return dict(zip(keys, row))
-        return await self._run(_get)
+            return self._session_row(row)
+        return await self._read(_get)
 
     # --- messages ---
     async def add_message(self, session_id: str, sender: str, body: str, timestamp: Optional[int] = None, metadata: Optional[dict] = None) -> str:
         if timestamp is None:
             timestamp = int(time.time())
-        if metadata is None:
-            metadata = {}
-        message_id = uuid.uuid4().hex
+        metadata_json = json.dumps(metadata) if metadata else None
         def _add():
             cur = self._conn.cursor()
-            cur.execute(
-                "INSERT INTO messages (id, session_id, sender, body, timestamp, metadata) VALUES (?, ?, ?, ?, ?, ?)",
-                (message_id, session_id, sender, body, timestamp, json.dumps(metadata))
-            )
+            if self.compact:
+                # next seq of the session: one seek to the end of its (session_id, seq) range
+                key = self._key(session_id)
+                cur.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM messages WHERE session_id = ?", (key,))
+                seq = cur.fetchone()[0]
+                cur.execute(
+                    "INSERT INTO messages (session_id, seq, sender, body, timestamp, metadata) VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, seq, sender, body, timestamp, metadata_json)
+                )
+                message_id = f"{session_id}:{seq}"
+            else:
+                message_id = new_record_id()
+                cur.execute(
+                    "INSERT INTO messages (id, session_id, sender, body, timestamp, metadata) VALUES (?, ?, ?, ?, ?, ?)",
+                    (message_id, session_id, sender, body, timestamp, metadata_json)
+                )
             self._conn.commit()
             return message_id
         return await self._run(_add)
 
     async def get_messages_for_session(self, session_id: str, limit: int = 100) -> List[Dict[str, Any]]:
-        def _get():
-            cur = self._conn.cursor()
-            cur.execute(
-                "SELECT id, sender, body, timestamp, metadata FROM messages WHERE session_id = ? ORDER BY timestamp DESC LIMIT ?",
-                (session_id, limit)
-            )
+        def _get(conn):
+            cur = conn.cursor()
+            if self.compact:
+                cur.execute(
+                    "SELECT seq, sender, body, timestamp, metadata FROM messages WHERE session_id = ? ORDER BY seq DESC LIMIT ?",
+                    (self._key(session_id), limit)
+                )
+            else:
+                cur.execute(
+                    "SELECT id, sender, body, timestamp, metadata FROM messages WHERE session_id = ? ORDER BY timestamp DESC LIMIT ?",
+                    (session_id, limit)
+                )
             rows = cur.fetchall()
             out = []
             for r in rows:
                 out.append({
-                    "id": r[0],
+                    "id": f"{session_id}:{r[0]}" if self.compact else r[0],
                     "sender": r[1],
                     "body": r[2],
                     "timestamp": r[3],
                     "metadata": json.loads(r[4]) if r[4] else None
                 })
             return out
-        return await self._run(_get)
+        return await self._read(_get)
         
     # --- user requirements ---
     async def get_user_requirements(self, session_id: str) -> Dict[str, Any]:
-        def _get():
-            cur = self._conn.cursor()
+        def _get(conn):
+            cur = conn.cursor()
             cur.execute(
                 "SELECT event_type, country, location, attendees, budget, start_date, end_date, email, customer_name, ticket_id, venue_recommendations FROM user_requirements WHERE session_id = ?",
-                (session_id,)
+                (self._key(session_id),)
             )
             row = cur.fetchone()
             if not row:
-                return {}
+                return {}, 0, 0
             keys = ["event_type", "country", "location", "attendees", "budget", "start_date", "end_date", "email", "customer_name", "ticket_id", "venue_recommendations"]
             result = dict(zip(keys, row))
-            # Parse venue_recommendations from JSON string
+            hits = misses = 0
+            # venue_recommendations holds [venue id, score] references: rehydrate from the catalog
             if result.get("venue_recommendations"):
                 try:
-                    result["venue_recommendations"] = json.loads(result["venue_recommendations"])
+                    refs = json.loads(result["venue_recommendations"])
+                    payloads, missing = self.venues.get_many(referenced_ids(refs))
+                    hits, misses = len(payloads), len(missing)
+                    if missing:
+                        loaded = self._load_venues(conn, missing)
+                        self.venues.put_many(loaded)
+                        payloads.update(loaded)
+                    result["venue_recommendations"] = hydrate(refs, payloads)
                 except Exception:
                     result["venue_recommendations"] = None
-            return result
-        return await self._run(_get)
+            return result, hits, misses
+        result, hits, misses = await self._read(_get)
+        if hits:
+            CACHE_REQUESTS.inc(hits, cache="venue_catalog", result="hit")
+        if misses:
+            CACHE_REQUESTS.inc(misses, cache="venue_catalog", result="miss")
+        return result
+
+    @staticmethod
+    def _load_venues(conn: sqlite3.Connection, venue_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        rows = conn.execute(
+            f"SELECT id, payload FROM venues WHERE id IN ({', '.join('?' * len(venue_ids))})", venue_ids
+        ).fetchall()
+        return {venue_id: json.loads(payload) for venue_id, payload in rows}
 
     async def update_user_requirements(self, session_id: str, requirements: Dict[str, Any]):
-        # Serialize venue_recommendations to JSON if present
+        # Store venue_recommendations as [venue id, score] references, payloads go to the venues table
         venue_recs = requirements.get("venue_recommendations")
-        venue_recs_json = json.dumps(venue_recs) if venue_recs else None
+        venue_refs, venue_payloads = split_recommendations(venue_recs) if venue_recs else ([], {})
+        venue_recs_json = json.dumps(venue_refs) if venue_recs else None
         
         def _upsert():
             cur = self._conn.cursor()
-            # Check if record exists
-            cur.execute("SELECT 1 FROM user_requirements WHERE session_id = ?", (session_id,))
-            exists = cur.fetchone()
-            
-            if exists:
-                # Update existing
+            if venue_payloads:
+                # rows only change when the payload does
+                cur.executemany(
+                    "INSERT INTO venues (id, payload, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(id) DO UPDATE SET payload = excluded.payload, updated_at = excluded.updated_at "
+                    "WHERE payload != excluded.payload",
+                    [(venue_id, encode_payload(payload), int(time.time())) for venue_id, payload in venue_payloads.items()]
+                )
+            # one row per session (unique index); fields not given keep their stored value
+            cur.execute(
+                """INSERT INTO user_requirements
+                (session_id, event_type, country, location, attendees, budget, start_date, end_date, email, customer_name, ticket_id, venue_recommendations)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(session_id) DO UPDATE SET
+                event_type = COALESCE(excluded.event_type, event_type),
+                country = COALESCE(excluded.country, country),
+                location = COALESCE(excluded.location, location),
+                attendees = COALESCE(excluded.attendees, attendees),
+                budget = COALESCE(excluded.budget, budget),
+                start_date = COALESCE(excluded.start_date, start_date),
+                end_date = COALESCE(excluded.end_date, end_date),
+                email = COALESCE(excluded.email, email),
+                customer_name = COALESCE(excluded.customer_name, customer_name),
+                ticket_id = COALESCE(excluded.ticket_id, ticket_id),
+                venue_recommendations = COALESCE(excluded.venue_recommendations, venue_recommendations)""",
+                (
+                    self._key(session_id),
+                    requirements.get("event_type"),
+                    requirements.get("country"),
+                    requirements.get("location"),
+                    requirements.get("attendees"),
+                    requirements.get("budget"),
+                    requirements.get("start_date"),
+                    requirements.get("end_date"),
+                    requirements.get("email"),
+                    requirements.get("customer_name"),
+                    requirements.get("ticket_id"),
+                    venue_recs_json
+                )
+            )
+            self._conn.commit()
+        await self._run(_upsert)
+        if venue_payloads:
+            self.venues.put_many(venue_payloads)
+
+    # --- retention ---
+    async def export_ended_sessions(self, ended_before: int, limit: int) -> List[Dict[str, Any]]:
+        """Up to `limit` sessions ended before `ended_before` with their messages and requirements (oldest first)."""
+        def _export():
+            cur = self._conn.cursor()
+            cur.execute(
+                "SELECT id, phone, user_name, started_at, last_activity, status, ended_at, metadata FROM sessions "
+                "WHERE ended_at IS NOT NULL AND ended_at < ? ORDER BY ended_at LIMIT ?",
+                (ended_before, limit)
+            )
+            keys = ["id","phone","user_name","started_at","last_activity","status","ended_at","metadata"]
+            records = []
+            for row in cur.fetchall():
+                session = dict(zip(keys, row))
+                key = session["id"]
+                session["id"] = key.hex() if isinstance(key, bytes) else key
+                if self.compact:
+                    cur.execute("SELECT seq, sender, body, timestamp, metadata FROM messages WHERE session_id = ? ORDER BY seq", (key,))
+                else:
+                    cur.execute(
+                        "SELECT ROW_NUMBER() OVER (ORDER BY timestamp, rowid), sender, body, timestamp, metadata "
+                        "FROM messages WHERE session_id = ? ORDER BY timestamp, rowid",
+                        (key,)
+                    )
+                messages = [dict(zip(["seq","sender","body","timestamp","metadata"], m)) for m in cur.fetchall()]
                 cur.execute(
-                    """UPDATE user_requirements SET
-                    event_type = COALESCE(?, event_type),
-                    country = COALESCE(?, country),
-                    location = COALESCE(?, location),
-                    attendees = COALESCE(?, attendees),
-                    budget = COALESCE(?, budget),
-                    start_date = COALESCE(?, start_date),
-                    end_date = COALESCE(?, end_date),
-                    email = COALESCE(?, email),
-                    customer_name = COALESCE(?, customer_name),
-                    ticket_id = COALESCE(?, ticket_id),
-                    venue_recommendations = COALESCE(?, venue_recommendations)
-                    WHERE session_id = ?""",
-                    (
-                        requirements.get("event_type"),
-                        requirements.get("country"),
-                        requirements.get("location"),
-                        requirements.get("attendees"),
-                        requirements.get("budget"),
-                        requirements.get("start_date"),
-                        requirements.get("end_date"),
-                        requirements.get("email"),
-                        requirements.get("customer_name"),
-                        requirements.get("ticket_id"),
-                        venue_recs_json,
-                        session_id
+                    "SELECT event_type, country, location, attendees, budget, start_date, end_date, email, customer_name, ticket_id, venue_recommendations FROM user_requirements WHERE session_id = ?",
+                    (key,)
+                )
+                req = cur.fetchone()
+                requirements = dict(zip(REQUIREMENT_COLUMNS, req)) if req else None
+                venues = {}
+                if requirements and requirements["venue_recommendations"]:
+                    # the referenced payloads go along, so an archive record stands on its own
+                    venue_ids = referenced_ids(json.loads(requirements["venue_recommendations"]))
+                    if venue_ids:
+                        venues = self._load_venues(self._conn, venue_ids)
+                records.append({"session": session, "messages": messages, "requirements": requirements, "venues": venues})
+            return records
+        return await self._run(_export)
+
+    async def delete_sessions(self, session_ids: List[str]):
+        """Delete sessions with their messages and requirements in one transaction."""
+        keys = [(self._key(session_id),) for session_id in session_ids]
+        def _delete():
+            cur = self._conn.cursor()
+            cur.executemany("DELETE FROM messages WHERE session_id = ?", keys)
+            cur.executemany("DELETE FROM user_requirements WHERE session_id = ?", keys)
+            cur.executemany("DELETE FROM sessions WHERE id = ?", keys)
+            self._conn.commit()
+        await self._run(_delete)
+
+    async def restore_session_record(self, record: Dict[str, Any]) -> bool:
+        """Insert an archived session record back; False if the session is already live."""
+        session = record["session"]
+        key = self._key(session["id"])
+        def _restore():
+            cur = self._conn.cursor()
+            cur.execute("SELECT 1 FROM sessions WHERE id = ?", (key,))
+            if cur.fetchone():
+                return False
+            cur.execute(
+                "INSERT INTO sessions (id, phone, user_name, started_at, last_activity, status, ended_at, metadata) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, session["phone"], session["user_name"], session["started_at"], session["last_activity"],
+                 session["status"], session["ended_at"], session.get("metadata"))
+            )
+            for m in record["messages"]:
+                if self.compact:
+                    cur.execute(
+                        "INSERT INTO messages (session_id, seq, sender, body, timestamp, metadata) VALUES (?, ?, ?, ?, ?, ?)",
+                        (key, m["seq"], m["sender"], m["body"], m["timestamp"], m["metadata"])
+                    )
+                else:
+                    cur.execute(
+                        "INSERT INTO messages (id, session_id, sender, body, timestamp, metadata) VALUES (?, ?, ?, ?, ?, ?)",
+                        (new_record_id(), key, m["sender"], m["body"], m["timestamp"], m["metadata"])
                     )
+            if record.get("venues"):
+                cur.executemany(
+                    "INSERT INTO venues (id, payload, updated_at) VALUES (?, ?, ?) ON CONFLICT(id) DO NOTHING",
+                    [(venue_id, encode_payload(payload), int(time.time())) for venue_id, payload in record["venues"].items()]
                 )
-            else:
-                # Insert new
+            if record.get("requirements"):
+                req = record["requirements"]
                 cur.execute(
-                    """INSERT INTO user_requirements
-                    (session_id, event_type, country, location, attendees, budget, start_date, end_date, email, customer_name, ticket_id, venue_recommendations)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                    (
-                        session_id,
-                        requirements.get("event_type"),
-                        requirements.get("country"),
-                        requirements.get("location"),
-                        requirements.get("attendees"),
-                        requirements.get("budget"),
-                        requirements.get("start_date"),
-                        requirements.get("end_date"),
-                        requirements.get("email"),
-                        requirements.get("customer_name"),
-                        requirements.get("ticket_id"),
-                        venue_recs_json
-                    )
+                    f"INSERT INTO user_requirements (session_id, {', '.join(REQUIREMENT_COLUMNS)}) VALUES (?{', ?' * len(REQUIREMENT_COLUMNS)})",
+                    (key, *(req.get(col) for col in REQUIREMENT_COLUMNS))
                 )
             self._conn.commit()
-        await self._run(_upsert)
+            return True
+        return await self._run(_restore)
+
+    async def incremental_vacuum(self, pages: int) -> int:
+        """Return up to `pages` free pages to the OS and truncate the WAL; returns the pages freed."""
+        def _vacuum():
+            before = self._conn.execute("PRAGMA freelist_count").fetchone()[0]
+            # execute() steps the pragma once (one page); executescript runs it to completion
+            self._conn.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+            return before - self._conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return await self._run(_vacuum)
+
+    # --- admin / analytics ---
+    async def list_sessions(self, status: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Most recently active sessions first."""
+        def _list(conn):
+            cur = conn.cursor()
+            query = "SELECT id, phone, user_name, started_at, last_activity, status, ended_at FROM sessions"
+            params: List[Any] = []
+            if status:
+                query += " WHERE status = ?"
+                params.append(status)
+            query += " ORDER BY last_activity DESC LIMIT ?"
+            params.append(limit)
+            cur.execute(query, params)
+            return [self._session_row(row) for row in cur.fetchall()]
+        return await self._read(_list)
+
+    # Keyset pages: `after` is the key of the last row of the previous page (None for the first
+    # page), and each call returns (rows, key of its last row or None when there are no more).
+    # Every page is one range scan of an index, whatever its depth.
+    async def page_sessions(self, status: Optional[str] = None, phone: Optional[str] = None,
+                            after: Optional[List[Any]] = None, limit: int = 100) -> Tuple[List[Dict[str, Any]], Optional[List[Any]]]:
+        """Sessions newest first: of one phone by started_at, otherwise by last_activity (optionally one status)."""
+        order = "started_at" if phone else "last_activity"
+        def _page(conn):
+            filters, params = [], []
+            if phone:
+                filters.append("phone = ?")
+                params.append(phone)
+            elif status:
+                filters.append("status = ?")
+                params.append(status)
+            if after:
+                filters.append(f"({order}, id) < (?, ?)")
+                params.extend([after[0], self._key(after[1])])
+            where = f"WHERE {' AND '.join(filters)}" if filters else ""
+            rows = conn.execute(
+                f"SELECT id, phone, user_name, started_at, last_activity, status, ended_at FROM sessions {where} "
+                f"ORDER BY {order} DESC, id DESC LIMIT ?",
+                params + [limit]
+            ).fetchall()
+            return [self._session_row(row) for row in rows]
+        rows = await self._read(_page)
+        last = [rows[-1][order], rows[-1]["id"]] if len(rows) == limit else None
+        return rows, last
+
+    async def page_messages(self, session_id: str, after: Optional[List[Any]] = None,
+                            limit: int = 100) -> Tuple[List[Dict[str, Any]], Optional[List[Any]]]:
+        """One session's transcript, oldest first."""
+        key = self._key(session_id)
+        def _page(conn):
+            if self.compact:
+                rows = conn.execute(
+                    "SELECT seq, sender, body, timestamp, metadata FROM messages WHERE session_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+                    (key, after[0] if after else 0, limit)
+                ).fetchall()
+                keys = [[row[0]] for row in rows]
+                ids = [f"{session_id}:{row[0]}" for row in rows]
+            else:
+                position = after or [-1, -1]
+                rows = conn.execute(
+                    "SELECT rowid, sender, body, timestamp, metadata, id FROM messages "
+                    "WHERE session_id = ? AND (timestamp, rowid) > (?, ?) ORDER BY timestamp, rowid LIMIT ?",
+                    (key, position[0], position[1], limit)
+                ).fetchall()
+                keys = [[row[3], row[0]] for row in rows]
+                ids = [row[5] for row in rows]
+            messages = [
+                {"id": message_id, "sender": row[1], "body": row[2], "timestamp": row[3], "metadata": json.loads(row[4]) if row[4] else None}
+                for message_id, row in zip(ids, rows)
+            ]
+            return messages, (keys[-1] if len(rows) == limit else None)
+        return await self._read(_page)
+
+    async def search_messages(self, query: str, phone: Optional[str] = None, since: Optional[int] = None,
+                              until: Optional[int] = None, sender: Optional[str] = None, limit: int = SEARCH_DEFAULT_LIMIT) -> List[Dict[str, Any]]:
+        """Full-text search over message bodies on a read-only connection (see core/agent/search.py)."""
+        def _search(conn):
+            return search_messages(conn, self.compact, query, phone=phone, since=since, until=until, sender=sender, limit=limit)
+        return await self._read(_search)
+
+    async def count_sessions_by_status(self) -> Dict[str, int]:
+        def _count(conn):
+            cur = conn.cursor()
+            cur.execute("SELECT status, COUNT(*) FROM sessions GROUP BY status")
+            return dict(cur.fetchall())
+        return await self._read(_count)
+
+
+class ShardedChatDB:
+    """
+    ChatDB partitioned over CHAT_DB_SHARDS files by phone hash, so writes to different
+    shards run in parallel (each shard has its own writer thread and reader pool).
+
+    All rows of a session live in its phone's shard. Session ids carry the shard
+    (`s3_<hex>`) so per-session calls route without a lookup; admin queries fan out to
+    every shard and merge. The shard count is fixed for a given set of files: changing it
+    re-homes phones, whose earlier sessions then stay in their old shard.
+    """
+
+    def __init__(self, db_path: Path, shards: int):
+        db_path = Path(db_path)
+        self.db_path = db_path
+        self.shards = [
+            ChatDB(db_path.with_name(f"{db_path.stem}.{i}-of-{shards}{db_path.suffix}"))
+            for i in range(shards)
+        ]
+
+    def shard_index(self, phone: str) -> int:
+        digest = hashlib.blake2b(phone.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "big") % len(self.shards)
+
+    def _by_phone(self, phone: str) -> ChatDB:
+        return self.shards[self.shard_index(phone)]
+
+    def shard_for_session(self, session_id: str) -> Tuple[ChatDB, str]:
+        """Shard of a tagged session id and the id within that shard."""
+        tag, _, local_id = session_id.partition("_")
+        if local_id and tag.startswith("s") and tag[1:].isdigit() and int(tag[1:]) < len(self.shards):
+            return self.shards[int(tag[1:])], local_id
+        # untagged ids (from before sharding) live in shard 0
+        return self.shards[0], session_id
+
+    def _tagged(self, index: int, row: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if row is not None:
+            row["id"] = f"s{index}_{row['id']}"
+        return row
+
+    async def initialize(self):
+        await asyncio.gather(*(shard.initialize() for shard in self.shards))
+
+    async def warm(self, timeout: float = 5.0) -> int:
+        return sum(await asyncio.gather(*(shard.warm(timeout) for shard in self.shards)))
+
+    async def close(self):
+        await asyncio.gather(*(shard.close() for shard in self.shards))
+
+    # --- session operations ---
+    async def create_session(self, phone: str, user_name: str, started_at: Optional[int] = None) -> str:
+        index = self.shard_index(phone)
+        return f"s{index}_{await self.shards[index].create_session(phone, user_name, started_at=started_at)}"
+
+    async def update_session_activity(self, session_id: str, last_activity: Optional[int] = None):
+        shard, local_id = self.shard_for_session(session_id)
+        await shard.update_session_activity(local_id, last_activity)
+
+    async def end_session(self, session_id: str, ended_at: Optional[int] = None, status: str = "ended"):
+        shard, local_id = self.shard_for_session(session_id)
+        await shard.end_session(local_id, ended_at=ended_at, status=status)
+
+    async def idle_sessions(self, idle_before: int, limit: int) -> List[Tuple[str, str]]:
+        per_shard = await asyncio.gather(*(shard.idle_sessions(idle_before, limit) for shard in self.shards))
+        return [(f"s{index}_{session_id}", phone) for index, rows in enumerate(per_shard) for session_id, phone in rows]
+
+    async def end_sessions(self, session_ids: List[str], ended_at: Optional[int] = None, status: str = "ended"):
+        by_shard: Dict[int, List[str]] = {}
+        for session_id in session_ids:
+            shard, local_id = self.shard_for_session(session_id)
+            by_shard.setdefault(self.shards.index(shard), []).append(local_id)
+        await asyncio.gather(*(
+            self.shards[index].end_sessions(local_ids, ended_at=ended_at, status=status) for index, local_ids in by_shard.items()
+        ))
+
+    async def get_session_by_phone(self, phone: str) -> Optional[Dict[str, Any]]:
+        index = self.shard_index(phone)
+        return self._tagged(index, await self.shards[index].get_session_by_phone(phone))
+
+    async def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        shard, local_id = self.shard_for_session(session_id)
+        return self._tagged(self.shards.index(shard), await shard.get_session(local_id))
+
+    # --- messages ---
+    async def add_message(self, session_id: str, sender: str, body: str, timestamp: Optional[int] = None, metadata: Optional[dict] = None) -> str:
+        shard, local_id = self.shard_for_session(session_id)
+        return await shard.add_message(local_id, sender, body, timestamp=timestamp, metadata=metadata)
+
+    async def get_messages_for_session(self, session_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+        shard, local_id = self.shard_for_session(session_id)
+        return await shard.get_messages_for_session(local_id, limit=limit)
+
+    # --- user requirements ---
+    async def get_user_requirements(self, session_id: str) -> Dict[str, Any]:
+        shard, local_id = self.shard_for_session(session_id)
+        return await shard.get_user_requirements(local_id)
+
+    async def update_user_requirements(self, session_id: str, requirements: Dict[str, Any]):
+        shard, local_id = self.shard_for_session(session_id)
+        await shard.update_user_requirements(local_id, requirements)
+
+    # --- admin / analytics (fan out + merge) ---
+    async def list_sessions(self, status: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        per_shard = await asyncio.gather(*(shard.list_sessions(status=status, limit=limit) for shard in self.shards))
+        per_shard = [[self._tagged(index, row) for row in rows] for index, rows in enumerate(per_shard)]
+        merged = heapq.merge(*per_shard, key=lambda row: row["last_activity"], reverse=True)
+        return list(itertools.islice(merged, limit))
+
+    async def page_sessions(self, status: Optional[str] = None, phone: Optional[str] = None,
+                            after: Optional[List[Any]] = None, limit: int = 100) -> Tuple[List[Dict[str, Any]], Optional[List[Any]]]:
+        # page keys hold the shard-local id: ids are random, so (value, local id) orders all shards
+        order = "started_at" if phone else "last_activity"
+        indexes = [self.shard_index(phone)] if phone else range(len(self.shards))
+        per_shard = await asyncio.gather(*(
+            self.shards[index].page_sessions(status=status, phone=phone, after=after, limit=limit) for index in indexes
+        ))
+        merged = heapq.merge(
+            *([(index, row) for row in rows] for index, (rows, _) in zip(indexes, per_shard)),
+            key=lambda item: (item[1][order], item[1]["id"]), reverse=True,
+        )
+        page = list(itertools.islice(merged, limit))
+        last = [page[-1][1][order], page[-1][1]["id"]] if len(page) == limit else None
+        return [self._tagged(index, row) for index, row in page], last
+
+    async def page_messages(self, session_id: str, after: Optional[List[Any]] = None,
+                            limit: int = 100) -> Tuple[List[Dict[str, Any]], Optional[List[Any]]]:
+        shard, local_id = self.shard_for_session(session_id)
+        return await shard.page_messages(local_id, after=after, limit=limit)
+
+    async def search_messages(self, query: str, phone: Optional[str] = None, since: Optional[int] = None,
+                              until: Optional[int] = None, sender: Optional[str] = None, limit: int = SEARCH_DEFAULT_LIMIT) -> List[Dict[str, Any]]:
+        indexes = [self.shard_index(phone)] if phone else range(len(self.shards))
+        per_shard = await asyncio.gather(*(
+            self.shards[index].search_messages(query, phone=phone, since=since, until=until, sender=sender, limit=limit)
+            for index in indexes
+        ))
+        results = []
+        for index, rows in zip(indexes, per_shard):
+            for row in rows:
+                row["session_id"] = f"s{index}_{row['session_id']}"
+                results.append(row)
+        results.sort(key=lambda row: (row["rank"], -row["timestamp"]))
+        return results[:limit]
+
+    async def count_sessions_by_status(self) -> Dict[str, int]:
+        totals: Dict[str, int] = {}
+        for counts in await asyncio.gather(*(shard.count_sessions_by_status() for shard in self.shards)):
+            for status, count in counts.items():
+                totals[status] = totals.get(status, 0) + count
+        return totals
+
+
+def create_chat_db(db_path: Path = None, shards: int = None):
+    """ChatDB for CHAT_DB_SHARDS=1 (the default), ShardedChatDB otherwise."""
+    db_path = db_path or DB_PATH
+    shards = shards or CHAT_DB_SHARDS
+    if shards > 1:
+        return ShardedChatDB(db_path, shards)
+    return ChatDB(db_path)
 
 # -----------------------------
 # Session manager in memory
 # -----------------------------
 
 class SessionEntry:
+    # slotted: a worker may hold 100k+ of these
+    __slots__ = ("session_id", "phone", "jid", "user_name", "started_at", "last_activity", "timer_id", "warned_inactive", "warned_limit")
+
     def __init__(self, session_id: str, phone: str, jid: str, user_name: str, started_at: int, last_activity: int):
         self.session_id = session_id
-        self.phone = phone
-        self.jid = jid  # full whatsapp jid '6281...@s.whatsapp.net'
+        self.phone = _intern(phone)
+        self.jid = _intern(jid)  # full whatsapp jid '6281...@s.whatsapp.net'
         self.user_name = user_name
         self.started_at = started_at
         self.last_activity = last_activity
-        self.inactivity_task: Optional[asyncio.Task] = None
-        self.forced_task: Optional[asyncio.Task] = None
+        # this worker's pending timer for the session (it holds the session lease):
+        # None = not scheduled here, TIMER_RUNNING = being checked right now
+        self.timer_id: Optional[int] = None
+        self.warned_inactive = False
+        self.warned_limit = False
+
+    def to_record(self) -> Dict[str, Any]:
+        return {
+            "session_id": self.session_id,
+            "phone": self.phone,
+            "jid": self.jid,
+            "user_name": self.user_name,
+            "started_at": self.started_at,
+        }
+
+    @classmethod
+    def from_record(cls, record: Dict[str, Any], last_activity: int) -> "SessionEntry":
+        return cls(
+            session_id=record["session_id"],
+            phone=record["phone"],
+            jid=record["jid"],
+            user_name=record.get("user_name") or "",
+            started_at=int(record["started_at"]),
+            last_activity=last_activity,
+        )
+
+
+def _intern(value: str) -> str:
+    # one string object per phone / jid, shared by entries, state dicts and timer heap items
+    return sys.intern(value) if SESSION_INTERN_JIDS and value else value
+
+
+TIMER_RUNNING = -1
+
+
+class SessionTimers:
+    """
+    Inactivity / session-limit timers of all sessions on this worker: one heap of
+    (due, timer id, phone, session_id) and one task sleeping until the earliest one, instead
+    of a task per session. Rescheduling or cancelling leaves the old heap item behind; it is
+    skipped when it comes up (it no longer matches the entry's `timer_id`).
+    """
+
+    def __init__(self, fire: Callable[[str, str], Awaitable[None]], current: Callable[[str, str, int], bool],
+                 max_entries: int = SESSION_MAX_ENTRIES):
+        self._fire = fire  # coroutine fn(phone, session_id) run when a timer is due
+        self._current = current  # fn(phone, session_id, timer id): is this heap item still the live one
+        self._max_entries = max_entries  # the owning SessionManager's cap: at most one live timer per entry
+        self._heap: List[Tuple[float, int, str, str]] = []
+        self._ids = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._firing: set = set()  # checks running right now
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def schedule(self, entry: SessionEntry, due: float):
+        entry.timer_id = next(self._ids)
+        if len(self._heap) > 2 * self._max_entries:
+            # mostly stale items (sessions evicted or ended): drop them
+            self._heap = [item for item in self._heap if self._current(item[2], item[3], item[1])]
+            heapq.heapify(self._heap)
+        earliest = self._heap[0][0] if self._heap else None
+        heapq.heappush(self._heap, (due, entry.timer_id, entry.phone, entry.session_id))
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        elif earliest is None or due < earliest:
+            self._wakeup.set()
+
+    @staticmethod
+    def cancel(entry: SessionEntry):
+        entry.timer_id = None
+
+    async def _run(self):
+        while True:
+            while self._heap and not self._current(self._heap[0][2], self._heap[0][3], self._heap[0][1]):
+                heapq.heappop(self._heap)
+            timeout = max(self._heap[0][0] - time.time(), 0) if self._heap else None
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+                continue  # something earlier was scheduled
+            except asyncio.TimeoutError:
+                pass
+            now = time.time()
+            while self._heap and self._heap[0][0] <= now:
+                _, timer_id, phone, session_id = heapq.heappop(self._heap)
+                if self._current(phone, session_id, timer_id):
+                    task = asyncio.create_task(self._fire(phone, session_id))
+                    self._firing.add(task)
+                    task.add_done_callback(self._firing.discard)
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        for task in list(self._firing):
+            task.cancel()
+        self._heap.clear()
 
 
 class SessionManager:
-    def __init__(self, db: ChatDB):
+    """
+    Tracks the active session per phone. The session itself (id, start, last activity) lives
+    in a SessionStateBackend so several workers can share it; `_sessions` only caches the
+    entries this worker has seen (at most SESSION_MAX_ENTRIES, least recently active evicted
+    first) and SessionTimers runs the timers of the ones it holds the lease for.
+
+    An evicted session stays active in the DB: the user's next message resumes it, and the
+    sweep ends it there once it has been idle past INACTIVITY_END_SECONDS (without the
+    goodbye message, which only a live entry's timer sends).
+    """
+
+    def __init__(self, db: Union[ChatDB, ShardedChatDB], state: Optional[SessionStateBackend] = None,
+                 max_entries: int = SESSION_MAX_ENTRIES):
         self.db = db
-        self._sessions: Dict[str, SessionEntry] = {}  # key by phone
+        self.state = state or InMemorySessionState()
+        self.owner = new_owner_id()
+        self.max_entries = max_entries
+        self._sessions: "OrderedDict[str, SessionEntry]" = OrderedDict()  # key by phone, least recently active first
+        self._timers = SessionTimers(self._check_timers, self._timer_current, max_entries)
         self._lock = asyncio.Lock()
+        self._client = None
+        self._sweeper_task: Optional[asyncio.Task] = None
+
+    def is_active(self, phone: str) -> bool:
+        """Whether this worker holds a live session entry for `phone` (no I/O)."""
+        return phone in self._sessions
 
     async def ensure_session(self, phone: str, jid: str, user_name: str, client) -> SessionEntry:
         """Get existing active session for phone or create a new one."""
         now = int(time.time())
         async with self._lock:
+            self._client = client
+            record = await self.state.get_session(phone)
+            if record and now - int(record["started_at"]) >= FORCED_SESSION_SECONDS:
+                # past the session limit (e.g. its owner went away) - end it and start over
+                await self._finish(SessionEntry.from_record(record, now), status="ended")
+                record = None
+
+            if not record:
+                record = await self._load_or_create(phone, jid, user_name, now)
+
+            await self.state.touch(phone, now)
+            await self.db.update_session_activity(record["session_id"], now)
+
             entry = self._sessions.get(phone)
-            if entry:
-                # verify it's still active in DB
-                sess = await self.db.get_session(entry.session_id)
-                if sess and sess.get("status") == "active":
-                    # update last_activity in db + in-memory
-                    await self.db.update_session_activity(entry.session_id, now)
-                    entry.last_activity = now
-                    # reset inactivity watcher
-                    if entry.inactivity_task:
-                        entry.inactivity_task.cancel()
-                    entry.inactivity_task = asyncio.create_task(self._inactivity_watcher(entry, client))
-                    return entry
-                else:
-                    # stale entry in memory
-                    await self._cancel_tasks(entry)
-                    self._sessions.pop(phone, None)
-
-            # look in DB for most recent session for this phone
-            dbsess = await self.db.get_session_by_phone(phone)
-            if dbsess and dbsess.get("status") == "active":
-                # check started_at + FORCED_SESSION_SECONDS
-                if int(time.time()) - int(dbsess.get("started_at")) < FORCED_SESSION_SECONDS:
-                    # reuse
-                    entry = SessionEntry(
-                        session_id=dbsess["id"],
-                        phone=phone,
-                        jid=jid,
-                        user_name=dbsess.get("user_name") or user_name,
-                        started_at=int(dbsess.get("started_at")),
-                        last_activity=int(dbsess.get("last_activity"))
-                    )
-                    # schedule watchers
-                    entry.inactivity_task = asyncio.create_task(self._inactivity_watcher(entry, client))
-                    entry.forced_task = asyncio.create_task(self._forced_watcher(entry, client))
-                    self._sessions[phone] = entry
-                    await self.db.update_session_activity(entry.session_id, now)
-                    entry.last_activity = now
-                    return entry
-                else:
-                    # session too old - end it in DB and create new
-                    try:
-                        await self.db.end_session(dbsess["id"], ended_at=int(time.time()), status="ended")
-                    except Exception:
-                        logger.exception("Failed to mark old session ended")
-
-            # create new session
-            session_id = await self.db.create_session(phone, user_name, started_at=now)
-            entry = SessionEntry(session_id=session_id, phone=phone, jid=jid, user_name=user_name, started_at=now, last_activity=now)
-            entry.inactivity_task = asyncio.create_task(self._inactivity_watcher(entry, client))
-            entry.forced_task = asyncio.create_task(self._forced_watcher(entry, client))
-            self._sessions[phone] = entry
-            logger.info(f"Created new session {session_id} for {phone}")
+            if not entry or entry.session_id != record["session_id"]:
+                if entry:
+                    self._timers.cancel(entry)
+                entry = SessionEntry.from_record(record, now)
+                self._sessions[entry.phone] = entry
+            self._sessions.move_to_end(phone)
+            entry.last_activity = now
+            await self._claim_timers(entry)
+            await self._evict_overflow()
+            self._start_sweeper()
             return entry
 
+    async def _load_or_create(self, phone: str, jid: str, user_name: str, now: int) -> Dict[str, Any]:
+        """Session record for a phone unknown to the state backend: resume from DB or create."""
+        dbsess = await self.db.get_session_by_phone(phone)
+        if dbsess and dbsess.get("status") == "active":
+            if now - int(dbsess.get("started_at")) < FORCED_SESSION_SECONDS:
+                # reuse (e.g. after a restart with the in-memory backend, or an eviction)
+                record = {
+                    "session_id": dbsess["id"],
+                    "phone": _intern(phone),
+                    "jid": _intern(jid),
+                    "user_name": dbsess.get("user_name") or user_name,
+                    "started_at": int(dbsess.get("started_at")),
+                }
+                return await self.state.create_session(phone, record)
+            # session too old - end it in DB and create new
+            try:
+                await self.db.end_session(dbsess["id"], ended_at=now, status="ended")
+            except Exception:
+                logger.exception("Failed to mark old session ended")
+
+        session_id = await self.db.create_session(phone, user_name, started_at=now)
+        record = {"session_id": session_id, "phone": _intern(phone), "jid": _intern(jid), "user_name": user_name, "started_at": now}
+        stored = await self.state.create_session(phone, record)
+        if stored["session_id"] != session_id:
+            # another worker created the session first; drop ours
+            await self.db.end_session(session_id, ended_at=now, status="duplicate")
+        else:
+            logger.info(f"Created new session {session_id} for {phone}")
+        return stored
+
     async def touch_session(self, phone: str, client):
-        """Update session last_activity and restart inactivity watcher."""
+        """Record activity; the session's timers (wherever they run) reschedule from it."""
         async with self._lock:
+            self._client = client
             entry = self._sessions.get(phone)
             if not entry:
                 return None
+            self._sessions.move_to_end(phone)
             now = int(time.time())
             entry.last_activity = now
             try:
+                await self.state.touch(phone, now)
                 await self.db.update_session_activity(entry.session_id, now)
             except Exception:
                 logger.exception("Failed to update session activity")
-            if entry.inactivity_task:
-                entry.inactivity_task.cancel()
-            entry.inactivity_task = asyncio.create_task(self._inactivity_watcher(entry, client))
+            await self._claim_timers(entry)
             return entry
 
-    async def _cancel_tasks(self, entry: SessionEntry):
-        if entry.inactivity_task:
-            try:
-                entry.inactivity_task.cancel()
-            except Exception:
-                pass
-        if entry.forced_task:
-            try:
-                entry.forced_task.cancel()
-            except Exception:
-                pass
-
-    async def _inactivity_watcher(self, entry: SessionEntry, client):
-        """Sends a 5-min warning at 10 minutes of inactivity then ends the session at 15 minutes if no reply."""
+    async def _evict_overflow(self):
+        """Drop the least recently active entries beyond max_entries (they stay in the DB)."""
+        while len(self._sessions) > self.max_entries:
+            phone, entry = self._sessions.popitem(last=False)
+            if entry.timer_id is not None:
+                self._timers.cancel(entry)
+                await self.state.release_lease(phone, self.owner)
+            if not self.state.shared:
+                # the in-memory state would keep the record anyway; the DB row resumes it
+                await self.state.delete_session(phone, entry.session_id)
+            SESSIONS_EVICTED.inc(reason="lru")
+        SESSION_ENTRIES.set(len(self._sessions))
+
+    # --- timers ---
+    async def _claim_timers(self, entry: SessionEntry, due: Optional[float] = None):
+        """Run the session's timers here if no other worker holds its lease."""
+        if entry.timer_id is not None:
+            return
+        if await self.state.acquire_lease(entry.phone, self.owner, SESSION_LEASE_SECONDS * 1000):
+            self._timers.schedule(entry, self._next_due(entry, time.time()) if due is None else due)
+
+    def _timer_current(self, phone: str, session_id: str, timer_id: int) -> bool:
+        entry = self._sessions.get(phone)
+        return entry is not None and entry.session_id == session_id and entry.timer_id == timer_id
+
+    def _next_due(self, entry: SessionEntry, now: float) -> float:
+        wake_at = [entry.last_activity + INACTIVITY_END_SECONDS, entry.started_at + FORCED_SESSION_SECONDS]
+        if not entry.warned_inactive:
+            wake_at.append(entry.last_activity + INACTIVITY_WARNING_SECONDS)
+        if not entry.warned_limit:
+            wake_at.append(entry.started_at + FORCED_SESSION_SECONDS - FORCED_WARNING_BEFORE)
+        due = min(wake_at)
+        if self.state.shared:
+            due = min(due, now + SESSION_LEASE_RENEW_SECONDS)
+        return max(due, now + 0.05)
+
+    async def _check_timers(self, phone: str, session_id: str):
+        """
+        Inactivity and session-limit timers for one session, run by SessionTimers when due.
+
+        Sends the inactivity warning after INACTIVITY_WARNING_SECONDS without activity and
+        ends the session after INACTIVITY_END_SECONDS; sends the limit warning
+        FORCED_WARNING_BEFORE the FORCED_SESSION_SECONDS limit and ends it at the limit.
+        Activity recorded by any worker pushes the inactivity timers back, so the shared
+        last_activity is re-read on every check.
+        """
+        entry = self._sessions.get(phone)
+        if entry is None or entry.session_id != session_id:
+            return
+        entry.timer_id = TIMER_RUNNING
         try:
-            # sleep until warning
-            await asyncio.sleep(INACTIVITY_WARNING_SECONDS)
-            # check actual last_activity
-            sess = await self.db.get_session(entry.session_id)
-            if not sess or sess.get("status") != "active":
-                return
-            last_activity = int(sess.get("last_activity"))
-            now = int(time.time())
-            if now - last_activity < INACTIVITY_WARNING_SECONDS:
-                # activity happened - watcher will be restarted by touch_session
+            if self.state.shared and not await self.state.renew_lease(phone, self.owner, SESSION_LEASE_SECONDS * 1000):
+                logger.warning(f"Lost timer lease for session {entry.session_id}")
+                entry.timer_id = None
                 return
-            # send warning
-            warn_text = AGENT_SESSION_WARNING_MESSAGE
-            try:
-                client.sendText(entry.jid, warn_text)
-            except Exception:
-                logger.exception("Failed to send inactivity warning")
-            # wait final 5 minutes
-            await asyncio.sleep(INACTIVITY_END_SECONDS - INACTIVITY_WARNING_SECONDS)
-            # final check
-            sess = await self.db.get_session(entry.session_id)
-            if not sess or sess.get("status") != "active":
+            record = await self.state.get_session(phone)
+            if not record or record["session_id"] != entry.session_id:
+                entry.timer_id = None
+                return  # ended (possibly by another worker)
+            last_activity = await self.state.get_last_activity(phone) or entry.last_activity
+            entry.last_activity = last_activity
+            now = time.time()
+            idle = now - last_activity
+            age = now - entry.started_at
+
+            if age >= FORCED_SESSION_SECONDS:
+                logger.info(f"Force ending session {entry.session_id} for {phone} due to time limit")
+                await self._send(self._client, entry.jid, AGENT_SESSION_END_MESSAGE)
+                await self._finish(entry, status="ended")
                 return
-            last_activity = int(sess.get("last_activity"))
-            now = int(time.time())
-            if now - last_activity < INACTIVITY_END_SECONDS:
-                # user replied in the meantime
+            if idle >= INACTIVITY_END_SECONDS:
+                logger.info(f"Ending session {entry.session_id} for {phone} due to inactivity")
+                await self._send(self._client, entry.jid, AGENT_SESSION_END_MESSAGE)
+                await self._finish(entry, status="ended")
                 return
-            # end session
-            logger.info(f"Ending session {entry.session_id} for {entry.phone} due to inactivity")
-            try:
-                client.sendText(entry.jid, AGENT_SESSION_END_MESSAGE)
-            except Exception:
-                logger.exception("Failed to send inactivity final message")
-            await self.db.end_session(entry.session_id, ended_at=int(time.time()), status="ended")
-            # cleanup
-            async with self._lock:
-                await self._cancel_tasks(entry)
-                self._sessions.pop(entry.phone, None)
+            if idle >= INACTIVITY_WARNING_SECONDS:
+                if not entry.warned_inactive:
+                    await self._send(self._client, entry.jid, AGENT_SESSION_WARNING_MESSAGE)
+                    entry.warned_inactive = True
+            else:
+                entry.warned_inactive = False  # the user came back
+            if age >= FORCED_SESSION_SECONDS - FORCED_WARNING_BEFORE and not entry.warned_limit:
+                await self._send(self._client, entry.jid, AGENT_SESSION_LIMIT_MESSAGE)
+                entry.warned_limit = True
+
+            if self._sessions.get(phone) is entry and entry.timer_id == TIMER_RUNNING:
+                self._timers.schedule(entry, self._next_due(entry, time.time()))
         except asyncio.CancelledError:
-            # watcher cancelled because of new activity / session end
+            # shutdown
             return
         except Exception:
-            logger.exception("Error in inactivity watcher for session %s", entry.session_id)
+            entry.timer_id = None
+            logger.exception("Error in session timers for session %s", entry.session_id)
 
-    async def _forced_watcher(self, entry: SessionEntry, client):
-        """Force-end long sessions after FORCED_SESSION_SECONDS. Send a 5-minute warning beforehand."""
+    async def _send(self, client, jid: str, text: str):
         try:
-            total = FORCED_SESSION_SECONDS
-            warn_at = total - FORCED_WARNING_BEFORE
-            await asyncio.sleep(warn_at)
-            # double-check session still active
-            sess = await self.db.get_session(entry.session_id)
-            if not sess or sess.get("status") != "active":
-                return
-            try:
-                client.sendText(entry.jid, AGENT_SESSION_LIMIT_MESSAGE)
-            except Exception:
-                logger.exception("Failed to send forced-end warning")
-            await asyncio.sleep(FORCED_WARNING_BEFORE)
-            # final end
-            sess = await self.db.get_session(entry.session_id)
-            if not sess or sess.get("status") != "active":
-                return
-            logger.info(f"Force ending session {entry.session_id} for {entry.phone} due to time limit")
+            await client.sendText(jid, text)
+        except Exception:
+            logger.exception("Failed to send session message to %s", jid)
+
+    async def _finish(self, entry: SessionEntry, status: str):
+        """End the session in DB and shared state and drop it locally."""
+        await self.db.end_session(entry.session_id, ended_at=int(time.time()), status=status)
+        await self.state.delete_session(entry.phone, entry.session_id)
+        self._timers.cancel(entry)
+        local = self._sessions.get(entry.phone)
+        if local and local.session_id == entry.session_id:
+            self._sessions.pop(entry.phone, None)
+            self._timers.cancel(local)
+            SESSION_ENTRIES.set(len(self._sessions))
+
+    # --- sweeps ---
+    def _start_sweeper(self):
+        if self._sweeper_task is None:
+            self._sweeper_task = asyncio.create_task(self._sweep())
+
+    async def _sweep(self):
+        """Adopt sessions whose lease expired (their worker died) and expire abandoned ones in the DB."""
+        while True:
+            await asyncio.sleep(SESSION_SWEEP_SECONDS)
             try:
-                client.sendText(entry.jid, AGENT_SESSION_END_MESSAGE)
+                if self.state.shared:
+                    await self._adopt_orphans()
+                await self._expire_abandoned()
+            except asyncio.CancelledError:
+                raise
             except Exception:
-                logger.exception("Failed to send forced final message")
-            await self.db.end_session(entry.session_id, ended_at=int(time.time()), status="ended")
-            async with self._lock:
-                await self._cancel_tasks(entry)
-                self._sessions.pop(entry.phone, None)
-        except asyncio.CancelledError:
+                logger.exception("Session sweep failed")
+
+    async def _adopt_orphans(self):
+        for phone in await self.state.list_sessions():
+            if len(self._sessions) >= self.max_entries:
+                return  # full: leave them to workers with room
+            entry = self._sessions.get(phone)
+            if entry and entry.timer_id is not None:
+                continue
+            record = await self.state.get_session(phone)
+            if not record or not await self.state.acquire_lease(phone, self.owner, SESSION_LEASE_SECONDS * 1000):
+                continue
+            last_activity = await self.state.get_last_activity(phone) or int(record["started_at"])
+            entry = SessionEntry.from_record(record, last_activity)
+            self._sessions[entry.phone] = entry
+            self._sessions.move_to_end(entry.phone, last=False)  # adopted, not active: first to go
+            self._timers.schedule(entry, time.time())
+            logger.info(f"Adopted timers of session {entry.session_id} for {phone}")
+        SESSION_ENTRIES.set(len(self._sessions))
+
+    async def _expire_abandoned(self):
+        """End DB sessions idle well past INACTIVITY_END_SECONDS that no worker's timers ended (evicted entries, restarts)."""
+        # grace: any live owner would have ended them at INACTIVITY_END_SECONDS, within a sweep / lease period
+        idle_before = int(time.time()) - INACTIVITY_END_SECONDS - SESSION_SWEEP_SECONDS - SESSION_LEASE_SECONDS
+        idle = await self.db.idle_sessions(idle_before, SESSION_EXPIRE_BATCH)
+        idle = [(session_id, phone) for session_id, phone in idle if phone not in self._sessions]
+        if not idle:
             return
-        except Exception:
-            logger.exception("Error in forced watcher for session %s", entry.session_id)
-            
+        await self.db.end_sessions([session_id for session_id, _ in idle], ended_at=int(time.time()), status="expired")
+        for session_id, phone in idle:
+            await self.state.delete_session(phone, session_id)
+        SESSIONS_EXPIRED.inc(len(idle))
+        logger.info(f"Expired {len(idle)} abandoned sessions")
+
     async def end_session(self, phone: str, client, reason: str = "ended"):
         """Manually end a user session."""
         async with self._lock:
@@ -565,30 +1256,102 @@ class SessionManager:
             except Exception:
                 logger.exception("Failed to end session in DB")
                 return False
-            try:
-                client.sendText(entry.jid, AGENT_SESSION_END_MESSAGE)
-            except Exception:
-                logger.exception("Failed to send session end message")
-            await self._cancel_tasks(entry)
+            await self._send(client, entry.jid, AGENT_SESSION_END_MESSAGE)
+            self._timers.cancel(entry)
+            await self.state.delete_session(phone, entry.session_id)
             self._sessions.pop(phone, None)
+            SESSION_ENTRIES.set(len(self._sessions))
             logger.info(f"Session {entry.session_id} for {phone} ended manually with reason: {reason}")
             return True
 
+    async def shutdown(self):
+        """Stop local timers and hand their leases back so other workers take over at once."""
+        if self._sweeper_task:
+            self._sweeper_task.cancel()
+        await self._timers.close()
+        for entry in list(self._sessions.values()):
+            if entry.timer_id is not None:
+                self._timers.cancel(entry)
+                await self.state.release_lease(entry.phone, self.owner)
+        await self.state.close()
+
 
 # -----------------------------
 # Module-level singletons
 # -----------------------------
-_DB: Optional[ChatDB] = None
+_DB: Optional[Union[ChatDB, ShardedChatDB]] = None
 _SESSION_MANAGER: Optional[SessionManager] = None
-_db_init_lock = asyncio.Lock()
+_db_init: Optional[asyncio.Task] = None
 
-async def _ensure_db_and_manager():
+async def _open_db_and_manager():
     global _DB, _SESSION_MANAGER
-    async with _db_init_lock:
-        if _DB is None:
-            _DB = ChatDB(DB_PATH)
-            await _DB.initialize()
-            _SESSION_MANAGER = SessionManager(_DB)
+    db = create_chat_db()
+    await db.initialize()
+    _DB = db
+    _SESSION_MANAGER = SessionManager(db, create_session_state())
+
+async def _ensure_db_and_manager(timeout: Optional[float] = None):
+    """
+    Open the chat DB (running its migrations) and the session manager once. A caller that
+    gives up (timeout, cancelled turn or warm-up step) does not cancel the opening: it goes
+    on in the background and the next caller waits for the same task. A failed opening is
+    retried by the next caller.
+    """
+    global _db_init
+    if _SESSION_MANAGER is not None:
+        return
+    if _db_init is None or (_db_init.done() and (_db_init.cancelled() or _db_init.exception() is not None)):
+        _db_init = asyncio.create_task(_open_db_and_manager())
+    await asyncio.wait_for(asyncio.shield(_db_init), timeout)
+
+async def get_chat_db() -> Union[ChatDB, ShardedChatDB]:
+    """The process-wide chat DB (opened on first use)."""
+    await _ensure_db_and_manager()
+    return _DB
+
+def has_active_session(phone: str) -> bool:
+    """Cheap check used by admission control; sessions this worker does not hold count as inactive."""
+    return _SESSION_MANAGER is not None and _SESSION_MANAGER.is_active(phone)
+
+async def shutdown_sessions():
+    """Stop this worker's session timers (called on app shutdown)."""
+    if _SESSION_MANAGER is not None:
+        await _SESSION_MANAGER.shutdown()
+
+# -----------------------------
+# Background requirements extraction
+# -----------------------------
+# session_id -> extraction deferred by a turn that was short on budget (at most one per session)
+_BACKGROUND_EXTRACTIONS: Dict[str, asyncio.Task] = {}
+
+async def _extract_in_background(openai_client: "AsyncOpenAI", session_id: str, llm_messages: List[Dict[str, str]]):
+    try:
+        requirements = await extract_user_requirements(
+            openai_client=openai_client,
+            messages=llm_messages,
+            priority=PRIORITY_BACKGROUND,
+        )
+        await _DB.update_user_requirements(session_id, requirements)
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        logger.exception("Background requirements extraction failed")
+
+def _start_background_extraction(openai_client: "AsyncOpenAI", session_id: str, llm_messages: List[Dict[str, str]]):
+    task = asyncio.create_task(_extract_in_background(openai_client, session_id, llm_messages))
+    _BACKGROUND_EXTRACTIONS[session_id] = task
+
+    def _forget(done: asyncio.Task):
+        if _BACKGROUND_EXTRACTIONS.get(session_id) is done:
+            del _BACKGROUND_EXTRACTIONS[session_id]
+
+    task.add_done_callback(_forget)
+
+def _cancel_background_extraction(session_id: str):
+    """A newer turn extracts from newer messages: an older deferred extraction must not overwrite it."""
+    task = _BACKGROUND_EXTRACTIONS.pop(session_id, None)
+    if task is not None:
+        task.cancel()
 
 # -----------------------------
 # Chat response logic
@@ -620,8 +1383,9 @@ def markdown_to_whatsapp(text: str) -> str:
 async def chat_response(
     msg: Dict[str, Any],
     client,
-    openai_client: OpenAI,
-    history=None
+    openai_client: "AsyncOpenAI",
+    history=None,
+    deadline: Optional[Deadline] = None,
 ) -> str:
     """
     Main entrypoint to handle a conversational message. This function:
@@ -635,12 +1399,28 @@ async def chat_response(
         msg: the incoming message object from wa-automate (same structure as in main.py)
         client: the wa-automate SocketClient instance (used to send replies)
         history: optional, unused (kept for compatibility)
+        deadline: turn deadline shared by every LLM / VPS call of this turn
+            (a fresh TURN_DEADLINE_SECONDS deadline when omitted)
 
     Returns:
         The reply text that was sent.
     """
+    if deadline is None:
+        deadline = Deadline(TURN_DEADLINE_SECONDS)
+    try:
+        await _ensure_db_and_manager(timeout=deadline.timeout())
+    except (asyncio.TimeoutError, DeadlineExceeded):
+        # still opening (the first start after a deploy may be migrating a large file)
+        logger.warning(f"Chat DB not open within the turn deadline ({deadline.budget}s)")
+        reply_to = msg.get("data", {}).get("chatId") or msg.get("data", {}).get("from") or ""
+        try:
+            await client.sendText(reply_to, AGENT_TIMEOUT_MESSAGE)
+        except Exception:
+            logger.exception("Failed to send reply to %s", reply_to)
+        return AGENT_TIMEOUT_MESSAGE
+    # stored with the bot reply, e.g. the booking outcome for analytics exports
+    reply_metadata: Optional[Dict[str, Any]] = None
     try:
-        await _ensure_db_and_manager()
         assert _DB is not None and _SESSION_MANAGER is not None
 
         # ignore group messages
@@ -660,13 +1440,16 @@ async def chat_response(
         sender = msg_data.get("sender", {}) or {}
         user_name = sender.get("pushname", "")
         text = (msg["data"].get("body") or "").strip()
+        locale = resolve_locale(phone)
 
         # ensure session exists
-        entry = await _SESSION_MANAGER.ensure_session(phone=phone, jid=phone_jid, user_name=user_name, client=client)
+        with track_stage("ensure_session"):
+            entry = await _SESSION_MANAGER.ensure_session(phone=phone, jid=phone_jid, user_name=user_name, client=client)
 
         # store user message and extract requirements
         try:
-            await _DB.add_message(entry.session_id, sender="user", body=text)
+            with track_stage("store_message"):
+                await _DB.add_message(entry.session_id, sender="user", body=text)
             
             # Get messages including the new one
             messages = await _DB.get_messages_for_session(entry.session_id, limit=20)
@@ -681,13 +1464,24 @@ async def chat_response(
                 for m in reversed(last_messages)
             ]
             
-            # Extract and store user requirements
-            requirements = await extract_user_requirements(
-                openai_client=openai_client,
-                messages=llm_messages
-            )
-            await _DB.update_user_requirements(entry.session_id, requirements)
+            # Extract and store user requirements (optional stage: a turn short on budget leaves it
+            # to a background call, so the next turn still finds them)
+            _cancel_background_extraction(entry.session_id)
+            if deadline.has_budget(EXTRACTION_MIN_BUDGET_SECONDS):
+                with track_stage("extract_requirements"):
+                    requirements = await extract_user_requirements(
+                        openai_client=openai_client,
+                        messages=llm_messages,
+                        deadline=deadline,
+                    )
+                with track_stage("store_requirements"):
+                    await _DB.update_user_requirements(entry.session_id, requirements)
+            else:
+                logger.warning(f"Deferring requirements extraction to the background, {deadline.remaining():.1f}s left")
+                _start_background_extraction(openai_client, entry.session_id, llm_messages)
             
+        except DeadlineExceeded:
+            raise
         except Exception:
             logger.exception("Failed to store message or extract requirements")
 
@@ -695,7 +1489,7 @@ async def chat_response(
         messages = await _DB.get_messages_for_session(entry.session_id, limit=20)
         last_messages = messages[:10]
         last_message = messages[0]
-        logger.info(f"Get last message: {last_message}")
+        logger.info("Get last message: %s", truncated(last_message))
         
         # Build LLm messages for response generation
         llm_messages = [
@@ -706,17 +1500,20 @@ async def chat_response(
             for m in reversed(last_messages)
         ]
         
-        logger.info(f"Get First LLM message: {llm_messages[0]}")
+        logger.info("Get First LLM message: %s", truncated(llm_messages[0]))
         
         # Get stored requirements to guide conversation
-        requirements = await _DB.get_user_requirements(entry.session_id)
-        logger.info(f"Stored requirements: {requirements}")
+        with track_stage("load_requirements"):
+            requirements = await _DB.get_user_requirements(entry.session_id)
+        logger.info("Stored requirements: %s", truncated(requirements))
         
-        question_class_result = await get_question_class(
-            openai_client=openai_client,
-            messages=llm_messages,
-            question_class_details=question_class_details
-        )
+        with track_stage("question_class"):
+            question_class_result = await get_question_class(
+                openai_client=openai_client,
+                messages=llm_messages,
+                question_class_details=question_class_details,
+                deadline=deadline,
+            )
         question_class_dict = copy.deepcopy(question_class_details)
         for cr in question_class_result:
             question_class_dict = question_class_dict.get(cr)
@@ -725,7 +1522,10 @@ async def chat_response(
                 
         question_class_tools: str = question_class_dict.get("tools")
                 
-        logger.info(f"Question class dict: {question_class_dict}")
+        logger.info("Question class dict: %s", truncated(question_class_dict))
+        
+        # Deterministic replies are rendered from templates and skip the final LLM call
+        templated_response: Optional[str] = None
         
         if question_class_tools == "general_talk":
             extra_prompt = GENERAL_TALK_EXTRA_PROMPT
@@ -753,10 +1553,17 @@ Example: "To help you find the perfect venue, could you please tell me which cou
 Do NOT proceed with venue search until country is provided.
 Do NOT make up or hallucinate any venue names."""
             else:
-                venue_summary = await get_venue_summary(
-                    openai_client=openai_client,
-                    messages=llm_messages
-                )
+                if deadline.has_budget(VENUE_SUMMARY_MIN_BUDGET_SECONDS):
+                    with track_stage("venue_summary"):
+                        venue_summary = await get_venue_summary(
+                            openai_client=openai_client,
+                            messages=llm_messages,
+                            deadline=deadline,
+                        )
+                else:
+                    # Short on budget: search with the latest message plus stored requirements
+                    logger.warning(f"Skipping venue summary, {deadline.remaining():.1f}s left")
+                    venue_summary = text
                 
                 # Use stored requirements if available
                 if requirements:
@@ -764,13 +1571,20 @@ Do NOT make up or hallucinate any venue names."""
                     
                 venue_summary = f"{venue_summary}. {stored_requirements}"
                 
-                logger.info(f"Venue Summary: {venue_summary}")
+                logger.info("Venue Summary: %s", truncated(venue_summary))
                 
-                venue_recommendation = await get_venue_recommendation(
-                    phone_number=phone,
-                    text_body=venue_summary,
-                    k_venue=5
-                )
+                # If the turn gets slow from here on, the early acknowledgement says what we are doing
+                set_ack_message = getattr(client, "set_ack_message", None)
+                if set_ack_message:
+                    set_ack_message(phone_jid, AGENT_VENUE_SEARCH_ACK_MESSAGE)
+                
+                with track_stage("venue_recommendation"):
+                    venue_recommendation = await get_venue_recommendation(
+                        phone_number=phone,
+                        text_body=venue_summary,
+                        k_venue=5,
+                        deadline=deadline,
+                    )
                 
                 # Check if venues were found
                 top_k_venues = venue_recommendation.get("top_k_venues", [])
@@ -791,37 +1605,30 @@ Do NOT make up or hallucinate any venue names or details."""
                         "venue_recommendations": top_k_venues
                     })
                     logger.info(f"Stored venue recommendations with ticket_id: {ticket_id}")
+                    VENUE_INDEX.add(top_k_venues)
                     
-                    # DIRECTLY format venues from API data - NO LLM to prevent hallucination
-                    formatted_venues = []
-                    for idx, venue in enumerate(top_k_venues, start=1):
-                        payload = venue.get("payload", {})
-                        venue_text = f"{idx}. *{payload.get('name', 'Unknown')}*\n"
-                        venue_text += f"   📍 Location: {payload.get('location', 'N/A')}\n"
-                        venue_text += f"   🏷️ Type: {payload.get('type', 'N/A')}\n"
-                        venue_text += f"   ⭐ Amenities: {payload.get('amenities', 'N/A')}"
-                        formatted_venues.append(venue_text)
-                    
-                    venue_list_text = "\n\n".join(formatted_venues)
-                    
-                    if len(top_k_venues) == 1:
-                        extra_prompt = f"""Present this EXACT venue to the user (do NOT modify or add any venue details):
-
-I have found one venue that fits your criteria:
-
-{venue_list_text}
-
-Ask if they would like to proceed with booking this venue."""
-                    else:
-                        extra_prompt = f"""Present these EXACT venues to the user (do NOT modify, add, or remove any venue details):
-
-I have found {len(top_k_venues)} venues that fit your criteria:
-
-{venue_list_text}
-
-Ask the user which venue they prefer so you can assist with booking."""
+                    # DIRECTLY render venues from API data - NO LLM to prevent hallucination
+                    templated_response = render_venue_list(top_k_venues, locale=locale)
                     
                     logger.info(f"Formatted venues directly from API: {len(top_k_venues)} venues")
+        elif question_class_tools == "venue_details":
+            # Follow-up about venues already shown: the session's current recommendations come
+            # from the DB (this turn's read), the local index only answers over their payloads
+            shown_venues = requirements.get("venue_recommendations") if requirements else None
+            if not shown_venues:
+                extra_prompt = """The user asks about venue details but no venue recommendations have been provided yet.
+Ask them to first describe what kind of venue they're looking for (location, event type, capacity, etc.) so you can provide recommendations.
+Do NOT make up or hallucinate any venue names."""
+                logger.info("No stored venues - requesting user to search for venues first")
+            else:
+                templated_response = VENUE_INDEX.answer(text, shown_venues, locale=locale)
+                if templated_response is None:
+                    venue_lines = "\n".join(
+                        f"{idx}. {json.dumps(v.get('payload', {}), ensure_ascii=False)}"
+                        for idx, v in enumerate(shown_venues, start=1)
+                    )
+                    extra_prompt = VENUE_DETAILS_EXTRA_PROMPT.format(venues=venue_lines)
+                    logger.info("Venue details question not answerable from the index, using the final LLM")
         elif question_class_tools == "confirm_booking":
             # Check if we have stored venue recommendations first
             stored_ticket_id = requirements.get("ticket_id") if requirements else None
@@ -849,16 +1656,15 @@ Do NOT make up or hallucinate any venue names."""
                 # Validate all required fields before booking
                 missing_fields = []
                 if not customer_name:
-                    missing_fields.append("full name")
+                    missing_fields.append("customer_name")
                 if not email:
-                    missing_fields.append("email address")
+                    missing_fields.append("email")
                 if not event_date:
-                    missing_fields.append("event date (when you want to book the venue)")
+                    missing_fields.append("event_date")
                 
                 if missing_fields:
                     # Request missing information before proceeding with booking
-                    missing_str = ", ".join(missing_fields[:-1]) + (" and " + missing_fields[-1] if len(missing_fields) > 1 else missing_fields[0])
-                    extra_prompt = f"Please provide your {missing_str} so we can proceed with the booking confirmation."
+                    templated_response = render_missing_fields(missing_fields, locale=locale)
                     logger.info(f"Missing required fields for booking: {missing_fields}")
                 else:
                     # Use stored venue data instead of making new API call
@@ -869,13 +1675,29 @@ Do NOT make up or hallucinate any venue names."""
                     
                     logger.info(f"Using stored venue recommendation with ticket_id: {stored_ticket_id}")
                     
-                    confirm_booking_result = await get_confirm_booking(
-                        openai_client=openai_client,
-                        messages=llm_messages,
-                        venue_recommendation=venue_recommendation,
-                    )
-                    venue_name = confirm_booking_result.get("venue_name")
-                    venue_id = confirm_booking_result.get("venue_id")
+                    # Resolve "book 2" / "the second one" / venue name / venue id locally first
+                    recent_user_texts = [
+                        m["body"] for m in last_messages if m["sender"] == "user"
+                    ][:VENUE_RESOLVER_MAX_MESSAGES]
+                    resolution = resolve_from_messages(recent_user_texts, stored_venues)
+                    logger.info(f"Venue resolution: {resolution}")
+                    
+                    if resolution.confidence >= VENUE_RESOLVER_MIN_CONFIDENCE:
+                        record_resolution(resolution.path)
+                        venue_name = resolution.venue_name
+                        venue_id = resolution.venue_id
+                    else:
+                        # Ambiguous or no local match - let the LLM decide
+                        record_resolution("llm_fallback")
+                        with track_stage("confirm_booking"):
+                            confirm_booking_result = await get_confirm_booking(
+                                openai_client=openai_client,
+                                messages=llm_messages,
+                                venue_recommendation=venue_recommendation,
+                                deadline=deadline,
+                            )
+                        venue_name = confirm_booking_result.get("venue_name")
+                        venue_id = confirm_booking_result.get("venue_id")
                     
                     # Validate venue_id before booking
                     if not venue_id:
@@ -893,47 +1715,64 @@ Please specify which venue you'd like to book by mentioning its name."""
                     else:
                         logger.info(f"Venue Name: {venue_name}, Venue ID: {venue_id}")
                         
-                        book_now_text = await book_now(
-                            ticket_id=stored_ticket_id,
-                            venue_name=venue_name,
-                            venue_id=venue_id,
-                            email_address=email,
-                            customer_name=customer_name,
-                            event_date=event_date
-                        )
+                        with track_stage("book_now"):
+                            booked, book_now_text = await book_now(
+                                ticket_id=stored_ticket_id,
+                                venue_name=venue_name,
+                                venue_id=venue_id,
+                                email_address=email,
+                                customer_name=customer_name,
+                                event_date=event_date,
+                                deadline=deadline,
+                            )
                         
-                        logger.info(f"Confirm Booking: book_now_text: {book_now_text}")
+                        logger.info("Confirm Booking: book_now_text: %s", truncated(book_now_text))
+                        reply_metadata = {"booking": {
+                            "status": "booked" if booked else "failed",
+                            "ticket_id": stored_ticket_id,
+                            "venue_id": venue_id,
+                            "venue_name": venue_name,
+                            "event_date": event_date,
+                        }}
                         
-                        extra_prompt = CONFIRM_BOOKING_EXTRA_PROMPT.format(
-                            book_venue_text=book_now_text
-                        )
+                        templated_response = render_booking_result(book_now_text, locale=locale)
         else:
             logger.error(f"Can't find the question_class")
             return
         
-        logger.info(f"Extra prompt: {extra_prompt}")
-        
-        # Final Response
-        final_response = await get_final_response(
-            openai_client=openai_client,
-            messages=llm_messages,
-            extra_prompt=extra_prompt,
-        )
-        
-        final_response_header = final_response.get("response_header", "")
-        final_response_content = final_response.get("response_content", "")
-        final_response_footer = final_response.get("response_footer", "")
+        if templated_response is not None:
+            # Already in WhatsApp format, no final LLM round trip needed
+            final_response_str = templated_response
+            logger.info("Templated Response: %s", truncated(final_response_str))
+        else:
+            logger.debug("Extra prompt: %s", truncated(extra_prompt))
+            
+            # Final Response
+            with track_stage("final_response"):
+                final_response = await get_final_response(
+                    openai_client=openai_client,
+                    messages=llm_messages,
+                    extra_prompt=extra_prompt,
+                    deadline=deadline,
+                )
+            
+            final_response_header = final_response.get("response_header", "")
+            final_response_content = final_response.get("response_content", "")
+            final_response_footer = final_response.get("response_footer", "")
 
-        # Keep only non-empty parts
-        parts = [final_response_header, final_response_content, final_response_footer]
-        final_response_str = "\n\n".join(part for part in parts if part.strip())
-        
-        logger.info(f"Final Response: {final_response_str}")
-        # Parse from Marksdown style to Whatsapp style
-        final_response_str = markdown_to_whatsapp(final_response_str)
+            # Keep only non-empty parts
+            parts = [final_response_header, final_response_content, final_response_footer]
+            final_response_str = "\n\n".join(part for part in parts if part.strip())
+            
+            logger.info("Final Response: %s", truncated(final_response_str))
+            # Parse from Marksdown style to Whatsapp style
+            final_response_str = markdown_to_whatsapp(final_response_str)
         
         if not final_response_str:
             final_response_str = AGENT_ERROR_DEFAULT_MESSAGE
+    except DeadlineExceeded as e:
+        logger.warning(f"Turn deadline exceeded after {deadline.elapsed():.1f}s: {e}")
+        final_response_str = AGENT_TIMEOUT_MESSAGE
     except Exception as e:
         logger.exception("Error in response chat (type=%s): %r", type(e).__name__, e)
         final_response_str = AGENT_ERROR_DEFAULT_MESSAGE
@@ -941,17 +1780,19 @@ Please specify which venue you'd like to book by mentioning its name."""
 
     # send the reply
     try:
-        await client.sendText(phone_jid, final_response_str)
+        with track_stage("send_reply"):
+            await client.sendText(phone_jid, final_response_str)
     except Exception:
         logger.exception("Failed to send reply to %s", phone_jid)
 
     # store bot message
     try:
-        await _DB.add_message(entry.session_id, sender="bot", body=final_response_str)
+        with track_stage("store_reply"):
+            await _DB.add_message(entry.session_id, sender="bot", body=final_response_str, metadata=reply_metadata)
     except Exception:
         logger.exception("Failed to store bot message")
 
-    # update session activity (this will also restart inactivity watcher)
+    # update session activity (the inactivity timers reschedule from it)
     await _SESSION_MANAGER.touch_session(phone, client)
 
     return final_response_str
@@ -0,0 +1,332 @@
+"""
+Shared session state for running the bot on several workers / nodes.
+
+SessionManager keeps the active session of each phone, its last activity and the ownership
+of its timers (inactivity / session-limit checks) in a SessionStateBackend:
+
+- InMemorySessionState (default): process-local, for a single worker.
+- RedisSessionState: any Redis-protocol server, so `uvicorn --workers N` or several
+  containers behind a load balancer see the same sessions.
+
+Timers are guarded by leases: a worker only runs a session's timers while it holds the
+session's lease (SET NX PX), renews it while the timers are scheduled and gives it up when the
+session ends. If a worker dies its leases expire and another worker adopts the sessions.
+
+Select with SESSION_STATE_BACKEND=memory|redis and REDIS_URL=redis://[:password@]host:port/db.
+"""
+
+import os
+import json
+import asyncio
+import socket
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from core.agent.config import (
+    FORCED_SESSION_SECONDS,
+    INACTIVITY_END_SECONDS,
+    SESSION_STATE_KEY_PREFIX,
+)
+from core.logger import get_logger
+from core.settings import settings
+
+logger = get_logger(__name__, service="Agent")
+
+SESSION_STATE_BACKEND = settings.session_state_backend
+REDIS_URL = settings.redis_url
+
+# Session keys outlive the longest possible session, so abandoned keys clean themselves up
+SESSION_KEY_TTL_MS = (FORCED_SESSION_SECONDS + INACTIVITY_END_SECONDS + 600) * 1000
+
+# Compare-and-set scripts (the lease / session is only touched by its current holder)
+RENEW_LEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+RELEASE_LEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+DELETE_SESSION_SCRIPT = """
+local value = redis.call('get', KEYS[1])
+if value and cjson.decode(value)['session_id'] == ARGV[1] then
+    return redis.call('del', KEYS[1], KEYS[2], KEYS[3])
+end
+return 0
+"""
+
+
+def new_owner_id() -> str:
+    """Identity of this worker in leases: host, pid and a random suffix."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class SessionStateBackend(ABC):
+    """
+    Session records are dicts with session_id, phone, jid, user_name and started_at.
+    Last activity is kept separately so it can be bumped without rewriting the record.
+    """
+
+    # True when leases expire and must be renewed (i.e. other workers may take over)
+    shared = False
+
+    @abstractmethod
+    async def get_session(self, phone: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    async def create_session(self, phone: str, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Store `record` unless the phone already has a session; returns the stored record."""
+
+    @abstractmethod
+    async def delete_session(self, phone: str, session_id: str) -> bool:
+        """Remove the phone's session (with its activity and lease) if it is still `session_id`."""
+
+    @abstractmethod
+    async def list_sessions(self) -> List[str]:
+        """Phones with an active session."""
+
+    @abstractmethod
+    async def touch(self, phone: str, last_activity: int):
+        ...
+
+    @abstractmethod
+    async def get_last_activity(self, phone: str) -> Optional[int]:
+        ...
+
+    @abstractmethod
+    async def acquire_lease(self, phone: str, owner: str, ttl_ms: int) -> bool:
+        ...
+
+    @abstractmethod
+    async def renew_lease(self, phone: str, owner: str, ttl_ms: int) -> bool:
+        ...
+
+    @abstractmethod
+    async def release_lease(self, phone: str, owner: str) -> bool:
+        ...
+
+    async def close(self):
+        return None
+
+
+# -----------------------------
+# In-process backend
+# -----------------------------
+class InMemorySessionState(SessionStateBackend):
+    """Single-worker backend; leases never expire because there is nobody to take over."""
+
+    shared = False
+
+    def __init__(self):
+        self._sessions: Dict[str, Dict[str, Any]] = {}
+        self._activity: Dict[str, int] = {}
+        self._leases: Dict[str, str] = {}
+
+    async def get_session(self, phone: str) -> Optional[Dict[str, Any]]:
+        return self._sessions.get(phone)
+
+    async def create_session(self, phone: str, record: Dict[str, Any]) -> Dict[str, Any]:
+        return self._sessions.setdefault(phone, record)
+
+    async def delete_session(self, phone: str, session_id: str) -> bool:
+        record = self._sessions.get(phone)
+        if not record or record["session_id"] != session_id:
+            return False
+        self._sessions.pop(phone, None)
+        self._activity.pop(phone, None)
+        self._leases.pop(phone, None)
+        return True
+
+    async def list_sessions(self) -> List[str]:
+        return list(self._sessions)
+
+    async def touch(self, phone: str, last_activity: int):
+        self._activity[phone] = last_activity
+
+    async def get_last_activity(self, phone: str) -> Optional[int]:
+        return self._activity.get(phone)
+
+    async def acquire_lease(self, phone: str, owner: str, ttl_ms: int) -> bool:
+        return self._leases.setdefault(phone, owner) == owner
+
+    async def renew_lease(self, phone: str, owner: str, ttl_ms: int) -> bool:
+        return self._leases.get(phone) == owner
+
+    async def release_lease(self, phone: str, owner: str) -> bool:
+        if self._leases.get(phone) == owner:
+            del self._leases[phone]
+            return True
+        return False
+
+
+# -----------------------------
+# Redis protocol backend
+# -----------------------------
+class RedisError(Exception):
+    pass
+
+
+class RedisConnection:
+    """
+    Minimal RESP2 client: one connection, commands serialized by a lock, one reconnect
+    attempt on connection errors. Enough for the handful of commands session state needs.
+    """
+
+    def __init__(self, url: str, timeout: float = 5.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int((parsed.path or "/0").lstrip("/") or 0)
+        self.timeout = timeout
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._lock = asyncio.Lock()
+
+    async def _connect(self):
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), self.timeout
+        )
+        if self.password:
+            await self._roundtrip("AUTH", self.password)
+        if self.db:
+            await self._roundtrip("SELECT", self.db)
+
+    @staticmethod
+    def _encode(args: Tuple[Any, ...]) -> bytes:
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(parts)
+
+    async def _read_reply(self):
+        line = await self._reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode()
+        if kind == b"-":
+            raise RedisError(payload.decode())
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length == -1:
+                return None
+            data = await self._reader.readexactly(length + 2)
+            return data[:-2].decode()
+        if kind == b"*":
+            count = int(payload)
+            if count == -1:
+                return None
+            return [await self._read_reply() for _ in range(count)]
+        raise RedisError(f"Unexpected reply: {line!r}")
+
+    async def _roundtrip(self, *args):
+        self._writer.write(self._encode(args))
+        await self._writer.drain()
+        return await asyncio.wait_for(self._read_reply(), self.timeout)
+
+    async def execute(self, *args):
+        async with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._writer is None:
+                        await self._connect()
+                    return await self._roundtrip(*args)
+                except (ConnectionError, OSError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+                    await self._reset()
+                    if attempt:
+                        raise
+
+    async def _reset(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+    async def close(self):
+        async with self._lock:
+            await self._reset()
+
+
+class RedisSessionState(SessionStateBackend):
+    shared = True
+
+    def __init__(self, url: str = REDIS_URL, prefix: str = SESSION_STATE_KEY_PREFIX):
+        self.redis = RedisConnection(url)
+        self.prefix = prefix
+
+    def _key(self, kind: str, phone: str) -> str:
+        return f"{self.prefix}{kind}:{phone}"
+
+    async def get_session(self, phone: str) -> Optional[Dict[str, Any]]:
+        value = await self.redis.execute("GET", self._key("session", phone))
+        return json.loads(value) if value else None
+
+    async def create_session(self, phone: str, record: Dict[str, Any]) -> Dict[str, Any]:
+        created = await self.redis.execute(
+            "SET", self._key("session", phone), json.dumps(record), "NX", "PX", SESSION_KEY_TTL_MS
+        )
+        if created:
+            return record
+        return await self.get_session(phone) or record
+
+    async def delete_session(self, phone: str, session_id: str) -> bool:
+        deleted = await self.redis.execute(
+            "EVAL", DELETE_SESSION_SCRIPT, 3,
+            self._key("session", phone), self._key("activity", phone), self._key("lease", phone),
+            session_id,
+        )
+        return bool(deleted)
+
+    async def list_sessions(self) -> List[str]:
+        phones, cursor = [], "0"
+        pattern = self._key("session", "*")
+        offset = len(self._key("session", ""))
+        while True:
+            cursor, keys = await self.redis.execute("SCAN", cursor, "MATCH", pattern, "COUNT", 500)
+            phones.extend(key[offset:] for key in keys)
+            if cursor == "0":
+                return phones
+
+    async def touch(self, phone: str, last_activity: int):
+        await self.redis.execute("SET", self._key("activity", phone), last_activity, "PX", SESSION_KEY_TTL_MS)
+
+    async def get_last_activity(self, phone: str) -> Optional[int]:
+        value = await self.redis.execute("GET", self._key("activity", phone))
+        return int(value) if value else None
+
+    async def acquire_lease(self, phone: str, owner: str, ttl_ms: int) -> bool:
+        key = self._key("lease", phone)
+        if await self.redis.execute("SET", key, owner, "NX", "PX", ttl_ms):
+            return True
+        # re-acquiring our own lease just extends it
+        return await self.renew_lease(phone, owner, ttl_ms)
+
+    async def renew_lease(self, phone: str, owner: str, ttl_ms: int) -> bool:
+        return bool(await self.redis.execute("EVAL", RENEW_LEASE_SCRIPT, 1, self._key("lease", phone), owner, ttl_ms))
+
+    async def release_lease(self, phone: str, owner: str) -> bool:
+        return bool(await self.redis.execute("EVAL", RELEASE_LEASE_SCRIPT, 1, self._key("lease", phone), owner))
+
+    async def close(self):
+        await self.redis.close()
+
+
+def create_session_state(backend: Optional[str] = None) -> SessionStateBackend:
+    backend = backend or SESSION_STATE_BACKEND
+    if backend == "redis":
+        logger.info(f"Session state: redis at {urlparse(REDIS_URL).hostname}:{urlparse(REDIS_URL).port or 6379}")
+        return RedisSessionState(REDIS_URL)
+    if backend != "memory":
+        raise ValueError(f"Unknown SESSION_STATE_BACKEND: {backend}")
+    return InMemorySessionState()
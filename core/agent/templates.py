@@ -0,0 +1,97 @@
+from typing import List, Dict, Any, Optional
+
+from core.agent.config import (
+    DEFAULT_LOCALE,
+    LOCALE_BY_PHONE_PREFIX,
+    RESPONSE_TEMPLATES,
+)
+
+
+def resolve_locale(phone: Optional[str] = None) -> str:
+    """
+    Pick the response locale for a phone number using LOCALE_BY_PHONE_PREFIX
+    (longest prefix wins), falling back to DEFAULT_LOCALE.
+    """
+    if phone:
+        for prefix in sorted(LOCALE_BY_PHONE_PREFIX, key=len, reverse=True):
+            if phone.startswith(prefix):
+                return LOCALE_BY_PHONE_PREFIX[prefix]
+    return DEFAULT_LOCALE
+
+
+def get_templates(locale: Optional[str] = None) -> Dict[str, str]:
+    """Templates for a locale, with missing keys filled from the default locale."""
+    templates = dict(RESPONSE_TEMPLATES[DEFAULT_LOCALE])
+    templates.update(RESPONSE_TEMPLATES.get(locale or DEFAULT_LOCALE, {}))
+    return templates
+
+
+def join_items(items: List[str], locale: Optional[str] = None) -> str:
+    """Join items as 'a, b and c' using the locale's conjunction."""
+    if not items:
+        return ""
+    if len(items) == 1:
+        return items[0]
+    conjunction = get_templates(locale)["list_conjunction"]
+    return f"{', '.join(items[:-1])} {conjunction} {items[-1]}"
+
+
+def render_response(header: str = "", content: str = "", footer: str = "") -> str:
+    """Join response parts the same way as the LLM final response (non-empty parts only)."""
+    parts = [header, content, footer]
+    return "\n\n".join(part for part in parts if part and part.strip())
+
+
+def field_text(payload: Dict[str, Any], field: str) -> str:
+    """A payload field as display text: lists (e.g. amenities) are joined as 'a, b', None is empty."""
+    value = payload.get(field)
+    if isinstance(value, (list, tuple)):
+        return ", ".join(str(item) for item in value)
+    return str(value) if value is not None else ""
+
+
+def render_venue_item(index: int, payload: Dict[str, Any], locale: Optional[str] = None) -> str:
+    templates = get_templates(locale)
+    missing = templates["venue_missing_value"]
+    return templates["venue_item"].format(
+        index=index,
+        name=field_text(payload, "name") or templates["venue_unknown_name"],
+        location=field_text(payload, "location") or missing,
+        type=field_text(payload, "type") or missing,
+        amenities=field_text(payload, "amenities") or missing,
+    )
+
+
+def render_venue_list(top_k_venues: List[Dict[str, Any]], locale: Optional[str] = None) -> str:
+    """Render the venue recommendation reply exactly from the VPS payloads (no LLM)."""
+    templates = get_templates(locale)
+    venue_list_text = "\n\n".join(
+        render_venue_item(idx, venue.get("payload", {}), locale)
+        for idx, venue in enumerate(top_k_venues, start=1)
+    )
+    if len(top_k_venues) == 1:
+        header = templates["venue_list_header_one"]
+        footer = templates["venue_list_footer_one"]
+    else:
+        header = templates["venue_list_header_many"].format(count=len(top_k_venues))
+        footer = templates["venue_list_footer_many"]
+    return render_response(header, venue_list_text, footer)
+
+
+def render_missing_fields(missing_fields: List[str], locale: Optional[str] = None) -> str:
+    """
+    Render the request for missing booking fields.
+
+    Args:
+        missing_fields: field keys, any of "customer_name", "email", "event_date"
+    """
+    templates = get_templates(locale)
+    labels = [templates[f"field_{field}"] for field in missing_fields]
+    header = templates["missing_fields_header"].format(fields=join_items(labels, locale))
+    return render_response(header, "", templates["missing_fields_footer"])
+
+
+def render_booking_result(book_venue_text: str, locale: Optional[str] = None) -> str:
+    """Render the booking API result followed by the closing question."""
+    templates = get_templates(locale)
+    return render_response(book_venue_text, "", templates["booking_result_footer"])
@@ -0,0 +1,105 @@
+"""
+Normalized venue catalog shared by all sessions.
+
+Recommendation responses carry full venue payloads (`{"payload": {...}, "score": ...}`), and
+the same popular venues come back for thousands of sessions. Sessions therefore store only
+references in `user_requirements.venue_recommendations`:
+
+    [["123", 0.95], ["456", 0.9], ...]      # [payload.id, score] in the order shown
+
+and the payloads live once per DB file in the `venues` table (migration v6), fronted by an
+in-process LRU keyed by payload.id. Reads rehydrate the references back into the usual
+`top_k_venues` entries. Entries without a payload id cannot be referenced and are stored inline.
+
+Payloads returned from the catalog are shared between sessions: treat them as read-only.
+"""
+
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.agent.config import VENUE_CATALOG_SIZE
+
+
+def venue_key(venue: Dict[str, Any]) -> Optional[str]:
+    """Catalog key of a `top_k_venues` entry (its payload.id), None if it has none."""
+    payload = venue.get("payload") if isinstance(venue, dict) else None
+    if not isinstance(payload, dict) or payload.get("id") is None:
+        return None
+    return str(payload["id"])
+
+
+def split_recommendations(venues: List[Dict[str, Any]]) -> Tuple[List[Any], Dict[str, Dict[str, Any]]]:
+    """`top_k_venues` entries -> (references to store, payloads by id for the catalog)."""
+    refs: List[Any] = []
+    payloads: Dict[str, Dict[str, Any]] = {}
+    for venue in venues:
+        key = venue_key(venue)
+        if key is None:
+            refs.append(venue)
+            continue
+        refs.append([key, venue.get("score")])
+        payloads[key] = venue["payload"]
+    return refs, payloads
+
+
+def referenced_ids(refs: List[Any]) -> List[str]:
+    return [ref[0] for ref in refs if isinstance(ref, list)]
+
+
+def hydrate(refs: List[Any], payloads: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """References -> `top_k_venues` entries. Inline entries pass through; unknown ids are dropped."""
+    venues = []
+    for ref in refs:
+        if not isinstance(ref, list):
+            venues.append(ref)
+        elif ref[0] in payloads:
+            venues.append({"payload": payloads[ref[0]], "score": ref[1]})
+    return venues
+
+
+def encode_payload(payload: Dict[str, Any]) -> str:
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+
+
+class VenueCatalog:
+    """Thread-safe LRU of venue payloads by id (ChatDB reads run on a thread pool)."""
+
+    def __init__(self, capacity: int = VENUE_CATALOG_SIZE):
+        self.capacity = capacity
+        self._items: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get_many(self, ids: List[str]) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """(payloads found, ids missing)"""
+        found: Dict[str, Dict[str, Any]] = {}
+        missing: List[str] = []
+        with self._lock:
+            for venue_id in ids:
+                payload = self._items.get(venue_id)
+                if payload is None:
+                    missing.append(venue_id)
+                else:
+                    self._items.move_to_end(venue_id)
+                    found[venue_id] = payload
+        return found, missing
+
+    def put_many(self, payloads: Dict[str, Dict[str, Any]]):
+        with self._lock:
+            for venue_id, payload in payloads.items():
+                self._items[venue_id] = payload
+                self._items.move_to_end(venue_id)
+            while len(self._items) > self.capacity:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+# One catalog per process: venue payloads are the same whichever shard a session lives in
+VENUE_CATALOG = VenueCatalog()
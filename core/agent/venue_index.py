@@ -0,0 +1,181 @@
+"""
+Local index of every venue payload the VPS has returned, for follow-up questions.
+
+"Which of those has parking?" or "where is the second one?" are answered from the payloads
+the user was already shown (`name`, `location`, `type`, `amenities`) instead of another
+recommendation call:
+
+- an inverted index maps amenity / type / location tokens to venue ids, over every payload
+  seen by this process (bounded, oldest venues evicted first);
+- the venues a session was shown always come from its stored recommendations in the chat DB
+  (the caller passes them in, in display order). The index is only a cache over their
+  payloads: a venue whose payload changed is re-indexed, so a new recommendation or another
+  worker's write is never answered from stale data.
+
+answer() resolves which shown venue(s) a question is about (an explicit selection phrase,
+id or name via the venue resolver, otherwise the whole shortlist, filtered by indexed terms
+such as "parking"), which attribute it asks for, and renders the reply from templates. It
+returns None when the question cannot be answered from the index; the caller then lets the
+final-response LLM answer from the same payloads.
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set
+
+from core.agent.config import (
+    VENUE_INDEX_MAX_VENUES,
+    VENUE_RESOLVER_MIN_CONFIDENCE,
+)
+from core.agent.templates import field_text, get_templates, join_items, render_response, render_venue_item
+from core.agent.venue_catalog import venue_key
+from core.agent.venue_resolver import SELECTION_PATHS, TOKEN_PATTERN, resolve_venue_selection
+from core.metrics import VENUE_DETAIL_ANSWERS
+
+INDEXED_FIELDS = ("amenities", "type", "location")
+
+
+def _stem(token: str) -> str:
+    # "parkings" / "pools" / "ballrooms" -> same postings as the singular
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    return [_stem(token) for token in TOKEN_PATTERN.findall((text or "").lower())]
+
+
+# Words that ask for one attribute ("where is the second one?")
+ATTRIBUTE_WORDS = {
+    "location": {"where", "location", "located", "address", "area", "city", "lokasi", "dimana", "alamat", "daerah"},
+    "type": {"type", "kind", "category", "tipe", "jenis"},
+    "amenities": {"amenities", "amenity", "facilities", "facility", "features", "fasilitas"},
+}
+ATTRIBUTE_BY_TOKEN = {_stem(word): attribute for attribute, words in ATTRIBUTE_WORDS.items() for word in words}
+
+# Never filter terms, even when a payload happens to contain them
+STOPWORDS = {_stem(word) for word in (
+    "a", "an", "the", "of", "in", "at", "on", "to", "for", "and", "or", "with", "without", "is", "are", "it",
+    "they", "them", "that", "this", "these", "those", "which", "what", "who", "one", "ones", "any", "has",
+    "have", "does", "do", "there", "venue", "venues", "place", "also", "all", "both", "please", "me", "i",
+    "yang", "mana", "ada", "punya", "dengan", "di", "itu", "ini", "apakah", "dan", "atau", "saja",
+)}
+
+
+class VenueIndex:
+    def __init__(self, max_venues: int = VENUE_INDEX_MAX_VENUES):
+        self.max_venues = max_venues
+        self._payloads: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._postings: Dict[str, Dict[str, Set[str]]] = {field: {} for field in INDEXED_FIELDS}
+
+    def __len__(self) -> int:
+        return len(self._payloads)
+
+    # --- indexing ---
+    def _unindex(self, venue_id: str):
+        payload = self._payloads.pop(venue_id)
+        for field in INDEXED_FIELDS:
+            postings = self._postings[field]
+            for token in set(tokenize(field_text(payload, field))):
+                ids = postings.get(token)
+                if ids is not None:
+                    ids.discard(venue_id)
+                    if not ids:
+                        del postings[token]
+
+    def add(self, venues: List[Dict[str, Any]]):
+        """Index the payloads of `top_k_venues` entries (re-indexed when a payload changed)."""
+        for venue in venues:
+            venue_id = venue_key(venue)
+            if venue_id is None:
+                continue
+            payload = venue["payload"]
+            if venue_id in self._payloads:
+                if self._payloads[venue_id] == payload:
+                    self._payloads.move_to_end(venue_id)
+                    continue
+                self._unindex(venue_id)
+            self._payloads[venue_id] = payload
+            for field in INDEXED_FIELDS:
+                for token in set(tokenize(field_text(payload, field))):
+                    self._postings[field].setdefault(token, set()).add(venue_id)
+        while len(self._payloads) > self.max_venues:
+            self._unindex(next(iter(self._payloads)))
+
+    def matching(self, term: str) -> Set[str]:
+        """Ids of indexed venues with `term` in any indexed field."""
+        ids: Set[str] = set()
+        for field in INDEXED_FIELDS:
+            ids |= self._postings[field].get(term, set())
+        return ids
+
+    # --- answering ---
+    def answer(self, text: str, venues: List[Dict[str, Any]], locale: Optional[str] = None) -> Optional[str]:
+        """Templated answer to a detail question about `venues` (as shown), None if the index can't tell."""
+        if not venues:
+            return None
+        self.add(venues)
+        tokens = tokenize(text)
+        attributes = []
+        for token in tokens:
+            attribute = ATTRIBUTE_BY_TOKEN.get(token)
+            if attribute and attribute not in attributes:
+                attributes.append(attribute)
+        # terms any venue seen so far has: "pool" is a known amenity even if none of these has one
+        terms = []
+        for token in tokens:
+            if token not in STOPWORDS and token not in ATTRIBUTE_BY_TOKEN and token not in terms and self.matching(token):
+                terms.append(token)
+
+        templates = get_templates(locale)
+        numbered = list(enumerate(venues, start=1))
+        # narrow to one venue only on an explicit selection ("the second one", "venue 104", a name);
+        # anything else ("where is it, we arrive on the 2nd") is answered across the whole shortlist
+        resolution = resolve_venue_selection(text, venues)
+        if resolution.path in SELECTION_PATHS and resolution.confidence >= VENUE_RESOLVER_MIN_CONFIDENCE:
+            numbered = [(resolution.index, resolution.venue)]
+        elif not terms and not attributes:
+            VENUE_DETAIL_ANSWERS.inc(path="fallback")
+            return None
+
+        if terms:
+            matched = [(index, venue) for index, venue in numbered if self._has_terms(venue, terms)]
+            terms_text = join_items(terms, locale)
+            if len(numbered) == 1:
+                index, venue = numbered[0]
+                header_key = "venue_detail_has" if matched else "venue_detail_has_not"
+                header = templates[header_key].format(name=self._name(venue, templates), terms=terms_text)
+                VENUE_DETAIL_ANSWERS.inc(path="has")
+                return render_response(header, render_venue_item(index, venue.get("payload", {}), locale), templates["venue_detail_footer"])
+            VENUE_DETAIL_ANSWERS.inc(path="filter")
+            if not matched:
+                return render_response(templates["venue_filter_none"].format(terms=terms_text), "", templates["venue_detail_footer"])
+            header_key = "venue_filter_header_one" if len(matched) == 1 else "venue_filter_header_many"
+            content = "\n".join(
+                templates["venue_filter_item"].format(index=index, name=self._name(venue, templates))
+                for index, venue in matched
+            )
+            return render_response(templates[header_key].format(terms=terms_text), content, templates["venue_detail_footer"])
+
+        attributes = attributes or list(INDEXED_FIELDS)
+        lines = []
+        for index, venue in numbered:
+            payload = venue.get("payload", {})
+            details = "\n".join(
+                f"   {templates[f'label_{attribute}']}: {field_text(payload, attribute) or templates['venue_missing_value']}"
+                for attribute in attributes
+            )
+            lines.append(f"{index}. *{self._name(venue, templates)}*\n{details}")
+        VENUE_DETAIL_ANSWERS.inc(path="attribute")
+        return render_response("", "\n\n".join(lines), templates["venue_detail_footer"])
+
+    def _has_terms(self, venue: Dict[str, Any], terms: List[str]) -> bool:
+        venue_id = venue_key(venue)
+        return venue_id is not None and all(venue_id in self.matching(term) for term in terms)
+
+    @staticmethod
+    def _name(venue: Dict[str, Any], templates: Dict[str, str]) -> str:
+        return venue.get("payload", {}).get("name") or templates["venue_unknown_name"]
+
+
+VENUE_INDEX = VenueIndex()
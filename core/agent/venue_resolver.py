@@ -0,0 +1,190 @@
+"""
+Deterministic venue-selection resolver.
+
+Works out which of the stored venue recommendations the user means ("book 2", "the second one",
+a venue name or its numeric id) without calling the LLM. Every candidate gets a confidence score;
+callers fall back to get_confirm_booking only when the best match is weak or ambiguous.
+
+Numbers and ordinal words only count inside a selection phrase ("book 2", "venue 104", "the
+second one", "yang kedua", or a message that is nothing but "2" / "second"), so dates, guest
+counts and figures of speech ("the 3rd of May", "104 guests", "last week", "second thoughts")
+never pick a venue.
+"""
+
+import re
+from collections import Counter
+from difflib import SequenceMatcher
+from typing import Optional, Dict, Any, List
+
+from core.agent.config import (
+    VENUE_RESOLVER_AMBIGUITY_MARGIN,
+)
+from core.metrics import VENUE_RESOLUTIONS
+
+ORDINAL_WORDS = {
+    "first": 1, "second": 2, "third": 3, "fourth": 4, "fifth": 5,
+    "sixth": 6, "seventh": 7, "eighth": 8, "ninth": 9, "tenth": 10,
+    "1st": 1, "2nd": 2, "3rd": 3, "4th": 4, "5th": 5,
+    "pertama": 1, "kedua": 2, "ketiga": 3, "keempat": 4, "kelima": 5,
+}
+LAST_WORDS = {"last", "terakhir"}
+_ORDINAL = "|".join(sorted((re.escape(word) for word in [*ORDINAL_WORDS, *LAST_WORDS]), key=len, reverse=True))
+
+# "book 2", "number 2", "option #2", "venue no. 2", "venue 104", "pilih 2", "#2", or just "2"
+NUMBER_SELECTION_PATTERN = re.compile(
+    r"\b(?:book|booking|number|num|no\.?|option|choice|venue|id|pick|choose|select|pilih|nomor)\s*#?\s*(\d{1,6})\b"
+    r"|#\s*(\d{1,6})\b"
+    r"|^\s*#?\s*(\d{1,6})\s*[.!]?\s*$",
+    re.IGNORECASE,
+)
+# "the second one", "2nd venue", "book the last", "go with the first", "yang kedua", or just "second"
+ORDINAL_SELECTION_PATTERN = re.compile(
+    rf"\b({_ORDINAL})\s+(?:one|venue|option|choice|place)\b"
+    rf"|\b(?:book|pick|choose|select|take|prefer|go\s+with|yang|nomor|pilih|pilihan)\s+(?:the\s+)?({_ORDINAL})\b"
+    rf"|^\s*(?:the\s+)?({_ORDINAL})(?:\s+(?:one|please))?\s*[.!]?\s*$",
+    re.IGNORECASE,
+)
+TOKEN_PATTERN = re.compile(r"[^\W_]+(?:[-'][^\W_]+)*", re.UNICODE)
+
+# Resolution path counters, e.g. {"ordinal": 12, "name": 4, "llm_fallback": 2}
+RESOLUTION_COUNTERS: Counter = Counter()
+
+# Paths that name one venue explicitly (a selection phrase, a venue id or the venue's name)
+SELECTION_PATHS = frozenset({"ordinal", "id", "name"})
+
+
+class VenueResolution:
+    def __init__(self, venue: Optional[Dict[str, Any]], index: Optional[int], confidence: float, path: str):
+        self.venue = venue  # the stored venue entry ({"payload": {...}, ...})
+        self.index = index  # 1-based position in the stored list
+        self.confidence = confidence
+        self.path = path  # "ordinal" | "id" | "name" | "ambiguous" | "none"
+
+    @property
+    def venue_name(self) -> str:
+        return (self.venue or {}).get("payload", {}).get("name") or ""
+
+    @property
+    def venue_id(self) -> str:
+        venue_id = (self.venue or {}).get("payload", {}).get("id")
+        return str(venue_id) if venue_id is not None else ""
+
+    def __repr__(self):
+        return f"VenueResolution(index={self.index}, path={self.path}, confidence={self.confidence:.2f})"
+
+
+def _normalize(text: str) -> str:
+    return " ".join(TOKEN_PATTERN.findall((text or "").lower()))
+
+
+def _selected_numbers(text: str) -> List[str]:
+    """Numbers inside a selection phrase, as written (positions or venue ids)."""
+    return [next(group for group in match.groups() if group) for match in NUMBER_SELECTION_PATTERN.finditer(text)]
+
+
+def _ordinal_scores(text: str, count: int) -> Dict[int, float]:
+    scores: Dict[int, float] = {}
+    for number in map(int, _selected_numbers(text)):
+        if 1 <= number <= count:
+            scores[number] = 0.95
+    for match in ORDINAL_SELECTION_PATTERN.finditer(text):
+        word = next(group for group in match.groups() if group).lower()
+        if word in LAST_WORDS:
+            if count:
+                scores[count] = max(scores.get(count, 0.0), 0.85)
+        elif ORDINAL_WORDS[word] <= count:
+            scores[ORDINAL_WORDS[word]] = max(scores.get(ORDINAL_WORDS[word], 0.0), 0.9)
+    return scores
+
+
+def _id_scores(text: str, venues: List[Dict[str, Any]]) -> Dict[int, float]:
+    numbers = set(_selected_numbers(text))
+    scores: Dict[int, float] = {}
+    for idx, venue in enumerate(venues, start=1):
+        venue_id = venue.get("payload", {}).get("id")
+        if venue_id is not None and str(venue_id) in numbers:
+            scores[idx] = 0.97
+    return scores
+
+
+def _name_scores(text: str, venues: List[Dict[str, Any]]) -> Dict[int, float]:
+    text_norm = _normalize(text)
+    text_tokens = text_norm.split()
+    scores: Dict[int, float] = {}
+    if not text_tokens:
+        return scores
+    for idx, venue in enumerate(venues, start=1):
+        name_norm = _normalize(venue.get("payload", {}).get("name", ""))
+        if not name_norm:
+            continue
+        if f" {name_norm} " in f" {text_norm} ":
+            scores[idx] = 0.95
+            continue
+        # best fuzzy match of the name against same-length windows of the message
+        width = len(name_norm.split())
+        best = 0.0
+        for start in range(max(1, len(text_tokens) - width + 1)):
+            window = " ".join(text_tokens[start:start + width])
+            best = max(best, SequenceMatcher(None, name_norm, window).ratio())
+        if best >= 0.6:
+            scores[idx] = round(best * 0.9, 3)
+    return scores
+
+
+def resolve_venue_selection(text: str, venues: List[Dict[str, Any]]) -> VenueResolution:
+    """
+    Rank stored venues against a user message by ordinal, venue id and fuzzy name similarity.
+
+    Args:
+        text: the user message, e.g. "book 2" or "I'll take the garden one in Ubud"
+        venues: stored `top_k_venues` entries, in the order they were shown to the user
+
+    Returns:
+        VenueResolution with the best candidate. When two different venues score within
+        VENUE_RESOLVER_AMBIGUITY_MARGIN of each other the path is "ambiguous" and the
+        confidence is capped so callers fall back to the LLM.
+    """
+    if not text or not venues:
+        return VenueResolution(None, None, 0.0, "none")
+
+    candidates: Dict[int, tuple] = {}
+    for path, scores in (
+        ("id", _id_scores(text, venues)),
+        ("ordinal", _ordinal_scores(text, len(venues))),
+        ("name", _name_scores(text, venues)),
+    ):
+        for idx, score in scores.items():
+            if score > candidates.get(idx, (0.0, ""))[0]:
+                candidates[idx] = (score, path)
+
+    if not candidates:
+        return VenueResolution(None, None, 0.0, "none")
+
+    ranked = sorted(candidates.items(), key=lambda item: item[1][0], reverse=True)
+    best_idx, (best_score, best_path) = ranked[0]
+    if len(ranked) > 1 and best_score - ranked[1][1][0] < VENUE_RESOLVER_AMBIGUITY_MARGIN:
+        return VenueResolution(venues[best_idx - 1], best_idx, min(best_score, 0.5), "ambiguous")
+    return VenueResolution(venues[best_idx - 1], best_idx, best_score, best_path)
+
+
+def resolve_from_messages(texts: List[str], venues: List[Dict[str, Any]]) -> VenueResolution:
+    """
+    Resolve against recent user messages (newest first). The newest message that selects
+    anything decides: older messages are never searched past it, so a weak or ambiguous
+    newest selection goes to the LLM instead of an older, stale one.
+    """
+    for text in texts:
+        resolution = resolve_venue_selection(text, venues)
+        if resolution.path != "none":
+            return resolution
+    return VenueResolution(None, None, 0.0, "none")
+
+
+def record_resolution(path: str):
+    RESOLUTION_COUNTERS[path] += 1
+    VENUE_RESOLUTIONS.inc(path=path)
+
+
+def get_resolution_stats() -> Dict[str, int]:
+    """Resolution-path counters since process start."""
+    return dict(RESOLUTION_COUNTERS)
@@ -0,0 +1,51 @@
+import time
+from typing import Optional
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a turn has no time budget left for the next network call."""
+
+
+class Deadline:
+    """
+    Overall time budget for one conversation turn.
+
+    Created once per incoming message and passed down to every LLM / VPS call, which use
+    `timeout()` as their own timeout so the whole turn finishes within the budget.
+    """
+
+    def __init__(self, seconds: float):
+        self.budget = seconds
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + seconds
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def has_budget(self, seconds: float) -> bool:
+        """True if at least `seconds` remain (used to skip optional stages)."""
+        return self.remaining() >= seconds
+
+    def timeout(self, cap: Optional[float] = None) -> float:
+        """Remaining budget as a call timeout, optionally capped. Raises DeadlineExceeded if none left."""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"turn deadline of {self.budget}s exceeded")
+        return min(remaining, cap) if cap is not None else remaining
+
+    def __repr__(self):
+        return f"Deadline(budget={self.budget}, remaining={self.remaining():.2f})"
+
+
+def deadline_timeout(deadline: Optional[Deadline], default: Optional[float] = None) -> Optional[float]:
+    """Timeout for a call: the remaining turn budget (capped by `default`), or `default` without a deadline."""
+    if deadline is None:
+        return default
+    return deadline.timeout(cap=default)
@@ -1,5 +1,27 @@
-import logging
 import sys
+import json
+import queue
+import atexit
+import logging
+import reprlib
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Optional
+
+from core.settings import settings
+
+# Logging Configuration
+LOG_LEVEL = settings.log_level
+LOG_MODE = settings.log_mode  # "queue": stdout is written by a background thread, "sync": inline
+LOG_FORMAT = settings.log_format  # "text" | "json"
+LOG_COLOR = settings.log_color  # "auto" (only on a TTY) | "always" | "never"
+LOG_MAX_PAYLOAD_CHARS = settings.log_max_payload_chars
+LOG_QUEUE_SIZE = settings.log_queue_size  # records beyond this are dropped, never blocking
+
+# Trace id of the conversation turn being handled, added to every log line
+_trace_id: ContextVar[str] = ContextVar("trace_id", default="-")
 
 # ANSI escape codes for colors
 COLOR_CODES = {
@@ -11,29 +33,187 @@ COLOR_CODES = {
     'RESET': '\033[0m'       # Reset to default
 }
 
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - %(service_prefix)s%(filename)s - [%(trace_id)s] %(message)s"
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+def set_trace_id(trace_id: Optional[str] = None) -> str:
+    """Set the trace id for the current task (and tasks it creates). Returns the id."""
+    trace_id = trace_id or new_trace_id()
+    _trace_id.set(trace_id)
+    return trace_id
+
+def get_trace_id() -> str:
+    return _trace_id.get()
+
+class TraceIdFilter(logging.Filter):
+    def filter(self, record):
+        record.trace_id = _trace_id.get()
+        return True
+
+class ServiceFilter(logging.Filter):
+    """Tags records with the logger's service (e.g. "LLM"), used by both formatters."""
+    def __init__(self, service: Optional[str] = None):
+        super().__init__()
+        self.service = service
+        self.prefix = f"[{service}] " if service else ""
+
+    def filter(self, record):
+        record.service = self.service
+        record.service_prefix = self.prefix
+        return True
+
+# -----------------------------
+# Payload rendering
+# -----------------------------
+_payload_repr = reprlib.Repr()
+_payload_repr.maxlevel = 4
+_payload_repr.maxdict = 20
+_payload_repr.maxlist = 10
+_payload_repr.maxtuple = 10
+_payload_repr.maxset = 10
+_payload_repr.maxstring = LOG_MAX_PAYLOAD_CHARS
+_payload_repr.maxother = LOG_MAX_PAYLOAD_CHARS
+
+class truncated:
+    """
+    Lazily rendered, size-capped log argument for large payloads:
+
+        logger.info("Venue Recommendation: %s", truncated(response_json))
+
+    Nothing is rendered unless the record is actually emitted. Containers are sampled
+    (first items of long lists/dicts, limited nesting) and the result is cut at
+    LOG_MAX_PAYLOAD_CHARS.
+    """
+    __slots__ = ("value", "limit")
+
+    def __init__(self, value: Any, limit: Optional[int] = None):
+        self.value = value
+        self.limit = limit or LOG_MAX_PAYLOAD_CHARS
+
+    def __str__(self):
+        if isinstance(self.value, str):
+            text = self.value
+        elif isinstance(self.value, (dict, list, tuple, set)):
+            text = _payload_repr.repr(self.value)
+        else:
+            text = str(self.value)
+        if len(text) <= self.limit:
+            return text
+        return f"{text[:self.limit]}…(+{len(text) - self.limit} chars)"
+
+    __repr__ = __str__
+
+# -----------------------------
+# Formatters
+# -----------------------------
 class ColorFormatter(logging.Formatter):
+    """Colours the message by level without touching the shared record."""
     def format(self, record):
         log_color = COLOR_CODES.get(record.levelname, '')
         reset = COLOR_CODES['RESET']
-        record.msg = f"{log_color}{record.msg}{reset}"
-        return super().format(record)
+        colored = logging.makeLogRecord(record.__dict__)
+        colored.msg = f"{log_color}{record.getMessage()}{reset}"
+        colored.args = None
+        return super().format(colored)
 
-def get_logger(name=__name__, service: str = None):
-    logger = logging.getLogger(name)
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers."""
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "service": getattr(record, "service", None),
+            "file": record.filename,
+            "line": record.lineno,
+            "trace_id": getattr(record, "trace_id", "-"),
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
 
-    if not logger.hasHandlers():
-        logger.setLevel(logging.INFO)
+def _use_color(stream) -> bool:
+    if LOG_COLOR == "always":
+        return True
+    if LOG_COLOR == "never":
+        return False
+    return hasattr(stream, "isatty") and stream.isatty()
+
+# -----------------------------
+# Handlers
+# -----------------------------
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Hands records to the background listener. The message is rendered here (arguments may
+    be mutated after the call) but all formatting and I/O happens on the listener thread.
+    When the queue is full the record is dropped instead of blocking the event loop.
+    """
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
 
-        handler = logging.StreamHandler(sys.stdout)
-        handler.setLevel(logging.INFO)
+    def prepare(self, record):
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
 
-        # Include service in format if provided
-        service_fmt = f"[{service}] " if service else ""
-        formatter = ColorFormatter(
-            f"%(asctime)s - %(levelname)s - {service_fmt}%(filename)s - %(message)s"
-        )
-        handler.setFormatter(formatter)
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
 
-        logger.addHandler(handler)
+_handler: Optional[logging.Handler] = None
+_listener: Optional[QueueListener] = None
+
+def _build_stream_handler() -> logging.Handler:
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    elif _use_color(sys.stdout):
+        stream_handler.setFormatter(ColorFormatter(TEXT_FORMAT))
+    else:
+        stream_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    return stream_handler
+
+def _get_handler() -> logging.Handler:
+    """The process-wide handler every get_logger() logger writes to."""
+    global _handler, _listener
+    if _handler is None:
+        stream_handler = _build_stream_handler()
+        if LOG_MODE == "queue":
+            _handler = NonBlockingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+            _listener = QueueListener(_handler.queue, stream_handler, respect_handler_level=True)
+            _listener.start()
+            atexit.register(stop_logging)
+        else:
+            _handler = stream_handler
+    return _handler
+
+def stop_logging():
+    """Flush and stop the background listener (no-op in sync mode)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def get_logger(name=__name__, service: str = None):
+    logger = logging.getLogger(name)
+
+    if not logger.hasHandlers():
+        logger.setLevel(LOG_LEVEL)
+        # filters run on the calling task, so the trace id is captured before queueing
+        logger.addFilter(TraceIdFilter())
+        logger.addFilter(ServiceFilter(service))
+        logger.addHandler(_get_handler())
 
-    return logger
\ No newline at end of file
+    return logger
@@ -0,0 +1,211 @@
+"""
+Minimal in-process metrics with Prometheus text exposition.
+
+Counters, gauges and histograms with labels, registered in a module-level registry and
+rendered by render_prometheus() for the /metrics endpoint. No external dependency; all
+updates happen on the event loop thread so no locking is needed.
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15, 30, 60)
+
+_REGISTRY: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        _REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in self._values.items()
+        ]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function: Optional[Callable[[], Iterable[Tuple[Dict[str, str], float]]]] = None
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def set_function(self, fn: Callable[[], Iterable[Tuple[Dict[str, str], float]]]):
+        """Compute the gauge at scrape time; `fn` yields (labels, value) pairs."""
+        self._function = fn
+
+    def _samples(self) -> List[str]:
+        values = dict(self._values)
+        if self._function is not None:
+            for labels, value in self._function():
+                values[self._key(labels)] = value
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in values.items()
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._counts: Dict[Tuple[str, ...], List[int]] = {}
+        self._sums: Dict[Tuple[str, ...], float] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        counts = self._counts.get(key)
+        if counts is None:
+            counts = self._counts[key] = [0] * len(self.buckets)
+            self._sums[key] = 0.0
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        self._sums[key] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the `with` block (also when it raises)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def get_count(self, **labels) -> int:
+        return sum(self._counts.get(self._key(labels), ()))
+
+    def get_sum(self, **labels) -> float:
+        return self._sums.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, counts in self._counts.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(self._sums[key])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+def render_prometheus() -> str:
+    """All registered metrics in Prometheus text exposition format (version 0.0.4)."""
+    return "\n".join(metric.render() for metric in _REGISTRY) + "\n"
+
+
+# -----------------------------
+# Application metrics
+# -----------------------------
+TURN_SECONDS = Histogram("wa_bot_turn_seconds", "End-to-end latency of one conversation turn", ["outcome"])
+STAGE_SECONDS = Histogram("wa_bot_stage_seconds", "Latency of each named chat_response stage", ["stage"])
+TURNS_IN_FLIGHT = Gauge("wa_bot_turns_in_flight", "Conversation turns currently being processed")
+ADMISSION_QUEUE_DEPTH = Gauge("wa_bot_admission_queue_depth", "Turns waiting for an admission slot")
+ADMISSION_WAIT_SECONDS = Histogram("wa_bot_admission_wait_seconds", "Time a turn waited for an admission slot", ["priority"])
+TURNS_SHED = Counter("wa_bot_turns_shed_total", "Turns refused by admission control", ["priority", "reason"])
+
+LLM_REQUEST_SECONDS = Histogram("wa_bot_llm_request_seconds", "OpenAI chat completion latency (excluding queueing)", ["model"])
+LLM_QUEUE_WAIT_SECONDS = Histogram("wa_bot_llm_queue_wait_seconds", "Time spent queued in the OpenAI governor", ["model"])
+LLM_REQUESTS = Counter("wa_bot_llm_requests_total", "OpenAI chat completion calls", ["model", "outcome"])
+LLM_TOKENS = Counter("wa_bot_llm_tokens_total", "OpenAI tokens used", ["model", "kind"])
+LLM_QUEUE_DEPTH = Gauge("wa_bot_llm_queue_depth", "Calls waiting in the OpenAI governor", ["model"])
+LLM_IN_FLIGHT = Gauge("wa_bot_llm_in_flight", "OpenAI calls currently in flight")
+
+CACHE_REQUESTS = Counter("wa_bot_cache_requests_total", "Cache lookups", ["cache", "result"])
+VENUE_RESOLUTIONS = Counter("wa_bot_venue_resolutions_total", "Booking venue selections by resolution path", ["path"])
+VENUE_DETAIL_ANSWERS = Counter("wa_bot_venue_detail_answers_total", "Venue detail questions by how the local index answered", ["path"])
+
+DB_OP_SECONDS = Histogram("wa_bot_db_op_seconds", "ChatDB operation latency split into queue wait and execution", ["op", "phase"])
+DB_QUEUE_DEPTH = Gauge("wa_bot_db_queue_depth", "ChatDB operations queued or running on the DB threads")
+SESSION_ENTRIES = Gauge("wa_bot_session_entries", "Session entries held in memory by SessionManager")
+SESSIONS_EVICTED = Counter("wa_bot_sessions_evicted_total", "Session entries dropped from memory (the session stays in the DB)", ["reason"])
+SESSIONS_EXPIRED = Counter("wa_bot_sessions_expired_total", "Abandoned idle sessions ended by the SessionManager sweep")
+RETENTION_SESSIONS = Counter("wa_bot_retention_sessions_total", "Sessions moved by the retention job", ["action"])
+
+VPS_REQUEST_SECONDS = Histogram("wa_bot_vps_request_seconds", "VPS recommendation/booking API latency", ["endpoint"])
+WEBHOOK_EVENTS = Counter("wa_bot_webhook_events_total", "Webhook events received, by event type and what ingress did with them", ["event", "outcome"])
+OPEN_WA_REQUEST_SECONDS = Histogram("wa_bot_open_wa_request_seconds", "open-wa REST API latency", ["method"])
+
+DISPATCH_SECONDS = Histogram("wa_bot_dispatch_seconds", "Webhook forwarding latency to the owning worker", ["worker"])
+DISPATCH_ERRORS = Counter("wa_bot_dispatch_errors_total", "Webhooks the owning worker could not take", ["worker"])
+STARTUP_SECONDS = Gauge("wa_bot_startup_seconds", "Time spent in each startup phase of this process", ["phase"])
+WORKER_RESTARTS = Counter("wa_bot_worker_restarts_total", "Dispatcher worker processes restarted after exiting", ["worker"])
+
+
+@contextmanager
+def track_stage(stage: str):
+    """Record the duration of a chat_response stage."""
+    with STAGE_SECONDS.time(stage=stage):
+        yield
@@ -1,38 +1,384 @@
-import os
 import json
-from typing import List
+import time
+import heapq
+import random
+import asyncio
+import itertools
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, List, Dict, Optional, Tuple
 
-from dotenv import load_dotenv
+from core.deadline import Deadline, DeadlineExceeded
+from core.logger import get_logger
+from core.settings import settings
+from core.metrics import (
+    LLM_REQUEST_SECONDS,
+    LLM_QUEUE_WAIT_SECONDS,
+    LLM_REQUESTS,
+    LLM_TOKENS,
+    LLM_QUEUE_DEPTH,
+    LLM_IN_FLIGHT,
+    CACHE_REQUESTS,
+)
 
-from openai import AsyncOpenAI
-from openai.types.chat import ChatCompletionMessageParam
+# The SDK costs ~0.4s to import; it is loaded by create_client(), off the startup path
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, RateLimitError
+    from openai.types.chat import ChatCompletionMessageParam
 
-load_dotenv(override=True)
+logger = get_logger(__name__, service="OpenAI")
 
-def create_client():
-    openai_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# -----------------------------
+# Governor configuration
+# -----------------------------
+# Lower value = served first when calls are queued
+PRIORITY_INTERACTIVE = 0  # a user is waiting for the turn
+PRIORITY_BACKGROUND = 10  # nobody waits (e.g. requirements extraction a short turn skipped)
+
+OPENAI_MAX_CONCURRENCY = settings.openai_max_concurrency
+OPENAI_MAX_RETRIES = settings.openai_max_retries
+OPENAI_COMPLETION_TOKEN_ESTIMATE = settings.openai_completion_token_estimate
+
+# Per-model (requests per minute, tokens per minute).
+# Override with e.g. OPENAI_RATE_LIMITS='{"gpt-4.1": [500, 30000]}'
+MODEL_RATE_LIMITS: Dict[str, Tuple[int, int]] = {
+    "gpt-4.1": (500, 30000),
+    "gpt-4.1-mini": (500, 200000),
+    "gpt-4.1-nano": (500, 200000),
+}
+MODEL_RATE_LIMITS.update(settings.openai_rate_limits)
+DEFAULT_RATE_LIMIT = (settings.openai_default_rpm, settings.openai_default_tpm)
+
+
+def create_client() -> "AsyncOpenAI":
+    from openai import AsyncOpenAI
+
+    # Retries are handled by the governor in chat_completion so 429s honor Retry-After
+    # for every queued call, not just the one that hit the limit.
+    openai_client = AsyncOpenAI(api_key=settings.openai_api_key, base_url=settings.openai_base_url, max_retries=0)
     return openai_client
 
 
+# -----------------------------
+# Rate limiting / concurrency governor
+# -----------------------------
+
+class _TokenBucket:
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay_for(self, amount: float, now: float) -> float:
+        """Seconds until `amount` is available (0 if available now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float, now: float):
+        # May go negative when reconciling an underestimate; refill pays it back
+        self._refill(now)
+        self.tokens -= amount
+
+
+class _ModelLimiter:
+    def __init__(self, rpm: int, tpm: int):
+        self.requests = _TokenBucket(rpm)
+        self.tokens = _TokenBucket(tpm)
+        self.paused_until = 0.0
+        self.rate_limited = 0
+
+    def delay_for(self, estimated_tokens: int, now: float) -> float:
+        return max(
+            self.paused_until - now,
+            self.requests.delay_for(1, now),
+            self.tokens.delay_for(estimated_tokens, now),
+            0.0,
+        )
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "model", "tokens", "event")
+
+    def __init__(self, priority: int, seq: int, model: str, tokens: int):
+        self.priority = priority
+        self.seq = seq
+        self.model = model
+        self.tokens = tokens
+        self.event = asyncio.Event()
+
+    def __lt__(self, other: "_Waiter"):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class OpenAIGovernor:
+    """
+    Process-wide gate in front of every chat completion.
+
+    - caps in-flight calls (OPENAI_MAX_CONCURRENCY)
+    - per-model token buckets for requests/minute and estimated tokens/minute
+    - queued calls are served by (priority, arrival), so interactive turns overtake background work;
+      a release wakes only the call that gets the slot
+    - a 429 pauses the whole model for its Retry-After instead of letting every caller hit it
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = OPENAI_MAX_CONCURRENCY,
+        rate_limits: Optional[Dict[str, Tuple[int, int]]] = None,
+        default_rate_limit: Tuple[int, int] = DEFAULT_RATE_LIMIT,
+        wait_samples: int = 1000,
+    ):
+        self.max_concurrency = max_concurrency
+        self.rate_limits = rate_limits if rate_limits is not None else MODEL_RATE_LIMITS
+        self.default_rate_limit = default_rate_limit
+        self._limiters: Dict[str, _ModelLimiter] = {}
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._wait_samples = wait_samples
+        self._waits: Dict[Tuple[str, int], deque] = {}
+        self._wait_totals: Dict[Tuple[str, int], List[float]] = {}  # [count, total, max]
+
+    def _limiter(self, model: str) -> _ModelLimiter:
+        limiter = self._limiters.get(model)
+        if limiter is None:
+            rpm, tpm = self.rate_limits.get(model, self.default_rate_limit)
+            limiter = _ModelLimiter(rpm, tpm)
+            self._limiters[model] = limiter
+        return limiter
+
+    def _delay(self, waiter: _Waiter, now: float) -> Optional[float]:
+        """0 = start now, >0 = re-check after that many seconds, None = wait for a release."""
+        if self._in_flight >= self.max_concurrency:
+            return None
+        own_delay = self._limiter(waiter.model).delay_for(waiter.tokens, now)
+        for other in self._waiters:
+            if other is waiter or not other < waiter:
+                continue
+            if other.model == waiter.model:
+                # FIFO within a model: never overtake an earlier/higher-priority call for the same budget
+                return own_delay or None
+            if self._limiter(other.model).delay_for(other.tokens, now) == 0:
+                # a better-ranked call is ready to run, it gets the free slot first
+                return None
+        return own_delay
+
+    def _notify(self):
+        """Wake the best-ranked waiter that can start now; the others stay asleep (or on their own timers)."""
+        if not self._waiters or self._in_flight >= self.max_concurrency:
+            return
+        now = time.monotonic()
+        head = self._waiters[0]
+        if self._delay(head, now) == 0:
+            head.event.set()
+            return
+        # the head is held by its model's budget: the next-ranked call for another model may run
+        for waiter in sorted(self._waiters)[1:]:
+            if self._delay(waiter, now) == 0:
+                waiter.event.set()
+                return
+
+    def _remove(self, waiter: _Waiter):
+        try:
+            self._waiters.remove(waiter)
+            heapq.heapify(self._waiters)
+        except ValueError:
+            pass
+
+    async def acquire(self, model: str, estimated_tokens: int, priority: int = PRIORITY_INTERACTIVE) -> float:
+        """Wait for a slot and budget for `model`. Returns the seconds spent queued."""
+        waiter = _Waiter(priority, next(self._seq), model, estimated_tokens)
+        heapq.heappush(self._waiters, waiter)
+        enqueued_at = time.monotonic()
+        try:
+            while True:
+                waiter.event.clear()
+                delay = self._delay(waiter, time.monotonic())
+                if delay == 0:
+                    break
+                try:
+                    await asyncio.wait_for(waiter.event.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            # gave up (deadline / cancelled): the call behind it may be able to start now
+            self._remove(waiter)
+            self._notify()
+            raise
+
+        self._remove(waiter)
+        now = time.monotonic()
+        limiter = self._limiter(model)
+        limiter.requests.consume(1, now)
+        limiter.tokens.consume(estimated_tokens, now)
+        self._in_flight += 1
+        # the queue head changed: if a slot is still free, hand it to the next call
+        self._notify()
+        waited = now - enqueued_at
+        self._record_wait(model, priority, waited)
+        return waited
+
+    def release(self):
+        self._in_flight -= 1
+        self._notify()
+
+    def reconcile(self, model: str, estimated_tokens: int, actual_tokens: Optional[int]):
+        """Correct the token bucket once the real usage is known."""
+        if actual_tokens is None:
+            return
+        self._limiter(model).tokens.consume(actual_tokens - estimated_tokens, time.monotonic())
+
+    def pause(self, model: str, seconds: float):
+        """Hold every call to `model` for `seconds` (used for Retry-After)."""
+        limiter = self._limiter(model)
+        limiter.paused_until = max(limiter.paused_until, time.monotonic() + seconds)
+        limiter.rate_limited += 1
+
+    def _record_wait(self, model: str, priority: int, waited: float):
+        key = (model, priority)
+        samples = self._waits.get(key)
+        if samples is None:
+            samples = self._waits[key] = deque(maxlen=self._wait_samples)
+            self._wait_totals[key] = [0, 0.0, 0.0]
+        samples.append(waited)
+        totals = self._wait_totals[key]
+        totals[0] += 1
+        totals[1] += waited
+        totals[2] = max(totals[2], waited)
+
+    def get_stats(self) -> Dict:
+        """Queue depth, in-flight calls, per-model budgets and queue wait-time statistics."""
+        now = time.monotonic()
+        queued: Dict[str, int] = {}
+        for waiter in self._waiters:
+            queued[waiter.model] = queued.get(waiter.model, 0) + 1
+        models = {
+            model: {
+                "queued": queued.get(model, 0),
+                "paused_for": round(max(limiter.paused_until - now, 0.0), 3),
+                "requests_available": round(limiter.requests.tokens, 1),
+                "tokens_available": round(limiter.tokens.tokens, 1),
+                "rate_limited": limiter.rate_limited,
+            }
+            for model, limiter in self._limiters.items()
+        }
+        waits = {}
+        for (model, priority), samples in self._waits.items():
+            count, total, max_wait = self._wait_totals[(model, priority)]
+            ordered = sorted(samples)
+            waits[f"{model}:{priority}"] = {
+                "count": count,
+                "mean": round(total / count, 4) if count else 0.0,
+                "max": round(max_wait, 4),
+                "p50": round(ordered[len(ordered) // 2], 4) if ordered else 0.0,
+                "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 4) if ordered else 0.0,
+            }
+        return {
+            "in_flight": self._in_flight,
+            "queued": len(self._waiters),
+            "max_concurrency": self.max_concurrency,
+            "models": models,
+            "wait_seconds": waits,
+        }
+
+
+_GOVERNOR: Optional[OpenAIGovernor] = None
+
+
+def get_governor() -> OpenAIGovernor:
+    global _GOVERNOR
+    if _GOVERNOR is None:
+        _GOVERNOR = OpenAIGovernor()
+    return _GOVERNOR
+
+
+def _governor_queue_depths():
+    if _GOVERNOR is None:
+        return []
+    return [({"model": model}, stats["queued"]) for model, stats in _GOVERNOR.get_stats()["models"].items()]
+
+
+LLM_QUEUE_DEPTH.set_function(_governor_queue_depths)
+LLM_IN_FLIGHT.set_function(lambda: [({}, _GOVERNOR._in_flight if _GOVERNOR else 0)])
+
+
+def _record_usage(model_name: str, usage):
+    """Token counters from a chat completion's usage block."""
+    if usage is None:
+        return
+    LLM_TOKENS.inc(getattr(usage, "prompt_tokens", 0) or 0, model=model_name, kind="prompt")
+    LLM_TOKENS.inc(getattr(usage, "completion_tokens", 0) or 0, model=model_name, kind="completion")
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = getattr(details, "cached_tokens", 0) or 0
+    LLM_TOKENS.inc(cached_tokens, model=model_name, kind="cached_prompt")
+    CACHE_REQUESTS.inc(cache="openai_prompt", result="hit" if cached_tokens else "miss")
+
+
+def _estimate_tokens(messages: List["ChatCompletionMessageParam"], formatted_schema: Optional[dict]) -> int:
+    """Rough prompt size (~4 chars per token) plus an allowance for the completion."""
+    chars = sum(len(str(m.get("content") or "")) for m in messages)
+    if formatted_schema is not None:
+        chars += len(json.dumps(formatted_schema))
+    return chars // 4 + OPENAI_COMPLETION_TOKEN_ESTIMATE
+
+
+def _retry_after_seconds(error: "RateLimitError") -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            try:
+                return max(parsedate_to_datetime(retry_after).timestamp() - time.time(), 0.0)
+            except (TypeError, ValueError):
+                pass
+    return None
+
+
+def _backoff_seconds(attempt: int) -> float:
+    return min(0.5 * 2 ** attempt, 8.0) * (0.75 + random.random() / 2)
+
+
 async def chat_completion(
-    openai_client: AsyncOpenAI,
-    user_prompt: str | List[ChatCompletionMessageParam],
+    openai_client: "AsyncOpenAI",
+    user_prompt: str | List["ChatCompletionMessageParam"],
     system_prompt: str = None,
     formatted_schema: dict = None,
-    model_name = "gpt-4.1-nano"
+    model_name = "gpt-4.1-nano",
+    priority: int = PRIORITY_INTERACTIVE,
+    deadline: Optional[Deadline] = None,
 ) -> str | dict:
     """
         Fast chat completion implementation, just use client, user prompt,
         and system prompt. You get the response.
-        
+
         Args:
         openai_client: OpenAI Client, can be created with create_client() function
         user_prompt: User prompt string, or just use chat completion's messages
         system_prompt: System prompt string
         formatted_schema: Using this arg automatically uses formatted schema output
         model_name: Model used for the completion
+        priority: Queue priority under load, PRIORITY_INTERACTIVE or PRIORITY_BACKGROUND
+        deadline: Turn deadline; queueing, the request and retries all fit in its remaining budget
     """
-    
+    # already loaded by create_client(), so this is a dict lookup
+    from openai import RateLimitError, APIConnectionError, APITimeoutError, InternalServerError
+
     messages = []
     # Messages Schema
     if system_prompt is None:
@@ -62,23 +408,77 @@ async def chat_completion(
         else:
             messages.extend(user_prompt)
 
+    request_kwargs = {
+        "model": model_name,
+        "messages": messages,
+        "temperature": 0,
+    }
     # Is Response using Formatted Schema?
+    if formatted_schema is not None:
+        request_kwargs["response_format"] = {
+            "type": "json_schema",
+            "json_schema": formatted_schema
+        }
+
+    governor = get_governor()
+    estimated_tokens = _estimate_tokens(messages, formatted_schema)
+    attempt = 0
+    while True:
+        if deadline is None:
+            waited = await governor.acquire(model_name, estimated_tokens, priority=priority)
+        else:
+            try:
+                waited = await asyncio.wait_for(
+                    governor.acquire(model_name, estimated_tokens, priority=priority),
+                    timeout=deadline.timeout(),
+                )
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded(f"no OpenAI capacity for {model_name} within the turn deadline")
+            request_kwargs["timeout"] = deadline.timeout()
+        LLM_QUEUE_WAIT_SECONDS.observe(waited, model=model_name)
+        retry_delay = 0.0
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            completions = await openai_client.chat.completions.create(**request_kwargs)
+            outcome = "ok"
+        except APITimeoutError:
+            outcome = "timeout"
+            if deadline is not None and deadline.expired:
+                raise DeadlineExceeded(f"{model_name} call exceeded the turn deadline")
+            if attempt >= OPENAI_MAX_RETRIES:
+                raise
+            retry_delay = _backoff_seconds(attempt)
+            logger.warning(f"OpenAI call timed out on {model_name}, retry {attempt + 1}/{OPENAI_MAX_RETRIES}")
+        except RateLimitError as e:
+            outcome = "rate_limited"
+            if attempt >= OPENAI_MAX_RETRIES:
+                raise
+            # pause the model for everyone; the next acquire waits it out
+            governor.pause(model_name, _retry_after_seconds(e) or _backoff_seconds(attempt))
+            logger.warning(f"Rate limited on {model_name}, retry {attempt + 1}/{OPENAI_MAX_RETRIES}")
+        except (APIConnectionError, InternalServerError) as e:
+            if attempt >= OPENAI_MAX_RETRIES:
+                raise
+            retry_delay = _backoff_seconds(attempt)
+            logger.warning(f"OpenAI call failed on {model_name} ({type(e).__name__}), retry {attempt + 1}/{OPENAI_MAX_RETRIES}")
+        else:
+            usage = getattr(completions, "usage", None)
+            governor.reconcile(model_name, estimated_tokens, getattr(usage, "total_tokens", None))
+            _record_usage(model_name, usage)
+            break
+        finally:
+            governor.release()
+            LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, model=model_name)
+            LLM_REQUESTS.inc(model=model_name, outcome=outcome)
+        attempt += 1
+        if deadline is not None and not deadline.has_budget(retry_delay):
+            raise DeadlineExceeded(f"no budget left to retry {model_name}")
+        if retry_delay:
+            await asyncio.sleep(retry_delay)
+
     if formatted_schema is None:
-        completions = await openai_client.chat.completions.create(
-            model=model_name,
-            messages=messages,
-            temperature=0
-        )
         completions_result: str = completions.choices[0].message.content
     else:
-        completions = await openai_client.chat.completions.create(
-            model=model_name,
-            messages=messages,
-            response_format={
-                "type": "json_schema",
-                "json_schema": formatted_schema
-            },
-            temperature=0
-        )
         completions_result: dict = json.loads(completions.choices[0].message.content)
-    return completions_result
\ No newline at end of file
+    return completions_result
@@ -0,0 +1,120 @@
+"""
+Deployment settings from the environment, loaded once per process.
+
+`.env` is read a single time, here, and the variables are parsed into one typed, read-only
+Settings object. Values already in the environment win over `.env`, so the per-worker
+variables the dispatcher sets (CHAT_DB_PATH, BOT_REGISTER_WEBHOOK) are never overridden.
+Modules take their values from `settings` instead of calling os.getenv themselves; tuning
+constants that do not change per deployment stay in core/agent/config.py.
+
+This module is imported by core.logger, so it must not import anything from core.
+"""
+
+import os
+import json
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+
+def _int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _flag(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+@dataclass(frozen=True)
+class Settings:
+    # logging (core/logger.py)
+    log_level: str = "INFO"
+    log_mode: str = "queue"  # "queue": stdout is written by a background thread, "sync": inline
+    log_format: str = "text"  # "text" | "json"
+    log_color: str = "auto"  # "auto" (only on a TTY) | "always" | "never"
+    log_max_payload_chars: int = 2000
+    log_queue_size: int = 10000  # records beyond this are dropped, never blocking
+
+    # bot / open-wa (core/agent/main.py, core/agent/dispatcher.py)
+    open_wa_host: str = "172.17.0.1"
+    open_wa_port: str = "8003"
+    open_wa_api_key: str = "my_secret_api_key"
+    bot_port: int = 8000
+    bot_register_webhook: bool = True  # False for dispatcher workers
+    bot_webhook_url: Optional[str] = None
+    bot_workers: int = 0  # dispatcher workers, 0 = one per CPU
+    bot_warmup: bool = True  # pre-open DB / OpenAI / VPS connections in the background at startup
+
+    # OpenAI (core/openai.py)
+    openai_api_key: Optional[str] = None
+    openai_base_url: Optional[str] = None
+    openai_max_concurrency: int = 16
+    openai_max_retries: int = 2
+    openai_completion_token_estimate: int = 256
+    openai_rate_limits: Dict[str, Tuple[int, int]] = field(default_factory=dict)  # model -> (rpm, tpm) overrides
+    openai_default_rpm: int = 500
+    openai_default_tpm: int = 30000
+
+    # VPS recommendation / booking API (core/agent/handler.py)
+    vps_url: Optional[str] = None
+
+    # chat DB and session state (core/agent/session.py, migrations.py, retention.py, session_state.py)
+    chat_db_path: Optional[str] = None  # default: core/database/chat_sessions.db
+    chat_db_shards: int = 1  # >1 splits the DB into that many files by phone hash
+    chat_db_format: str = "compact"  # "compact" | "legacy": layout of new DB files (existing ones: migrations --compact)
+    chat_archive_dir: Optional[str] = None  # default: <DB dir>/archive
+    session_state_backend: str = "memory"  # "memory" | "redis"
+    redis_url: str = "redis://127.0.0.1:6379/0"
+
+    # admin API (core/agent/admin.py); empty = not mounted
+    admin_api_key: str = ""
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        return cls(
+            log_level=os.getenv("LOG_LEVEL", cls.log_level).upper(),
+            log_mode=os.getenv("LOG_MODE", cls.log_mode),
+            log_format=os.getenv("LOG_FORMAT", cls.log_format),
+            log_color=os.getenv("LOG_COLOR", cls.log_color),
+            log_max_payload_chars=_int("LOG_MAX_PAYLOAD_CHARS", cls.log_max_payload_chars),
+            log_queue_size=_int("LOG_QUEUE_SIZE", cls.log_queue_size),
+            open_wa_host=os.getenv("OPEN_WA_HOST", cls.open_wa_host),
+            open_wa_port=os.getenv("OPEN_WA_PORT", cls.open_wa_port),
+            open_wa_api_key=os.getenv("OPEN_WA_API_KEY", cls.open_wa_api_key),
+            bot_port=_int("BOT_PORT", cls.bot_port),
+            bot_register_webhook=_flag("BOT_REGISTER_WEBHOOK", cls.bot_register_webhook),
+            bot_webhook_url=os.getenv("BOT_WEBHOOK_URL") or None,
+            bot_workers=_int("BOT_WORKERS", cls.bot_workers),
+            bot_warmup=_flag("BOT_WARMUP", cls.bot_warmup),
+            openai_api_key=os.getenv("OPENAI_API_KEY") or None,
+            openai_base_url=os.getenv("OPENAI_BASE_URL") or None,
+            openai_max_concurrency=_int("OPENAI_MAX_CONCURRENCY", cls.openai_max_concurrency),
+            openai_max_retries=_int("OPENAI_MAX_RETRIES", cls.openai_max_retries),
+            openai_completion_token_estimate=_int("OPENAI_COMPLETION_TOKEN_ESTIMATE", cls.openai_completion_token_estimate),
+            openai_rate_limits={
+                model: tuple(limits) for model, limits in json.loads(os.getenv("OPENAI_RATE_LIMITS") or "{}").items()
+            },
+            openai_default_rpm=_int("OPENAI_DEFAULT_RPM", cls.openai_default_rpm),
+            openai_default_tpm=_int("OPENAI_DEFAULT_TPM", cls.openai_default_tpm),
+            vps_url=os.getenv("VPS_URL") or None,
+            chat_db_path=os.getenv("CHAT_DB_PATH") or None,
+            chat_db_shards=_int("CHAT_DB_SHARDS", cls.chat_db_shards),
+            chat_db_format=os.getenv("CHAT_DB_FORMAT", cls.chat_db_format),
+            chat_archive_dir=os.getenv("CHAT_ARCHIVE_DIR") or None,
+            session_state_backend=os.getenv("SESSION_STATE_BACKEND", cls.session_state_backend),
+            redis_url=os.getenv("REDIS_URL", cls.redis_url),
+            admin_api_key=os.getenv("ADMIN_API_KEY", cls.admin_api_key),
+        )
+
+
+def load_settings() -> Settings:
+    load_dotenv()
+    return Settings.from_env()
+
+
+settings = load_settings()
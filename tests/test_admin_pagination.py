@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from core.agent import admin, migrations
+from core.agent.session import ChatDB
+
+BASE = 1_700_000_000
+API_KEY = "test-key"
+
+
+@pytest.fixture(params=["compact", "legacy"])
+def layout(request, monkeypatch):
+    monkeypatch.setattr(migrations, "CHAT_DB_FORMAT", request.param)
+    return request.param
+
+
+def _run(scenario, tmp_path):
+    async def run():
+        db = ChatDB(tmp_path / "chat.db", read_connections=1)
+        await db.initialize()
+        try:
+            return await scenario(db)
+        finally:
+            await db.close()
+    return asyncio.run(run())
+
+
+async def _all_pages(fetch, limit):
+    rows, after, pages = [], None, 0
+    while True:
+        page, after = await fetch(after, limit)
+        rows.extend(page)
+        pages += 1
+        if after is None:
+            return rows, pages
+
+
+@pytest.mark.parametrize("limit", [1, 3, 4, 12, 50])
+def test_session_pages_have_no_gaps_or_duplicates(tmp_path, layout, limit):
+    async def scenario(db):
+        # pairs of sessions share a last_activity, so the id tie-break decides the order
+        for i in range(12):
+            session_id = await db.create_session(f"62811{i % 3}", f"User {i}", started_at=BASE + i)
+            await db.update_session_activity(session_id, last_activity=BASE + 100 + i // 2)
+        listed = await db.list_sessions(limit=100)
+        expected = [row["id"] for row in sorted(listed, key=lambda row: (row["last_activity"], row["id"]), reverse=True)]
+        rows, pages = await _all_pages(lambda after, n: db.page_sessions(after=after, limit=n), limit)
+        assert [row["id"] for row in rows] == expected
+        assert len(set(expected)) == 12
+        assert pages == 12 // limit + 1
+
+        rows, _ = await _all_pages(lambda after, n: db.page_sessions(phone="628111", after=after, limit=n), limit)
+        assert [row["started_at"] for row in rows] == [BASE + 10, BASE + 7, BASE + 4, BASE + 1]
+    _run(scenario, tmp_path)
+
+
+def test_rows_changing_between_pages_do_not_shift_the_cursor(tmp_path, layout):
+    async def scenario(db):
+        ids = []
+        for i in range(6):
+            ids.append(await db.create_session(f"6281{i}", f"User {i}", started_at=BASE))
+            await db.update_session_activity(ids[-1], last_activity=BASE + i)
+        first, after = await db.page_sessions(after=None, limit=3)
+        # a new session and fresh activity on an already listed one: both sort before the cursor
+        await db.update_session_activity(ids[5], last_activity=BASE + 50)
+        await db.update_session_activity(await db.create_session("62899", "New", started_at=BASE), last_activity=BASE + 60)
+        second, after = await db.page_sessions(after=after, limit=3)
+        assert [row["id"] for row in first + second] == list(reversed(ids))
+        assert after is not None and (await db.page_sessions(after=after, limit=3)) == ([], None)
+    _run(scenario, tmp_path)
+
+
+@pytest.mark.parametrize("limit", [1, 2, 5, 7])
+def test_message_pages_keep_insertion_order(tmp_path, layout, limit):
+    async def scenario(db):
+        session_id = await db.create_session("628111", "Ana", started_at=BASE)
+        bodies = [f"message {n}" for n in range(7)]
+        for n, body in enumerate(bodies):
+            # several messages share a timestamp
+            await db.add_message(session_id, "user", body, timestamp=BASE + n // 3)
+        rows, _ = await _all_pages(lambda after, n: db.page_messages(session_id, after=after, limit=n), limit)
+        assert [row["body"] for row in rows] == bodies
+        assert len({row["id"] for row in rows}) == len(bodies)
+    _run(scenario, tmp_path)
+
+
+def test_api_cursors_walk_every_row_once(tmp_path, layout, monkeypatch):
+    monkeypatch.setattr(admin, "ADMIN_API_KEY", API_KEY)
+    monkeypatch.setattr(admin, "ADMIN_FETCH_CHUNK", 2)  # pages are streamed in several reads
+    db = ChatDB(tmp_path / "chat.db", read_connections=1)
+
+    async def get_chat_db():
+        await db.initialize()  # opened on the test client's loop
+        return db
+    monkeypatch.setattr(admin, "get_chat_db", get_chat_db)
+
+    app = FastAPI()
+    app.include_router(admin.router)
+    headers = {"X-API-Key": API_KEY}
+    with TestClient(app) as client:
+        client.portal.call(_seed_sessions, get_chat_db)
+        seen, cursor = [], None
+        while True:
+            body = client.get("/admin/sessions", params={"limit": 5, **({"cursor": cursor} if cursor else {})}, headers=headers).json()
+            seen.extend(row["id"] for row in body["items"])
+            cursor = body["next_cursor"]
+            if cursor is None:
+                break
+        assert len(seen) == 11 and len(set(seen)) == 11
+
+        assert client.get("/admin/sessions", params={"cursor": "not-a-cursor"}, headers=headers).status_code == 400
+        assert client.get("/admin/sessions").status_code == 401
+        client.portal.call(db.close)
+
+
+async def _seed_sessions(get_chat_db):
+    db = await get_chat_db()
+    for i in range(11):
+        session_id = await db.create_session(f"6281{i}", f"User {i}", started_at=BASE)
+        await db.update_session_activity(session_id, last_activity=BASE + i // 4)
@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+
+from core.agent import admission
+from core.agent.admission import (
+    AdmissionController,
+    PRIORITY_ACTIVE,
+    PRIORITY_CONFIRMATION,
+    PRIORITY_NEW,
+    turn_priority,
+)
+
+
+@pytest.mark.parametrize("text, active, priority", [
+    ("book 2", False, PRIORITY_CONFIRMATION),
+    ("yes, confirm please", True, PRIORITY_CONFIRMATION),
+    ("my email is ana@example.com", False, PRIORITY_CONFIRMATION),
+    ("any venue with a pool?", True, PRIORITY_ACTIVE),
+    ("hi", False, PRIORITY_NEW),
+])
+def test_turn_priority(text, active, priority):
+    assert turn_priority(text, active) == priority
+
+
+def test_waiters_are_admitted_by_priority_then_arrival():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=10, max_wait=5)
+        assert await controller.acquire(PRIORITY_NEW)
+        order = []
+
+        async def turn(name, priority):
+            assert await controller.acquire(priority)
+            order.append(name)
+            controller.release()
+
+        tasks = []
+        for name, priority in [("new-1", PRIORITY_NEW), ("active", PRIORITY_ACTIVE), ("new-2", PRIORITY_NEW), ("confirm", PRIORITY_CONFIRMATION)]:
+            tasks.append(asyncio.create_task(turn(name, priority)))
+            await asyncio.sleep(0)
+        assert controller.queued == 4
+        controller.release()
+        await asyncio.gather(*tasks)
+        return order, controller.in_flight, controller.queued
+
+    order, in_flight, queued = asyncio.run(scenario())
+    assert order == ["confirm", "active", "new-1", "new-2"]
+    assert (in_flight, queued) == (0, 0)
+
+
+def test_full_queue_displaces_the_lowest_priority_waiter():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=2, max_wait=5)
+        assert await controller.acquire(PRIORITY_NEW)
+        new_1 = asyncio.create_task(controller.acquire(PRIORITY_NEW))
+        new_2 = asyncio.create_task(controller.acquire(PRIORITY_NEW))
+        await asyncio.sleep(0)
+        assert controller.saturated
+        # a lower-or-equal priority arrival is shed itself
+        assert not await controller.acquire(PRIORITY_NEW)
+        confirm = asyncio.create_task(controller.acquire(PRIORITY_CONFIRMATION))
+        await asyncio.sleep(0)
+        assert await new_2 is False  # the most recent of the lowest priority
+        controller.release()
+        assert await confirm is True
+        controller.release()
+        assert await new_1 is True
+        controller.release()
+        return controller.in_flight, controller.queued
+
+    assert asyncio.run(scenario()) == (0, 0)
+
+
+def test_waiter_past_max_wait_is_shed_and_slot_passes_on():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=10, max_wait=0.05)
+        assert await controller.acquire(PRIORITY_ACTIVE)
+        assert not await controller.acquire(PRIORITY_ACTIVE)
+        assert controller.queued == 0
+        controller.release()
+        # the slot is free again: the timed-out waiter holds nothing
+        assert await controller.acquire(PRIORITY_NEW)
+        return controller.in_flight
+
+    assert asyncio.run(scenario()) == 1
+
+
+def test_busy_reply_at_most_once_per_window(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(admission.time, "monotonic", lambda: now[0])
+    controller = AdmissionController(busy_window=300)
+    assert controller.should_send_busy("6281")
+    assert not controller.should_send_busy("6281")
+    assert controller.should_send_busy("6282")
+    now[0] += 299
+    assert not controller.should_send_busy("6281")
+    now[0] += 1
+    assert controller.should_send_busy("6281")
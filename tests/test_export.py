@@ -0,0 +1,115 @@
+import asyncio
+import csv
+import gzip
+import time
+
+import pytest
+
+from core.agent import export
+from core.agent.export import run_export
+from core.agent.session import ChatDB
+
+DAY = 86400
+T0 = 1_700_006_400  # 2023-11-15 00:00 UTC
+
+
+def _seed(path, messages):
+    """messages: [(phone, timestamp, body, metadata)]"""
+    async def run():
+        db = ChatDB(path, read_connections=1)
+        await db.initialize()
+        sessions = {}
+        for phone, timestamp, body, metadata in messages:
+            if phone not in sessions:
+                sessions[phone] = await db.create_session(phone, f"User {phone}", started_at=timestamp)
+            await db.add_message(sessions[phone], "bot" if metadata else "user", body, timestamp=timestamp, metadata=metadata)
+            await db.update_session_activity(sessions[phone], last_activity=timestamp)
+        await db.close()
+    asyncio.run(run())
+
+
+def _rows(out, dataset):
+    rows = []
+    for path in sorted((out / dataset).glob("date=*/*.csv.gz")):
+        with gzip.open(path, "rt", newline="") as f:
+            rows.extend({"day": path.parent.name[len("date="):], **row} for row in csv.DictReader(f))
+    return rows
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "chat.db"
+    _seed(path, [
+        ("628111", T0 + 100, "hi, a wedding venue", None),
+        ("628111", T0 + 200, "booked", {"booking": {"status": "confirmed", "ticket_id": "T-1", "venue_id": "101"}}),
+        ("628222", T0 + DAY + 100, "a birthday party", None),
+    ])
+    return path
+
+
+def test_incremental_runs_never_export_a_row_twice(db_path, tmp_path):
+    out = tmp_path / "out"
+    first = run_export([(None, db_path)], out, "csv", until=T0 + DAY)
+    assert first["chat.db"]["messages"] == 2 and first["chat.db"]["bookings"] == 1
+    assert export.load_watermarks(out) == {"chat.db": T0 + DAY}
+
+    # same window again: nothing to do
+    assert run_export([(None, db_path)], out, "csv", until=T0 + DAY) == {}
+
+    _seed(db_path, [("628333", T0 + DAY + 200, "a gala dinner", None)])
+    second = run_export([(None, db_path)], out, "csv", until=T0 + 2 * DAY)
+    assert second["chat.db"]["messages"] == 2
+
+    messages = _rows(out, "messages")
+    assert sorted(row["body"] for row in messages) == ["a birthday party", "a gala dinner", "booked", "hi, a wedding venue"]
+    assert len({row["message_id"] for row in messages}) == 4
+    assert {row["day"] for row in messages} == {"2023-11-15", "2023-11-16"}
+    assert [row["ticket_id"] for row in _rows(out, "bookings")] == ["T-1"]
+
+
+def test_rerun_after_a_failed_watermark_save_replaces_the_files(db_path, tmp_path, monkeypatch):
+    out = tmp_path / "out"
+    save = export.save_watermarks
+
+    def fail(out, watermarks):
+        raise OSError("disk full")
+    monkeypatch.setattr(export, "save_watermarks", fail)
+    with pytest.raises(OSError):
+        run_export([(None, db_path)], out, "csv", until=T0 + DAY)
+    monkeypatch.setattr(export, "save_watermarks", save)
+
+    # the re-run covers a longer window from the same watermark
+    run_export([(None, db_path)], out, "csv", until=T0 + 2 * DAY)
+    messages = _rows(out, "messages")
+    assert len(messages) == 3 and len({row["message_id"] for row in messages}) == 3
+    assert len(_rows(out, "sessions")) == 2
+
+
+def test_recent_messages_wait_for_the_lag(db_path, tmp_path, monkeypatch):
+    out = tmp_path / "out"
+    now = T0 + DAY + 100 + export.EXPORT_LAG_SECONDS // 2  # the birthday message is too recent
+    monkeypatch.setattr(export.time, "time", lambda: now)
+    run_export([(None, db_path)], out, "csv")
+    assert [row["body"] for row in _rows(out, "messages")] == ["hi, a wedding venue", "booked"]
+    assert export.load_watermarks(out)["chat.db"] == now - export.EXPORT_LAG_SECONDS
+
+    now += export.EXPORT_LAG_SECONDS
+    run_export([(None, db_path)], out, "csv")
+    assert sorted(row["body"] for row in _rows(out, "messages")) == ["a birthday party", "booked", "hi, a wedding venue"]
+
+
+def test_explicit_since_does_not_rewind_the_watermark(db_path, tmp_path):
+    out = tmp_path / "out"
+    run_export([(None, db_path)], out, "csv", until=T0 + 2 * DAY)
+    run_export([(None, db_path)], tmp_path / "backfill", "csv", since=T0 + DAY, until=T0 + 2 * DAY)
+    run_export([(None, db_path)], out, "csv", since=T0, until=T0 + DAY)
+    assert export.load_watermarks(out) == {"chat.db": T0 + 2 * DAY}
+    assert [row["body"] for row in _rows(tmp_path / "backfill", "messages")] == ["a birthday party"]
+
+
+def test_cli_falls_back_to_csv_without_pyarrow(db_path, tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(export, "pyarrow", None)
+    assert export.main(["--out", str(tmp_path / "out"), "--db", str(db_path), "--until", str(T0 + DAY)]) == 0
+    assert list((tmp_path / "out" / "messages").glob("date=*/*.csv.gz"))
+    with pytest.raises(SystemExit):
+        export.main(["--out", str(tmp_path / "out"), "--db", str(db_path), "--format", "parquet"])
@@ -0,0 +1,96 @@
+import asyncio
+
+import orjson
+import pytest
+from starlette.requests import Request
+
+from core.agent import main
+from core.agent.ingress import decode_webhook, message_phone, peek_event
+from core.metrics import WEBHOOK_EVENTS
+
+MESSAGE = {"id": "m1", "from": "628111@c.us", "chatId": "628111@c.us", "body": "hi", "isGroupMsg": False, "fromMe": False}
+
+
+def _body(event, **data):
+    return orjson.dumps({"event": event, "data": {**MESSAGE, **data}})
+
+
+@pytest.mark.parametrize("body, event, outcome", [
+    (_body("onMessage"), "onMessage", "accepted"),
+    (_body("onAnyMessage"), "onAnyMessage", "skipped"),
+    (_body("onAck"), "onAck", "skipped"),
+    (_body("onMessage", isGroupMsg=True), "onMessage", "group"),
+    (_body("onMessage", fromMe=True), "onMessage", "self"),
+    (b'{"data": {}, "event": "onAnyMessage"}', "onAnyMessage", "skipped"),  # event not the first key
+    (b'{"event": "somethingNew", "data": {}}', "somethingNew", "skipped"),
+    (b'{"event": "onMessage", "data": "text"}', "onMessage", "invalid"),
+    (b'{"event": "onMessage"', "onMessage", "invalid"),
+    (b"[1, 2]", "", "invalid"),
+    (b"", "", "invalid"),
+])
+def test_outcomes(body, event, outcome):
+    assert decode_webhook(body)[0::2] == (event, outcome)
+
+
+def test_only_accepted_messages_carry_data():
+    event, data, outcome = decode_webhook(_body("onMessage"))
+    assert data["id"] == "m1" and message_phone(data) == "628111"
+    for body in (_body("onAnyMessage"), _body("onMessage", isGroupMsg=True), _body("onMessage", fromMe=True)):
+        assert decode_webhook(body)[1] is None
+
+
+def test_ignored_events_are_not_parsed():
+    # rejected from the event prefix alone: the rest is not even valid JSON
+    assert peek_event(b' { "event" : "onAck", garbage') == "onAck"
+    assert decode_webhook(b'{"event": "onAck", garbage')[2] == "skipped"
+    assert peek_event(b'{"data": {}, "event": "onAck"}') is None
+
+
+def test_unknown_events_share_one_label():
+    before = WEBHOOK_EVENTS.get(event="other", outcome="skipped")
+    decode_webhook(b'{"event": "made_up_event_1"}')
+    decode_webhook(b'{"event": "made_up_event_2"}')
+    assert WEBHOOK_EVENTS.get(event="other", outcome="skipped") == before + 2
+    assert WEBHOOK_EVENTS.get(event="made_up_event_1", outcome="skipped") == 0
+
+
+def _post(body: bytes):
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+    request = Request({"type": "http", "method": "POST", "path": "/webhook", "headers": []}, receive)
+    return asyncio.run(main.webhook_handler(request))
+
+
+@pytest.mark.parametrize("body, reply", [
+    (_body("onAnyMessage"), b'{"status":"ok"}'),
+    (_body("onMessage", isGroupMsg=True), b'{"status":"ignored"}'),
+    (_body("onMessage", fromMe=True), b'{"status":"ignored"}'),
+    (b"not json", b'{"status":"error","message":"invalid webhook payload"}'),
+])
+def test_rejected_webhooks_never_reach_a_turn(monkeypatch, body, reply):
+    turns, admitted = [], []
+
+    async def process_message(msg):
+        turns.append(msg)
+
+    async def acquire(priority):
+        admitted.append(priority)
+        return True
+
+    monkeypatch.setattr(main, "process_message", process_message)
+    monkeypatch.setattr(main.admission, "acquire", acquire)
+    response = _post(body)
+    assert response.body == reply
+    assert turns == [] and admitted == []
+
+
+def test_accepted_message_is_processed(monkeypatch):
+    turns = []
+
+    async def process_message(msg):
+        turns.append(msg["id"])
+
+    monkeypatch.setattr(main, "process_message", process_message)
+    monkeypatch.setattr(main, "has_active_session", lambda phone: False)
+    assert _post(_body("onMessage")) == {"status": "ok"}
+    assert turns == ["m1"]
@@ -0,0 +1,92 @@
+import asyncio
+import sqlite3
+
+from core.agent import migrations
+from core.agent.session import ChatDB
+
+
+async def _write_history(db: ChatDB) -> str:
+    session_id = await db.create_session("6281234", "Ana", started_at=1_700_000_000)
+    # same timestamp: the compact seq must keep the insertion order
+    await db.add_message(session_id, "user", "hi, a wedding venue in Bali for 120 guests", timestamp=1_700_000_010)
+    await db.add_message(session_id, "agent", "Here are 3 venues", timestamp=1_700_000_020, metadata={"question_class": ["inquiry"]})
+    await db.add_message(session_id, "user", "book the second one", timestamp=1_700_000_020)
+    await db.update_user_requirements(session_id, {"event_type": "wedding", "location": "Bali", "attendees": 120})
+    return session_id
+
+
+async def _read_back(db: ChatDB, session_id: str):
+    messages = await db.get_messages_for_session(session_id)
+    requirements = await db.get_user_requirements(session_id)
+    session = await db.get_session(session_id)
+    hits = await db.search_messages("wedding")
+    return (
+        [(m["sender"], m["body"], m["timestamp"], m["metadata"]) for m in messages],
+        {key: requirements.get(key) for key in ("event_type", "location", "attendees")},
+        (session["phone"], session["user_name"], session["started_at"]),
+        len(hits),
+    )
+
+
+def test_legacy_to_compact_round_trip(tmp_path, monkeypatch):
+    path = tmp_path / "chat.db"
+
+    async def legacy():
+        monkeypatch.setattr(migrations, "CHAT_DB_FORMAT", "legacy")
+        db = ChatDB(path, read_connections=1)
+        await db.initialize()
+        assert not db.compact
+        session_id = await _write_history(db)
+        before = await _read_back(db, session_id)
+        await db.close()
+        return session_id, before
+
+    session_id, before = asyncio.run(legacy())
+
+    assert migrations.main(["--db", str(path), "--compact"]) == 0
+    conn = sqlite3.connect(str(path))
+    try:
+        assert migrations.is_compact(conn)
+        assert migrations.get_version(conn) == migrations.LATEST_VERSION
+        # empty metadata is stored as NULL, ids as 16-byte blobs
+        assert conn.execute("SELECT COUNT(*) FROM messages WHERE metadata = '{}'").fetchone()[0] == 0
+        assert conn.execute("SELECT typeof(id) FROM sessions").fetchone()[0] == "blob"
+    finally:
+        conn.close()
+
+    async def compact():
+        db = ChatDB(path, read_connections=1)
+        await db.initialize()
+        assert db.compact
+        after = await _read_back(db, session_id)
+        await db.close()
+        return after
+
+    after = asyncio.run(compact())
+    assert after == before
+    assert [body for _, body, _, _ in after[0]] == ["book the second one", "Here are 3 venues", "hi, a wedding venue in Bali for 120 guests"]
+    assert after[3] == 1
+
+
+def test_existing_legacy_file_is_not_rewritten_at_startup(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "chat.db"))
+    try:
+        migrations.migrate(conn, target=3)
+        conn.execute(
+            "INSERT INTO sessions (id, phone, started_at, last_activity) VALUES (?, '6281', 1, 1)",
+            ("0" * 32,),
+        )
+        conn.commit()
+        assert migrations.migrate(conn) == migrations.LATEST_VERSION
+        assert not migrations.is_compact(conn)
+    finally:
+        conn.close()
+
+
+def test_new_file_starts_compact(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "chat.db"))
+    try:
+        migrations.migrate(conn)
+        assert migrations.is_compact(conn)
+    finally:
+        conn.close()
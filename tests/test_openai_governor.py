@@ -0,0 +1,67 @@
+import asyncio
+
+from core.openai import OpenAIGovernor, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+
+LIMITS = {"model-a": (10000, 10_000_000), "model-b": (10000, 10_000_000)}
+
+
+def test_release_wakes_only_the_head_waiter():
+    async def scenario():
+        governor = OpenAIGovernor(max_concurrency=1, rate_limits=LIMITS)
+        await governor.acquire("model-a", 10)
+        order = []
+
+        async def call(name, priority):
+            await governor.acquire("model-a", 10, priority=priority)
+            order.append(name)
+
+        tasks = [asyncio.create_task(call(name, priority)) for name, priority in (("low", 5), ("high", 0), ("mid", 1))]
+        await asyncio.sleep(0)
+        governor.release()
+        assert [waiter.event.is_set() for waiter in sorted(governor._waiters)] == [True, False, False]
+        for _ in range(3):
+            await asyncio.sleep(0.01)
+            governor.release()
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(scenario()) == ["high", "mid", "low"]
+
+
+def test_rate_limited_head_does_not_block_another_model():
+    async def scenario():
+        governor = OpenAIGovernor(max_concurrency=2, rate_limits=LIMITS)
+        await governor.acquire("model-a", 10)
+        await governor.acquire("model-b", 10)
+        governor.pause("model-a", 60)
+        blocked = asyncio.create_task(governor.acquire("model-a", 10))
+        ready = asyncio.create_task(governor.acquire("model-b", 10))
+        await asyncio.sleep(0)
+        governor.release()
+        await asyncio.wait_for(ready, timeout=1)
+        assert not blocked.done()
+        blocked.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_interactive_calls_overtake_background_work():
+    async def scenario():
+        governor = OpenAIGovernor(max_concurrency=1, rate_limits=LIMITS)
+        await governor.acquire("model-a", 10)
+        order = []
+
+        async def call(name, priority):
+            await governor.acquire("model-a", 10, priority=priority)
+            order.append(name)
+            governor.release()
+
+        tasks = []
+        for name, priority in (("background-1", PRIORITY_BACKGROUND), ("background-2", PRIORITY_BACKGROUND), ("interactive", PRIORITY_INTERACTIVE)):
+            tasks.append(asyncio.create_task(call(name, priority)))
+            await asyncio.sleep(0)
+        governor.release()
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(scenario()) == ["interactive", "background-1", "background-2"]
@@ -0,0 +1,141 @@
+import asyncio
+
+import pytest
+
+from core.agent import retention
+from core.agent.retention import RetentionJob, SessionArchive, restore_session
+from core.agent.session import ChatDB
+
+ENDED_AT = 1_700_000_000  # 2023-11, well past any retention window
+
+
+@pytest.fixture(autouse=True)
+def small_batches(monkeypatch):
+    monkeypatch.setattr(retention, "RETENTION_BATCH_SESSIONS", 2)
+    monkeypatch.setattr(retention, "RETENTION_BATCH_PAUSE_SECONDS", 0)
+
+
+async def _seed(db: ChatDB, count: int = 5):
+    history = {}
+    for i in range(count):
+        session_id = await db.create_session(f"62812{i}", f"User {i}", started_at=ENDED_AT - 600)
+        for n in range(3):
+            await db.add_message(session_id, "user" if n % 2 == 0 else "agent", f"message {n} of {i}", timestamp=ENDED_AT - 500 + n)
+        await db.update_user_requirements(session_id, {"event_type": "wedding", "attendees": 100 + i})
+        await db.end_session(session_id, ended_at=ENDED_AT)
+        history[session_id] = [m["body"] for m in reversed(await db.get_messages_for_session(session_id))]
+    return history
+
+
+def _archived(archive: SessionArchive):
+    return [record for path in archive.files() for record in archive.iter_records(path)]
+
+
+def _run(coro_fn, tmp_path):
+    async def scenario():
+        db = ChatDB(tmp_path / "chat.db", read_connections=1)
+        await db.initialize()
+        try:
+            return await coro_fn(db, SessionArchive(db.db_path, tmp_path / "archive"))
+        finally:
+            await db.close()
+    return asyncio.run(scenario())
+
+
+def test_disabled_by_default():
+    assert retention.RETENTION_ENABLED is False
+
+
+def test_archive_delete_and_restore(tmp_path):
+    async def scenario(db, archive):
+        history = await _seed(db)
+        totals = await RetentionJob(db, days=30, archive_dir=archive.archive_dir).run_once()
+        assert (totals["sessions"], totals["messages"]) == (5, 15)
+
+        records = _archived(archive)
+        assert sorted(r["session"]["id"] for r in records) == sorted(history)
+        for record in records:
+            assert [m["body"] for m in record["messages"]] == history[record["session"]["id"]]
+            assert record["requirements"]["event_type"] == "wedding"
+        for session_id in history:
+            assert await db.get_session(session_id) is None
+            assert await db.get_messages_for_session(session_id) == []
+        assert archive.pending() is None
+
+        session_id = next(iter(history))
+        assert await restore_session(db, session_id, archive.archive_dir)
+        assert (await db.get_session(session_id))["ended_at"] == ENDED_AT
+        assert [m["body"] for m in reversed(await db.get_messages_for_session(session_id))] == history[session_id]
+        assert (await db.get_user_requirements(session_id))["event_type"] == "wedding"
+        # already live: restoring again does not insert a second copy
+        assert not await db.restore_session_record(archive.find(session_id))
+
+    _run(scenario, tmp_path)
+
+
+def test_crash_between_archive_and_delete(tmp_path, monkeypatch):
+    async def scenario(db, archive):
+        history = await _seed(db)
+        delete_sessions = db.delete_sessions
+
+        async def crash(session_ids):
+            raise RuntimeError("killed")
+
+        monkeypatch.setattr(db, "delete_sessions", crash)
+        with pytest.raises(RuntimeError):
+            await RetentionJob(db, days=30, archive_dir=archive.archive_dir).run_once()
+        assert archive.pending() is not None
+        assert len(_archived(archive)) == 2  # first batch appended, not deleted
+
+        monkeypatch.setattr(db, "delete_sessions", delete_sessions)
+        await RetentionJob(db, days=30, archive_dir=archive.archive_dir).run_once()
+        ids = [r["session"]["id"] for r in _archived(archive)]
+        assert sorted(ids) == sorted(history)  # every session exactly once
+        assert archive.pending() is None
+        for session_id in history:
+            assert await db.get_session(session_id) is None
+
+    _run(scenario, tmp_path)
+
+
+def test_crash_after_delete_before_journal_commit(tmp_path, monkeypatch):
+    async def scenario(db, archive):
+        history = await _seed(db, count=2)
+        commit = SessionArchive.commit
+
+        def crash(self):
+            raise RuntimeError("killed")
+
+        monkeypatch.setattr(SessionArchive, "commit", crash)
+        with pytest.raises(RuntimeError):
+            await RetentionJob(db, days=30, archive_dir=archive.archive_dir).run_once()
+
+        monkeypatch.setattr(SessionArchive, "commit", commit)
+        await RetentionJob(db, days=30, archive_dir=archive.archive_dir).run_once()
+        assert sorted(r["session"]["id"] for r in _archived(archive)) == sorted(history)
+        assert archive.pending() is None
+
+    _run(scenario, tmp_path)
+
+
+def test_torn_append_is_cut_off(tmp_path, monkeypatch):
+    async def scenario(db, archive):
+        history = await _seed(db, count=2)
+
+        def torn(self, records):
+            # the process died halfway through writing the gzip member
+            path = self.path_for("2023-11")
+            with open(path, "ab") as f:
+                f.write(b"\x1f\x8b\x08\x00garbage")
+            raise RuntimeError("killed")
+
+        append = SessionArchive.append
+        monkeypatch.setattr(SessionArchive, "append", torn)
+        with pytest.raises(RuntimeError):
+            await RetentionJob(db, days=30, archive_dir=archive.archive_dir).run_once()
+
+        monkeypatch.setattr(SessionArchive, "append", append)
+        await RetentionJob(db, days=30, archive_dir=archive.archive_dir).run_once()
+        assert sorted(r["session"]["id"] for r in _archived(archive)) == sorted(history)
+
+    _run(scenario, tmp_path)
@@ -0,0 +1,91 @@
+import asyncio
+import json
+
+import pytest
+
+from core.agent import migrations, search
+from core.agent.search import quote_terms
+from core.agent.session import ChatDB
+
+MESSAGES = [
+    ("628111", "user", "a wedding venue in Bali for 120 guests", 1_700_000_010),
+    ("628111", "bot", "Here are 3 wedding venues in Nusa Dua", 1_700_000_020),
+    ("628222", "user", "birthday party, the bride's sister is 50% of the budget (AND the DJ)", 1_700_000_030),
+    ("628222", "user", "can I get a refund?", 1_700_000_040),
+]
+
+
+@pytest.fixture(params=["compact", "legacy"])
+def db_path(request, tmp_path, monkeypatch):
+    """A chat DB holding MESSAGES, in either layout."""
+    monkeypatch.setattr(migrations, "CHAT_DB_FORMAT", request.param)
+    path = tmp_path / "chat.db"
+
+    async def seed():
+        db = ChatDB(path, read_connections=1)
+        await db.initialize()
+        sessions = {}
+        for phone, sender, body, timestamp in MESSAGES:
+            if phone not in sessions:
+                sessions[phone] = await db.create_session(phone, f"User {phone}", started_at=timestamp - 5)
+            await db.add_message(sessions[phone], sender, body, timestamp=timestamp)
+        await db.close()
+
+    asyncio.run(seed())
+    return path
+
+
+def _search(path, query, **filters):
+    async def run():
+        db = ChatDB(path, read_connections=1)
+        await db.initialize()
+        try:
+            return await db.search_messages(query, **filters)
+        finally:
+            await db.close()
+    return asyncio.run(run())
+
+
+def _phones(hits):
+    return sorted(hit["phone"] for hit in hits)
+
+
+def test_quote_terms():
+    assert quote_terms('wedding "bali') == '"wedding" """bali"'
+    assert quote_terms("bride's  50%") == '"bride\'s" "50%"'
+    assert quote_terms("   ") == ""
+
+
+def test_fts5_syntax_is_honoured(db_path):
+    assert _phones(_search(db_path, "wedding bali")) == ["628111"]
+    assert _phones(_search(db_path, '"wedding venues"')) == ["628111"]
+    assert _phones(_search(db_path, "wedd*")) == ["628111", "628111"]
+    assert _phones(_search(db_path, "refund OR bali")) == ["628111", "628222"]
+    assert _phones(_search(db_path, "wedding NOT bali")) == ["628111"]
+
+
+@pytest.mark.parametrize("query", ['"wedding', "bride's", "50%", "(AND the", "budget:", "refund?"])
+def test_invalid_syntax_is_searched_as_words(db_path, query):
+    # no sqlite error reaches the caller; the words that are there still match
+    hits = _search(db_path, query)
+    assert hits and all(hit["snippet"] for hit in hits)
+
+
+@pytest.mark.parametrize("query", ["", "   "])
+def test_blank_query_matches_nothing(db_path, query):
+    assert _search(db_path, query) == []
+
+
+def test_filters(db_path):
+    assert _phones(_search(db_path, "wedding", phone="628111", sender="bot")) == ["628111"]
+    assert _search(db_path, "wedding", since=1_700_000_015, until=1_700_000_020) == []
+    hits = _search(db_path, "wedding", since=1_700_000_015)
+    assert [hit["sender"] for hit in hits] == ["bot"]
+    assert "[wedding]" in hits[0]["snippet"]
+
+
+def test_cli_opens_files_read_only(db_path, capsys):
+    assert search.main(["wedding", "--db", str(db_path), "--json"]) == 0
+    rows = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert _phones(rows) == ["628111", "628111"]
+    assert all("*wedding*" in row["snippet"] for row in rows)
@@ -0,0 +1,108 @@
+import asyncio
+import time
+
+import pytest
+
+from bench.fakes.redis_server import create_server
+from core.agent import session
+from core.agent.session import ChatDB, SessionManager
+from core.agent.session_state import RedisSessionState, SessionStateBackend
+
+PHONE = "628111"
+JID = f"{PHONE}@c.us"
+
+
+def test_backend_is_abstract():
+    with pytest.raises(TypeError):
+        SessionStateBackend()
+
+
+def _with_redis(scenario):
+    async def run():
+        store, handle = create_server()
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        url = f"redis://127.0.0.1:{server.sockets[0].getsockname()[1]}/0"
+        try:
+            return await scenario(store, url)
+        finally:
+            server.close()
+            await server.wait_closed()
+    return asyncio.run(run())
+
+
+def test_redis_records_and_leases():
+    async def scenario(store, url):
+        a, b = RedisSessionState(url), RedisSessionState(url)
+        record = {"session_id": "s1", "phone": PHONE, "jid": JID, "user_name": "Ana", "started_at": 1}
+        assert await a.create_session(PHONE, record) == record
+        # a second create keeps the first record
+        assert (await b.create_session(PHONE, dict(record, session_id="s2")))["session_id"] == "s1"
+        assert await b.list_sessions() == [PHONE]
+        await b.touch(PHONE, 123)
+        assert await a.get_last_activity(PHONE) == 123
+
+        assert await a.acquire_lease(PHONE, "worker-a", 50)
+        assert not await b.acquire_lease(PHONE, "worker-b", 50)
+        assert await a.renew_lease(PHONE, "worker-a", 50)
+        assert not await b.release_lease(PHONE, "worker-b")
+        await asyncio.sleep(0.1)  # worker-a stops renewing: the lease expires
+        assert await b.acquire_lease(PHONE, "worker-b", 1000)
+        assert not await a.renew_lease(PHONE, "worker-a", 1000)
+
+        assert not await a.delete_session(PHONE, "s2")  # not the current session
+        assert await a.delete_session(PHONE, "s1")
+        assert await b.get_session(PHONE) is None and await b.get_last_activity(PHONE) is None
+        await a.close()
+        await b.close()
+
+    _with_redis(scenario)
+
+
+def test_expired_lease_is_adopted_by_another_manager(tmp_path, monkeypatch):
+    monkeypatch.setattr(session, "SESSION_LEASE_SECONDS", 1)  # whole ms for PX
+
+    async def scenario(store, url):
+        db = ChatDB(tmp_path / "chat.db", read_connections=1)
+        await db.initialize()
+        first = SessionManager(db, RedisSessionState(url))
+        second = SessionManager(db, RedisSessionState(url))
+        entry = await first.ensure_session(PHONE, JID, "Ana", client=None)
+        assert store.cmd_get(f"wa_bot:lease:{PHONE}") == first.owner
+
+        # the first worker dies: its timers stop and the lease is never renewed
+        await first._timers.close()
+        await asyncio.sleep(1.1)
+        await second._adopt_orphans()
+        assert second.is_active(PHONE)
+        assert second._sessions[PHONE].session_id == entry.session_id
+        assert store.cmd_get(f"wa_bot:lease:{PHONE}") == second.owner
+
+        # the first worker's timers, if they come back, see the lease is gone and stand down
+        await first._check_timers(PHONE, entry.session_id)
+        assert first._sessions[PHONE].timer_id is None
+
+        await second.shutdown()
+        await first.state.close()
+        await db.close()
+
+    _with_redis(scenario)
+
+
+def test_abandoned_db_sessions_are_expired(tmp_path):
+    async def scenario(store, url):
+        db = ChatDB(tmp_path / "chat.db", read_connections=1)
+        await db.initialize()
+        state = RedisSessionState(url)
+        manager = SessionManager(db, state)
+        long_ago = int(time.time()) - 24 * 3600
+        session_id = await db.create_session(PHONE, "Ana", started_at=long_ago)
+        await state.create_session(PHONE, {"session_id": session_id, "phone": PHONE, "jid": JID, "user_name": "Ana", "started_at": long_ago})
+
+        await manager._expire_abandoned()
+        assert (await db.get_session(session_id))["status"] == "expired"
+        assert await state.get_session(PHONE) is None
+
+        await manager.shutdown()
+        await db.close()
+
+    _with_redis(scenario)
@@ -0,0 +1,22 @@
+import asyncio
+import time
+
+from core.agent.session import SessionEntry, SessionTimers
+
+
+def test_stale_timers_compacted_at_the_managers_cap():
+    async def scenario():
+        entry = SessionEntry("s1", "6281", "6281@s.whatsapp.net", "Ana", 0, 0)
+
+        async def fire(phone, session_id):
+            pass
+
+        timers = SessionTimers(fire, lambda phone, session_id, timer_id: timer_id == entry.timer_id, max_entries=4)
+        due = time.time() + 3600
+        for _ in range(20):
+            timers.schedule(entry, due)  # rescheduling leaves the previous item behind
+        # compacted whenever it grows past 2 * max_entries, never to the global default
+        assert len(timers) <= 2 * 4 + 1
+        await timers.close()
+
+    asyncio.run(scenario())
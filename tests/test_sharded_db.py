@@ -0,0 +1,118 @@
+import asyncio
+
+from core.agent import retention
+from core.agent.retention import RetentionJob, restore_session
+from core.agent.session import ChatDB, ShardedChatDB, create_chat_db
+
+PHONES = [f"62812{i:04d}" for i in range(12)]
+ENDED_AT = 1_700_000_000
+
+
+def _run(scenario, tmp_path, shards: int = 3):
+    async def run():
+        db = ShardedChatDB(tmp_path / "chat.db", shards)
+        await db.initialize()
+        try:
+            return await scenario(db)
+        finally:
+            await db.close()
+    return asyncio.run(run())
+
+
+async def _seed(db: ShardedChatDB):
+    """One session per phone, ending at distinct times, with a searchable message."""
+    session_ids = {}
+    for i, phone in enumerate(PHONES):
+        session_id = await db.create_session(phone, f"User {i}", started_at=ENDED_AT - 1000 + i)
+        await db.add_message(session_id, "user", f"wedding venue for {100 + i} guests", timestamp=ENDED_AT - 900 + i)
+        await db.update_session_activity(session_id, last_activity=ENDED_AT - 800 + i)
+        session_ids[phone] = session_id
+    return session_ids
+
+
+def test_create_chat_db_picks_the_layout(tmp_path):
+    assert isinstance(create_chat_db(tmp_path / "one.db", shards=1), ChatDB)
+    sharded = create_chat_db(tmp_path / "many.db", shards=4)
+    assert isinstance(sharded, ShardedChatDB)
+    assert [shard.db_path.name for shard in sharded.shards] == [f"many.{i}-of-4.db" for i in range(4)]
+
+
+def test_routing_is_stable_per_phone(tmp_path):
+    first = ShardedChatDB(tmp_path / "chat.db", 3)
+    again = ShardedChatDB(tmp_path / "chat.db", 3)
+    indexes = [first.shard_index(phone) for phone in PHONES]
+    assert indexes == [again.shard_index(phone) for phone in PHONES]
+    assert set(indexes) == {0, 1, 2}
+
+
+def test_tagged_ids_round_trip_to_their_shard(tmp_path):
+    async def scenario(db):
+        session_ids = await _seed(db)
+        for phone, session_id in session_ids.items():
+            index = db.shard_index(phone)
+            assert session_id.startswith(f"s{index}_")
+            shard, local_id = db.shard_for_session(session_id)
+            assert shard is db.shards[index]
+            assert (await shard.get_session(local_id))["phone"] == phone
+            assert (await db.get_session(session_id))["id"] == session_id
+            assert (await db.get_session_by_phone(phone))["id"] == session_id
+            messages = await db.get_messages_for_session(session_id)
+            assert [m["body"] for m in messages] == [f"wedding venue for {100 + PHONES.index(phone)} guests"]
+        # untagged ids (from before sharding) and out-of-range tags fall back to shard 0
+        assert db.shard_for_session("abc123") == (db.shards[0], "abc123")
+        assert db.shard_for_session("s9_abc123") == (db.shards[0], "s9_abc123")
+    _run(scenario, tmp_path)
+
+
+def test_admin_queries_fan_out(tmp_path):
+    async def scenario(db):
+        session_ids = await _seed(db)
+        listed = await db.list_sessions(limit=5)
+        assert [row["id"] for row in listed] == [session_ids[phone] for phone in reversed(PHONES)][:5]
+        await db.end_session(session_ids[PHONES[0]], ended_at=ENDED_AT)
+        assert await db.count_sessions_by_status() == {"active": len(PHONES) - 1, "ended": 1}
+    _run(scenario, tmp_path)
+
+
+def test_ended_sessions_are_exported_from_every_shard(tmp_path, monkeypatch):
+    monkeypatch.setattr(retention, "RETENTION_BATCH_PAUSE_SECONDS", 0)
+
+    async def scenario(db):
+        session_ids = await _seed(db)
+        await db.end_sessions(list(session_ids.values()), ended_at=ENDED_AT)
+        per_shard = [await shard.export_ended_sessions(ENDED_AT + 1, 100) for shard in db.shards]
+        assert all(per_shard)
+        assert sum(len(records) for records in per_shard) == len(PHONES)
+
+        totals = await RetentionJob(db, days=30, archive_dir=tmp_path / "archive").run_once()
+        assert totals["sessions"] == len(PHONES)
+        assert await db.get_session(session_ids[PHONES[7]]) is None
+        assert await restore_session(db, session_ids[PHONES[7]], archive_dir=tmp_path / "archive")
+        assert (await db.get_session(session_ids[PHONES[7]]))["phone"] == PHONES[7]
+    _run(scenario, tmp_path)
+
+
+def test_page_sessions_fans_out_in_order(tmp_path):
+    async def scenario(db):
+        session_ids = await _seed(db)
+        seen, after = [], None
+        while True:
+            rows, after = await db.page_sessions(after=after, limit=5)
+            seen.extend(rows)
+            if after is None:
+                break
+        assert [row["id"] for row in seen] == [session_ids[phone] for phone in reversed(PHONES)]
+        rows, after = await db.page_sessions(phone=PHONES[3], limit=5)
+        assert [row["id"] for row in rows] == [session_ids[PHONES[3]]] and after is None
+    _run(scenario, tmp_path)
+
+
+def test_search_messages_fans_out(tmp_path):
+    async def scenario(db):
+        session_ids = await _seed(db)
+        hits = await db.search_messages("wedding", limit=50)
+        assert sorted(hit["session_id"] for hit in hits) == sorted(session_ids.values())
+        assert len(await db.search_messages("wedding", limit=4)) == 4
+        one = await db.search_messages("wedding", phone=PHONES[5])
+        assert [hit["session_id"] for hit in one] == [session_ids[PHONES[5]]]
+    _run(scenario, tmp_path)
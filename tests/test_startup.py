@@ -0,0 +1,49 @@
+import asyncio
+
+from core.agent import main, session
+
+
+def test_slow_warmup_step_is_cut_off(monkeypatch):
+    monkeypatch.setattr(main, "STARTUP_WARMUP_TIMEOUT_SECONDS", 0.05)
+
+    async def scenario():
+        async def slow():
+            await asyncio.sleep(10)
+
+        async def fast():
+            pass
+
+        startup = main.Startup()
+        startup.start({"db": slow, "vps": fast})
+        await asyncio.wait_for(startup.ready.wait(), 1)
+        return startup.failed
+
+    assert asyncio.run(scenario()) == ["db"]
+
+
+def test_giving_up_on_the_chat_db_does_not_cancel_opening_it(monkeypatch):
+    opened = []
+
+    class SlowDB:
+        async def initialize(self):
+            await asyncio.sleep(0.1)  # migrations
+            opened.append(self)
+
+    monkeypatch.setattr(session, "create_chat_db", SlowDB)
+    monkeypatch.setattr(session, "create_session_state", lambda: None)
+    monkeypatch.setattr(session, "SessionManager", lambda db, state: object())
+    monkeypatch.setattr(session, "_DB", None)
+    monkeypatch.setattr(session, "_SESSION_MANAGER", None)
+    monkeypatch.setattr(session, "_db_init", None)
+
+    async def scenario():
+        try:
+            await session._ensure_db_and_manager(timeout=0.01)
+        except asyncio.TimeoutError:
+            pass
+        assert session._DB is None
+        await session._ensure_db_and_manager()
+        return session._DB
+
+    db = asyncio.run(scenario())
+    assert opened == [db]  # opened once, by the first (abandoned) call
@@ -0,0 +1,14 @@
+from core.agent.templates import render_venue_item
+
+
+def test_list_fields_are_joined():
+    item = render_venue_item(1, {"name": "Grand Hyatt Bali", "location": ["Nusa Dua", "Bali"], "type": "Hotel", "amenities": ["pool", "parking"]})
+    assert "Amenities: pool, parking" in item
+    assert "Location: Nusa Dua, Bali" in item
+    assert "[" not in item
+
+
+def test_missing_fields_use_placeholder():
+    item = render_venue_item(2, {"name": "Ubud Garden Villa", "amenities": []})
+    assert "Amenities: N/A" in item
+    assert "Type: N/A" in item
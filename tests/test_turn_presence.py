@@ -0,0 +1,28 @@
+import asyncio
+import time
+
+from core.agent.main import OpenWAClient, TurnPresence
+
+
+def test_typing_indicator_never_holds_up_the_turn():
+    async def scenario():
+        client = OpenWAClient("http://open-wa.invalid", "key")
+        calls = []
+
+        async def slow_typing(to, on):
+            calls.append(on)
+            await asyncio.sleep(0.5)  # a slow open-wa
+
+        client.simulateTyping = slow_typing
+        started = time.monotonic()
+        async with TurnPresence(client, "6281@c.us", refresh_seconds=60, ack_after_seconds=60, ack_message="..."):
+            entered = time.monotonic() - started
+            await asyncio.sleep(0.01)
+        exited = time.monotonic() - started
+        await asyncio.sleep(0.01)
+        await client.close()
+        return entered, exited, calls
+
+    entered, exited, calls = asyncio.run(scenario())
+    assert entered < 0.1 and exited < 0.1
+    assert calls == [True, False]
@@ -0,0 +1,45 @@
+from core.agent.venue_index import VenueIndex
+
+VENUES = [
+    {"payload": {"id": "101", "name": "Grand Hyatt Bali", "location": "Nusa Dua", "type": "Hotel", "amenities": ["pool", "parking"]}},
+    {"payload": {"id": "102", "name": "Ubud Garden Villa", "location": "Ubud", "type": "Villa", "amenities": ["garden"]}},
+    {"payload": {"id": "103", "name": "Seminyak Beach Hall", "location": "Seminyak", "type": "Hall", "amenities": ["parking"]}},
+]
+
+
+def test_explicit_selection_narrows_to_one_venue():
+    answer = VenueIndex().answer("where is the second one?", VENUES)
+    assert "Ubud Garden Villa" in answer
+    assert "Grand Hyatt Bali" not in answer and "Seminyak Beach Hall" not in answer
+
+
+def test_date_is_not_a_selection():
+    # "the 2nd" is a date here, not the second venue: answer across the whole shortlist
+    answer = VenueIndex().answer("where is it, we arrive on the 2nd", VENUES)
+    for venue in VENUES:
+        assert venue["payload"]["name"] in answer
+
+
+def test_terms_filter_the_shortlist():
+    answer = VenueIndex().answer("which ones have parking?", VENUES)
+    assert "Grand Hyatt Bali" in answer and "Seminyak Beach Hall" in answer
+    assert "Ubud Garden Villa" not in answer
+
+
+def test_answers_follow_the_current_recommendations():
+    # one process-wide index, two recommendation rounds for the same session: only the
+    # venues passed in (the DB's current recommendations) are answered about
+    index = VenueIndex()
+    index.answer("which ones have parking?", VENUES)
+    newer = [{"payload": {"id": "201", "name": "Canggu Loft", "location": "Canggu", "type": "Loft", "amenities": ["parking"]}}]
+    answer = index.answer("which ones have parking?", newer)
+    assert "Canggu Loft" in answer
+    assert "Grand Hyatt Bali" not in answer and "Seminyak Beach Hall" not in answer
+
+
+def test_changed_payload_is_reindexed():
+    index = VenueIndex()
+    index.answer("which ones have parking?", VENUES)
+    updated = [dict(VENUES[1], payload=dict(VENUES[1]["payload"], amenities=["garden", "parking"]))]
+    assert "Ubud Garden Villa" in index.answer("which ones have parking?", updated)
+    assert index.matching("parking") >= {"102"}
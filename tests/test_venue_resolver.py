@@ -0,0 +1,64 @@
+import pytest
+
+from core.agent.venue_resolver import resolve_from_messages, resolve_venue_selection
+
+VENUES = [
+    {"payload": {"id": str(100 + i), "name": name}}
+    for i, name in enumerate(
+        ["Grand Hyatt Bali", "Ubud Garden Villa", "Seminyak Beach Hall", "Nusa Dua Ballroom", "Kuta Sky Lounge"],
+        start=1,
+    )
+]
+
+
+@pytest.mark.parametrize("text", [
+    "my event is on the 3rd of May",
+    "last week my friend recommended you",
+    "second thoughts, maybe not",
+    "we have 104 guests",
+    "we need 2 rooms for 3 days",
+    "yes confirm",
+])
+def test_no_selection_outside_a_selection_phrase(text):
+    resolution = resolve_venue_selection(text, VENUES)
+    assert resolution.path == "none"
+    assert resolution.index is None
+
+
+@pytest.mark.parametrize("text, index, path", [
+    ("book 2", 2, "ordinal"),
+    ("2", 2, "ordinal"),
+    ("#3", 3, "ordinal"),
+    ("nomor 2", 2, "ordinal"),
+    ("the second one", 2, "ordinal"),
+    ("second", 2, "ordinal"),
+    ("yang kedua", 2, "ordinal"),
+    ("book the 3rd", 3, "ordinal"),
+    ("go with the first", 1, "ordinal"),
+    ("I'll take the last one", 5, "ordinal"),
+    ("venue 104", 4, "id"),
+    ("book 105", 5, "id"),
+    ("Ubud Garden Villa please", 2, "name"),
+])
+def test_selection_phrases(text, index, path):
+    resolution = resolve_venue_selection(text, VENUES)
+    assert (resolution.index, resolution.path) == (index, path)
+    assert resolution.confidence >= 0.8
+
+
+def test_newest_selection_wins_over_older_messages():
+    # newest first: the date in the middle message must not override "book 1"
+    resolution = resolve_from_messages(["yes confirm", "my event is on the 3rd of June", "book 1"], VENUES)
+    assert resolution.index == 1
+
+
+def test_search_stops_at_newest_selection():
+    # the newest selection is weak/ambiguous: it goes to the LLM, the older "book 1" is not used
+    resolution = resolve_from_messages(["book 2 or book 3", "book 1"], VENUES)
+    assert resolution.path == "ambiguous"
+    assert resolution.confidence < 0.8
+
+
+def test_no_selection_in_any_message():
+    resolution = resolve_from_messages(["yes confirm", "we have 104 guests"], VENUES)
+    assert resolution.path == "none"